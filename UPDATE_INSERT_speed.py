@@ -1,117 +1,367 @@
-import time
-import mysql.connector
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import os
+import argparse
+import random
+from pymongo import InsertOne, UpdateOne
 
+from dbConnections import openMySQL, openMongo, addPoolArguments, getMongoDb, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import addHarnessArguments, runBenchmark, runBatches, summariseTimes, displaySummaries, displayThroughput, displayClientServer
+from benchmarkFixtures import (scratchName, nextClient, mysqlCreateScratchTable, mysqlResetScratchTable, mysqlDropScratchTable,
+                               mysqlSeedClient, mongoCreateScratchCollection, mongoResetScratchCollection,
+                               mongoDropScratchCollection, mongoSeedClient)
+from serverTiming import mysqlServerTimer, mongoServerTimer, enableMongoProfiler, disableMongoProfiler
+from resultStore import startRun, recordResult, addResultArguments
 
-load_dotenv()
 
-connection = mysql.connector.connect(
-    host=os.getenv("MYSQL_HOST"),
-    user=os.getenv("MYSQL_USER"),
-    password=os.getenv("MYSQL_PASSWORD"),
-    database=os.getenv("MYSQL_DB")
-)
-mysqlCursor = connection.cursor()
+defaultBatchSizes = [1, 10, 100, 1000, 10000]
+defaultHitRatios = [0.0, 0.5, 1.0]
 
 
-mongoClient = MongoClient(
-    host=os.getenv("MONGODB_URI"),
-    username=os.getenv("MONGODB_USER"),
-    password=os.getenv("MONGODB_PASSWORD"),
-    authSource=os.getenv("MONGODB_AUTHSERVER")
-)
-mongoDb = mongoClient[os.getenv("MONGODB_DB")]
-mongoCollection = mongoDb["Client"]
+# Each operation receives a client prepared by a fixture in benchmarkFixtures.py,
+# so only the statement under test (and its commit) falls inside the timed region
+def mysqlInsert(connection, mysqlCursor, client):
+    insertQuery = f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)"
+    mysqlCursor.execute(insertQuery, (client["client_Name"], client["client_Phone"], client["client_Email"]))
+    connection.commit()
+
+
+def mysqlUpdate(connection, mysqlCursor, client):
+    updateQuery = f"UPDATE {scratchName} SET client_Name = %s WHERE client_Email = %s"
+    mysqlCursor.execute(updateQuery, ("Jane Doe", client["client_Email"]))
+    connection.commit()
+
 
+def mongoInsert(mongoCollection, client):
+    mongoCollection.insert_one(dict(client))    # Copy, since insert_one adds an _id to the document it is given
 
-clientData = {
-    "client_Name": "John Doe",
-    "client_Phone": "12345678910",
-    "client_Email": "test@email.com"
-}
 
-mysqlInsertTimes = []
-mysqlUpdateTimes = []
-mongoInsertTimes = []
-mongoUpdateTimes = []
+def mongoUpdate(mongoCollection, client):
+    mongoCollection.update_one({"client_Email": client["client_Email"]}, {"$set": {"client_Name": "Jane Doe"}})
 
 
+def makeBulkClients(count):
+    return [
+        {
+            "client_Name": f"Bulk Client {i}",
+            "client_Phone": f"{i:011d}",
+            "client_Email": f"bulk{i}@email.com"
+        }
+        for i in range(count)
+    ]
+
+
+def mysqlExecutemany(connection, mysqlCursor, batch):
+    insertQuery = f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)"
+    mysqlCursor.executemany(insertQuery, [(c["client_Name"], c["client_Phone"], c["client_Email"]) for c in batch])
+    connection.commit()
+
 
-def mysqlInsert():
-    mysqlCursor.execute("DELETE FROM Client WHERE client_Email = %s", (clientData["client_Email"],))
-    mysqlCursor.execute("SET profiling = 1;")                                                                # Enable profiling for this session
-    insertQuery = "INSERT INTO Client (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)"
-    mysqlCursor.execute(insertQuery, (clientData["client_Name"], clientData["client_Phone"], clientData["client_Email"]))
+def mysqlMultiRowInsert(connection, mysqlCursor, batch):
+    # Build a single INSERT ... VALUES (...), (...) statement for the whole batch
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(batch))
+    insertQuery = f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES {placeholders}"
+    params = [value for c in batch for value in (c["client_Name"], c["client_Phone"], c["client_Email"])]
+    mysqlCursor.execute(insertQuery, params)
     connection.commit()
-    
-    # Retrieve and print execution time
-    mysqlCursor.execute("SHOW PROFILES;")
-    profiles = mysqlCursor.fetchall()
-    if profiles:
-        # Get the last executed query's profiling info
-        lastQueryProfile = profiles[-1]
-        execTime = lastQueryProfile[1]      # Execution time of the last query
-        mysqlInsertTimes.append(execTime)
-
-
-def mysqlUpdate():
-    mysqlCursor.execute("SET profiling = 1;")                                                                 # Enable profiling for this session
-    updateQuery = "UPDATE Client SET client_Name = %s WHERE client_Email = %s"
-    mysqlCursor.execute(updateQuery, ("Jane Doe", clientData["client_Email"]))
+
+
+def mongoInsertMany(mongoCollection, batch):
+    mongoCollection.insert_many([dict(c) for c in batch], ordered=False)
+
+
+def mongoBulkWrite(mongoCollection, batch):
+    mongoCollection.bulk_write([InsertOne(dict(c)) for c in batch], ordered=False)
+
+
+def makeUpsertClients(count, hitRatio, seed):
+    # Returns the clients that already exist before the run and the clients to upsert
+    # A hitRatio share of the upserts target an existing client_Email, the rest are new
+    rng = random.Random(seed)
+    existing = [
+        {"client_Name": f"Existing Client {i}", "client_Phone": f"{i:011d}", "client_Email": f"upsert-existing{i}@email.com"}
+        for i in range(count)
+    ]
+    upserts = []
+    for i in range(count):
+        email = existing[i]["client_Email"] if rng.random() < hitRatio else f"upsert-new{i}@email.com"
+        upserts.append({"client_Name": f"Upserted Client {i}", "client_Phone": f"{i:011d}", "client_Email": email})
+    return existing, upserts
+
+
+def mysqlUpsert(connection, mysqlCursor, batch):
+    # Multi-row INSERT ... ON DUPLICATE KEY UPDATE, matched on the UNIQUE KEY on client_Email
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(batch))
+    upsertQuery = (
+        f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES {placeholders} AS new "
+        "ON DUPLICATE KEY UPDATE client_Name = new.client_Name, client_Phone = new.client_Phone"
+    )
+    params = [value for c in batch for value in (c["client_Name"], c["client_Phone"], c["client_Email"])]
+    mysqlCursor.execute(upsertQuery, params)
     connection.commit()
-    
-    # Retrieve and print execution time
-    mysqlCursor.execute("SHOW PROFILES;")
-    profiles = mysqlCursor.fetchall()
-    if profiles:
-        # Get the last executed query's profiling info
-        lastQueryProfile = profiles[-1]
-        execTime = lastQueryProfile[1]      # Execution time of the last query
-        mysqlUpdateTimes.append(execTime)
-
-
-def mongoInsert():
-    mongoCollection.delete_many({})         # Clear the collection before each insert
-    startTime = time.time()
-    mongoCollection.insert_one(clientData)
-    execTime = time.time() - startTime
-    mongoInsertTimes.append(execTime)
-
-
-def mongoUpdate():
-    startTime = time.time()
-    mongoCollection.update_one({"client_Email": clientData["client_Email"]}, {"$set": {"client_Name": "Jane Doe"}})
-    execTime = time.time() - startTime
-    mongoUpdateTimes.append(execTime)
-
-print("-----Testing MySQL-----")
-for i in range(10):
-    mysqlInsert()
-    mysqlUpdate()
-
-print("\n-----Testing MongoDB-----")
-for i in range(10):
-    mongoInsert()
-    mongoUpdate()
-
-def calculate_average(times):
-    return sum(times) / len(times) if times else 0
-
-print("\n-----Execution Times-----")
-print(f"MySQL INSERT Execution Times: {mysqlInsertTimes}")
-print(f"MySQL UPDATE Execution Times: {mysqlUpdateTimes}")
-print(f"MongoDB INSERT Execution Times: {mongoInsertTimes}")
-print(f"MongoDB UPDATE Execution Times: {mongoUpdateTimes}")
-
-print("\n-----Average Execution Times-----")
-print(f"MySQL INSERT Average Time: {calculate_average(mysqlInsertTimes):.6f} seconds")
-print(f"MySQL UPDATE Average Time: {calculate_average(mysqlUpdateTimes):.6f} seconds")
-print(f"MongoDB INSERT Average Time: {calculate_average(mongoInsertTimes):.6f} seconds")
-print(f"MongoDB UPDATE Average Time: {calculate_average(mongoUpdateTimes):.6f} seconds")
-
-# Close connections
-mysqlCursor.close()
-connection.close()
-mongoClient.close()
+
+
+def mongoUpsert(mongoCollection, batch):
+    # A single client goes through update_one, larger batches through bulk_write
+    if len(batch) == 1:
+        client = batch[0]
+        mongoCollection.update_one({"client_Email": client["client_Email"]},
+                                   {"$set": {"client_Name": client["client_Name"], "client_Phone": client["client_Phone"]}}, upsert=True)
+    else:
+        mongoCollection.bulk_write([
+            UpdateOne({"client_Email": c["client_Email"]}, {"$set": {"client_Name": c["client_Name"], "client_Phone": c["client_Phone"]}}, upsert=True)
+            for c in batch
+        ], ordered=False)
+
+
+def runUpsertSweep(label, upsertBatch, loadExisting, clearRows, args):
+    results = []
+    for hitRatio in args.hit_ratios:
+        existing, upserts = makeUpsertClients(args.rows, hitRatio, args.seed)
+        for batchSize in args.batch_sizes:
+            # Reset and seed the existing clients outside the timed region
+            clearRows()
+            for start in range(0, len(existing), 1000):
+                loadExisting(existing[start:start + 1000])
+            batchTimes = runBatches(upsertBatch, upserts, batchSize)
+            results.append({
+                "label": f"{label} {hitRatio * 100:g}% hits",
+                "batchSize": batchSize,
+                "rows": len(upserts),
+                "totalTime": sum(batchTimes) / 1e9,
+                "summary": summariseTimes(batchTimes, args.confidence),
+                "batchTimes": batchTimes
+            })
+    clearRows()
+    return results
+
+
+def recordTimes(args, run, backend, operation, timesNs, datasetSize):
+    if run and timesNs:
+        recordResult(run, backend, operation, [t / 1e9 for t in timesNs], datasetSize, args.results,
+                     extra={"pooled": args.pooled} if args.pooled else None)
+
+
+def runBulkSweep(label, loadBatch, clearRows, clients, batchSizes, confidence):
+    results = []
+    for batchSize in batchSizes:
+        clearRows()         # Reset the scratch table/collection before the run, so it is not timed
+        batchTimes = runBatches(loadBatch, clients, batchSize)
+        results.append({
+            "label": label,
+            "batchSize": batchSize,
+            "rows": len(clients),
+            "totalTime": sum(batchTimes) / 1e9,
+            "summary": summariseTimes(batchTimes, confidence),
+            "batchTimes": batchTimes
+        })
+    clearRows()
+    return results
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark INSERT and UPDATE speed on MySQL and MongoDB")
+    parser.add_argument("--mode", choices=["single", "bulk", "upsert"], default="single",
+                        help="Single row writes, bulk load sweep or upsert sweep (default: single)")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to test (default: both)")
+    parser.add_argument("--rows", type=int, default=10000, help="Clients loaded per batch size in bulk and upsert mode (default: 10000)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=defaultBatchSizes, help="Batch sizes to sweep in bulk and upsert mode (default: 1 10 100 1000 10000)")
+    parser.add_argument("--hit-ratios", type=float, nargs="+", default=defaultHitRatios,
+                        help="Share of upserts that hit an existing client in upsert mode (default: 0 0.5 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for choosing upsert hits (default: 42)")
+    parser.add_argument("--prepared", action="store_true", help="Use server-side prepared statements for the MySQL writes")
+    parser.add_argument("--server-timing", action="store_true",
+                        help="Also capture server time from performance_schema (MySQL) and the database profiler (MongoDB)")
+    addPoolArguments(parser)
+    addResultArguments(parser)
+    addHarnessArguments(parser)
+    return parser.parse_args()
+
+
+def runSingleMode(args, run):
+    summaries = {}
+    serverSummaries = {}
+
+    if args.backend in ("mysql", "both"):
+        print("-----Testing MySQL-----")
+        connection = openMySQL(args.pooled)
+        mysqlCursor = connection.cursor(prepared=args.prepared)
+        setupCursor = connection.cursor()       # Kept apart so fixtures don't replace the statement prepared on mysqlCursor
+        mysqlCreateScratchTable(connection)
+
+        insertTimer = mysqlServerTimer(connection, ["INSERT", "COMMIT"]) if args.server_timing else None
+        updateTimer = mysqlServerTimer(connection, ["UPDATE", "COMMIT"]) if args.server_timing else None
+        insertTimes, insertServerTimes = runBenchmark(lambda client: mysqlInsert(connection, mysqlCursor, client),
+                                                      args.warmup, args.iterations, insertTimer, setup=nextClient)
+        updateTimes, updateServerTimes = runBenchmark(lambda client: mysqlUpdate(connection, mysqlCursor, client),
+                                                      args.warmup, args.iterations, updateTimer,
+                                                      setup=lambda: mysqlSeedClient(connection, setupCursor))
+        summaries["MySQL INSERT"] = summariseTimes(insertTimes, args.confidence)
+        summaries["MySQL UPDATE"] = summariseTimes(updateTimes, args.confidence)
+        serverSummaries["MySQL INSERT"] = summariseTimes(insertServerTimes, args.confidence)
+        serverSummaries["MySQL UPDATE"] = summariseTimes(updateServerTimes, args.confidence)
+
+        datasetSize = mysqlOrderCount(connection)
+        protocol = " prepared" if args.prepared else ""
+        recordTimes(args, run, "mysql", f"insert{protocol}", insertTimes, datasetSize)
+        recordTimes(args, run, "mysql", f"update{protocol}", updateTimes, datasetSize)
+        recordTimes(args, run, "mysql", f"insert{protocol} (server)", insertServerTimes, datasetSize)
+        recordTimes(args, run, "mysql", f"update{protocol} (server)", updateServerTimes, datasetSize)
+
+        mysqlDropScratchTable(connection)
+        setupCursor.close()
+        mysqlCursor.close()
+        connection.close()
+
+    if args.backend in ("mongo", "both"):
+        print("\n-----Testing MongoDB-----")
+        mongoClient = openMongo(args.pooled)
+        mongoDb = getMongoDb(mongoClient)
+        mongoCreateScratchCollection(mongoDb)
+        mongoCollection = mongoDb[scratchName]
+
+        insertTimer = None
+        updateTimer = None
+        if args.server_timing:
+            enableMongoProfiler(mongoDb)
+            insertTimer = mongoServerTimer(mongoDb, scratchName, ["insert"])
+            updateTimer = mongoServerTimer(mongoDb, scratchName, ["update"])
+        insertTimes, insertServerTimes = runBenchmark(lambda client: mongoInsert(mongoCollection, client),
+                                                      args.warmup, args.iterations, insertTimer, setup=nextClient)
+        updateTimes, updateServerTimes = runBenchmark(lambda client: mongoUpdate(mongoCollection, client),
+                                                      args.warmup, args.iterations, updateTimer,
+                                                      setup=lambda: mongoSeedClient(mongoCollection))
+        if args.server_timing:
+            disableMongoProfiler(mongoDb)
+        summaries["MongoDB INSERT"] = summariseTimes(insertTimes, args.confidence)
+        summaries["MongoDB UPDATE"] = summariseTimes(updateTimes, args.confidence)
+        serverSummaries["MongoDB INSERT"] = summariseTimes(insertServerTimes, args.confidence)
+        serverSummaries["MongoDB UPDATE"] = summariseTimes(updateServerTimes, args.confidence)
+
+        datasetSize = mongoOrderCount(mongoDb)
+        recordTimes(args, run, "mongo", "insert", insertTimes, datasetSize)
+        recordTimes(args, run, "mongo", "update", updateTimes, datasetSize)
+        recordTimes(args, run, "mongo", "insert (server)", insertServerTimes, datasetSize)
+        recordTimes(args, run, "mongo", "update (server)", updateServerTimes, datasetSize)
+
+        mongoDropScratchCollection(mongoDb)
+        mongoClient.close()
+
+    print("\n-----Execution Times (client wall clock)-----")
+    displaySummaries(summaries, args.confidence)
+
+    if args.server_timing:
+        print("\n-----Client vs Server Time-----")
+        displayClientServer(summaries, serverSummaries)
+
+
+def runBulkMode(args, run):
+    clients = makeBulkClients(args.rows)
+    results = []
+    datasetSizes = {}
+
+    if args.backend in ("mysql", "both"):
+        print("-----Bulk loading MySQL-----")
+        connection = openMySQL(args.pooled)
+        mysqlCursor = connection.cursor(prepared=args.prepared)
+        mysqlCreateScratchTable(connection)
+        clearRows = lambda: mysqlResetScratchTable(connection)
+
+        protocol = " (prepared)" if args.prepared else ""
+        results += runBulkSweep(f"MySQL executemany{protocol}", lambda batch: mysqlExecutemany(connection, mysqlCursor, batch),
+                                clearRows, clients, args.batch_sizes, args.confidence)
+        results += runBulkSweep(f"MySQL multi-row INSERT{protocol}", lambda batch: mysqlMultiRowInsert(connection, mysqlCursor, batch),
+                                clearRows, clients, args.batch_sizes, args.confidence)
+        datasetSizes["mysql"] = mysqlOrderCount(connection)
+
+        mysqlDropScratchTable(connection)
+        mysqlCursor.close()
+        connection.close()
+
+    if args.backend in ("mongo", "both"):
+        print("-----Bulk loading MongoDB-----")
+        mongoClient = openMongo(args.pooled)
+        mongoDb = getMongoDb(mongoClient)
+        mongoCreateScratchCollection(mongoDb)
+        mongoCollection = mongoDb[scratchName]
+        clearRows = lambda: mongoResetScratchCollection(mongoDb)
+
+        results += runBulkSweep("MongoDB insert_many", lambda batch: mongoInsertMany(mongoCollection, batch),
+                                clearRows, clients, args.batch_sizes, args.confidence)
+        results += runBulkSweep("MongoDB bulk_write", lambda batch: mongoBulkWrite(mongoCollection, batch),
+                                clearRows, clients, args.batch_sizes, args.confidence)
+        datasetSizes["mongo"] = mongoOrderCount(mongoDb)
+
+        mongoDropScratchCollection(mongoDb)
+        mongoClient.close()
+
+    for result in results:
+        backend = "mysql" if result["label"].startswith("MySQL") else "mongo"
+        recordTimes(args, run, backend, f"{result['label']} x{result['batchSize']}", result["batchTimes"], datasetSizes[backend])
+
+    # Sort so each batch size shows MySQL and MongoDB next to each other
+    results.sort(key=lambda result: result["batchSize"])
+    print("\n-----Bulk Load Throughput-----")
+    displayThroughput(results)
+
+
+def runUpsertMode(args, run):
+    results = []
+    datasetSizes = {}
+
+    if args.backend in ("mysql", "both"):
+        print("-----Upserting into MySQL-----")
+        connection = openMySQL(args.pooled)
+        mysqlCursor = connection.cursor(prepared=args.prepared)
+        loadCursor = connection.cursor()
+        mysqlCreateScratchTable(connection)
+
+        results += runUpsertSweep("MySQL ON DUPLICATE KEY UPDATE", lambda batch: mysqlUpsert(connection, mysqlCursor, batch),
+                                  lambda batch: mysqlMultiRowInsert(connection, loadCursor, batch),
+                                  lambda: mysqlResetScratchTable(connection), args)
+        datasetSizes["mysql"] = mysqlOrderCount(connection)
+
+        mysqlDropScratchTable(connection)
+        loadCursor.close()
+        mysqlCursor.close()
+        connection.close()
+
+    if args.backend in ("mongo", "both"):
+        print("-----Upserting into MongoDB-----")
+        mongoClient = openMongo(args.pooled)
+        mongoDb = getMongoDb(mongoClient)
+        mongoCreateScratchCollection(mongoDb)
+        mongoCollection = mongoDb[scratchName]
+
+        results += runUpsertSweep("MongoDB upsert", lambda batch: mongoUpsert(mongoCollection, batch),
+                                  lambda batch: mongoInsertMany(mongoCollection, batch),
+                                  lambda: mongoResetScratchCollection(mongoDb), args)
+        datasetSizes["mongo"] = mongoOrderCount(mongoDb)
+
+        mongoDropScratchCollection(mongoDb)
+        mongoClient.close()
+
+    for result in results:
+        backend = "mysql" if result["label"].startswith("MySQL") else "mongo"
+        recordTimes(args, run, backend, f"{result['label']} x{result['batchSize']}", result["batchTimes"], datasetSizes[backend])
+
+    results.sort(key=lambda result: result["batchSize"])
+    print("\n-----Upsert Throughput-----")
+    displayThroughput(results)
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("UPDATE_INSERT_speed.py")
+
+    match args.mode:
+        case "single":
+            runSingleMode(args, run)
+        case "bulk":
+            runBulkMode(args, run)
+        case "upsert":
+            runUpsertMode(args, run)
+
+    if run:
+        print(f"\nStored results as run {run['runID']} in {args.results}")
+
+
+if __name__ == "__main__":
+    main()
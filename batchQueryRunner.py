@@ -0,0 +1,134 @@
+import argparse
+import csv
+import json
+import os
+import sys
+
+import queriesSQL
+import queriesMongo
+from dbConnections import connectMySQL, connectMongo, getMongoDb, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import summariseTimes
+from reportRegistry import reportDefinitions, runReports
+from reportCache import createCache, watchMongoWrites, cacheStats, addCacheArguments, checkCacheArguments
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Runs the report queries without the interactive menu, for scripted benchmark jobs
+# Every run of a report is one sample, written out as JSON or CSV with its execution time, row count
+# and the time taken to decode the results into DataFrames, which isn't part of the execution time
+# MySQL times come from SHOW PROFILES and MongoDB times from the client clock, the same as in the menus
+# With --cache, repeats after the first are normally cache hits timed by their lookup and reported as "<report> (cached)",
+# and each backend's hit, miss and eviction counters are written out with the summaries to help size the cache
+
+sampleFields = ["backend", "report", "iteration", "execTime", "rows", "decodeTime"]
+
+
+def runBackend(backend, names, repeat, exportDir, cache):
+    # Returns the samples and the number of orders the backend holds
+    exportPrefix = os.path.join(exportDir, f"{backend}_") if exportDir else None
+    if backend == "mysql":
+        connection = connectMySQL()
+        datasetSize = mysqlOrderCount(connection)
+        queriesSQL.resultCache = cache
+        samples = runReports(queriesSQL.executeReport, connection, names, repeat, exportPrefix)
+        connection.close()
+    else:
+        client = connectMongo()
+        db = getMongoDb(client)
+        datasetSize = mongoOrderCount(db)
+        queriesMongo.resultCache = cache
+        if cache is not None:
+            watchMongoWrites(cache, db)
+        samples = runReports(queriesMongo.executeReport, db, names, repeat, exportPrefix)
+        client.close()
+    return [dict(zip(sampleFields, (backend,) + sample)) for sample in samples], datasetSize
+
+
+def summariseSamples(samples):
+    # One summary per backend and report, in the order they were first run
+    grouped = {}
+    for sample in samples:
+        grouped.setdefault((sample["backend"], sample["report"]), []).append(sample)
+
+    summaries = []
+    for (backend, report), runs in grouped.items():
+        summary = summariseTimes([run["execTime"] * 1e9 for run in runs])
+        # Cache hits have nothing to decode
+        decodeTimes = [run["decodeTime"] * 1e9 for run in runs if run["decodeTime"] is not None]
+        decodeSummary = summariseTimes(decodeTimes) if decodeTimes else None
+        summaries.append({"backend": backend, "report": report, "rows": runs[-1]["rows"], **summary, "decode": decodeSummary})
+    return summaries
+
+
+def writeJson(outputFile, run, samples, summaries, caches):
+    json.dump({"run": run, "samples": samples, "summaries": summaries, "cache": caches}, outputFile, indent=2)
+    outputFile.write("\n")
+
+
+def writeCsv(outputFile, samples):
+    writer = csv.DictWriter(outputFile, fieldnames=sampleFields)
+    writer.writeheader()
+    writer.writerows(samples)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Run the report queries a number of times without the menu and write the timings as JSON or CSV")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to query (default: both)")
+    parser.add_argument("--reports", choices=list(reportDefinitions), nargs="+", default=list(reportDefinitions),
+                        help="Reports to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to run each report (default: 1)")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="Output format (default: json)")
+    parser.add_argument("--output", help="File to write the output to (default: standard output)")
+    parser.add_argument("--stream", type=int, metavar="ROWS", help="Read the results ROWS at a time instead of all at once, keeping memory flat for large reports")
+    parser.add_argument("--export", metavar="DIR", help="Also write each report's rows to DIR/<backend>_<report>.csv as they arrive")
+    parser.add_argument("--decode", choices=["columns", "rows"], default="columns", help="Decode the results a column or a row at a time (default: columns)")
+    parser.add_argument("--quiet", action="store_true", help="Don't print the report tables, needed for clean output on standard output")
+    parser.add_argument("--prepared", action="store_true", help="Run the MySQL queries as server-side prepared statements")
+    addCacheArguments(parser)
+    addResultArguments(parser)
+    args = parser.parse_args()
+    checkCacheArguments(parser, args)
+    return args
+
+
+def main():
+    args = parseArguments()
+    queriesSQL.showResults = queriesMongo.showResults = not args.quiet
+    queriesSQL.usePreparedStatements = args.prepared
+    queriesSQL.streamBatchSize = queriesMongo.streamBatchSize = args.stream
+    queriesSQL.decodeMode = queriesMongo.decodeMode = args.decode
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+
+    run = startRun("batchQueryRunner.py")
+    backends = ["mysql", "mongo"] if args.backend == "both" else [args.backend]
+
+    samples = []
+    caches = {}
+    for backend in backends:
+        cache = createCache(args.cache_entries, args.cache_rows, args.cache_ttl) if args.cache else None
+        backendSamples, datasetSize = runBackend(backend, args.reports, args.repeat, args.export, cache)
+        samples.extend(backendSamples)
+        if cache is not None:
+            caches[backend] = cacheStats(cache)
+        if not args.no_record:
+            # Each report's cache hits are recorded apart from its queries, under the name timedOperation gave them
+            for report in dict.fromkeys(sample["report"] for sample in backendSamples):
+                runs = [sample for sample in backendSamples if sample["report"] == report]
+                recordResult(run, backend, report, [sample["execTime"] for sample in runs], datasetSize, args.results,
+                             extra={"rows": runs[-1]["rows"], "prepared": args.prepared and backend == "mysql", "stream": args.stream,
+                                    "decode": args.decode, "decodeTimes": [sample["decodeTime"] for sample in runs],
+                                    "cache": caches.get(backend)})
+
+    outputFile = open(args.output, "w", newline="") if args.output else sys.stdout
+    if args.format == "json":
+        writeJson(outputFile, run, samples, summariseSamples(samples), caches)
+    else:
+        writeCsv(outputFile, samples)
+    if args.output:
+        outputFile.close()
+        print(f"Wrote {len(samples)} samples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
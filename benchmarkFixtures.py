@@ -0,0 +1,73 @@
+import itertools
+import uuid
+
+
+# Benchmarks write to a scratch copy of Client, so the live table/collection is never cleared
+# and every timed operation starts from the same (small) state
+scratchName = "ClientBench"
+
+# Each run gets its own email prefix and each fixture its own number, so no two operations share a key
+runID = uuid.uuid4().hex[:8]
+keyCounter = itertools.count()
+
+
+def nextClient():
+    n = next(keyCounter)
+    return {
+        "client_Name": "John Doe",
+        "client_Phone": "12345678910",
+        "client_Email": f"bench-{runID}-{n}@email.com"
+    }
+
+
+def mysqlCreateScratchTable(connection, source="Client", scratch=scratchName):
+    # LIKE copies the columns and indexes of the source table
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS `{scratch}`")
+    cursor.execute(f"CREATE TABLE `{scratch}` LIKE `{source}`")
+    connection.commit()
+    cursor.close()
+
+
+def mysqlResetScratchTable(connection, scratch=scratchName):
+    cursor = connection.cursor()
+    cursor.execute(f"TRUNCATE TABLE `{scratch}`")
+    connection.commit()
+    cursor.close()
+
+
+def mysqlDropScratchTable(connection, scratch=scratchName):
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS `{scratch}`")
+    connection.commit()
+    cursor.close()
+
+
+def mysqlSeedClient(connection, mysqlCursor, scratch=scratchName):
+    # Inserts a fresh client for an UPDATE to target
+    client = nextClient()
+    mysqlCursor.execute(f"INSERT INTO `{scratch}` (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)",
+                        (client["client_Name"], client["client_Phone"], client["client_Email"]))
+    connection.commit()
+    return client
+
+
+def mongoCreateScratchCollection(db, scratch=scratchName):
+    # Unique on client_Email, like the UNIQUE KEY on the MySQL Client table, so upserts have a key to match on
+    db[scratch].drop()
+    db.create_collection(scratch)
+    db[scratch].create_index("client_Email", unique=True)
+
+
+def mongoResetScratchCollection(db, scratch=scratchName):
+    db[scratch].delete_many({})
+
+
+def mongoDropScratchCollection(db, scratch=scratchName):
+    db[scratch].drop()
+
+
+def mongoSeedClient(mongoCollection):
+    client = nextClient()
+    mongoCollection.insert_one(dict(client))
+    return client
@@ -0,0 +1,219 @@
+import math
+import statistics
+import time
+import pandas as pd
+
+
+# Two-sided critical values of Student's t distribution for a 95% confidence level, indexed by degrees of freedom
+# Past 30 degrees of freedom the normal distribution is close enough
+tCritical95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+    21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042
+}
+
+
+def addHarnessArguments(parser):
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed runs before measuring (default: 5)")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed runs per operation (default: 50)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level for the mean (default: 0.95)")
+
+
+def runBenchmark(operation, warmup=5, iterations=50, serverTimer=None, setup=None):
+    # Returns the client wall clock times and, if a server timer from serverTiming.py is given, the matching server times
+    # If setup is given it runs before every call, outside the timed region, and its result is passed to the operation
+    def runOnce():
+        fixture = setup() if setup else None
+        if serverTimer:
+            marker = serverTimer[0]()
+        startTime = time.perf_counter_ns()
+        if setup:
+            operation(fixture)
+        else:
+            operation()
+        elapsed = time.perf_counter_ns() - startTime
+        serverTime = serverTimer[1](marker) if serverTimer else None
+        return elapsed, serverTime
+
+    # Warmup runs fill caches and the connection buffers, so they are not measured
+    for _ in range(warmup):
+        runOnce()
+
+    times = []
+    serverTimes = []
+    for _ in range(iterations):
+        elapsed, serverTime = runOnce()
+        times.append(elapsed)
+        if serverTimer:
+            serverTimes.append(serverTime)
+
+    return times, serverTimes
+
+
+def runBatches(loadBatch, rows, batchSize):
+    # Times each batch separately so both throughput and per-batch latency can be reported
+    batchTimes = []
+    for start in range(0, len(rows), batchSize):
+        batch = rows[start:start + batchSize]
+        startTime = time.perf_counter_ns()
+        loadBatch(batch)
+        batchTimes.append(time.perf_counter_ns() - startTime)
+
+    return batchTimes
+
+
+def percentile(sortedValues, pct):
+    # Linear interpolation between the closest ranks
+    if not sortedValues:
+        return 0
+    rank = (len(sortedValues) - 1) * pct / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return sortedValues[lower] + (sortedValues[upper] - sortedValues[lower]) * (rank - lower)
+
+
+def criticalValue(confidence, degreesOfFreedom):
+    if confidence == 0.95 and degreesOfFreedom in tCritical95:
+        return tCritical95[degreesOfFreedom]
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def summariseTimes(timesNs, confidence=0.95):
+    # Timings are captured in nanoseconds and reported in seconds
+    times = sorted(t / 1e9 for t in timesNs)
+    count = len(times)
+    if count == 0:
+        return {"count": 0}
+
+    mean = statistics.fmean(times)
+    stddev = statistics.stdev(times) if count > 1 else 0.0
+    margin = criticalValue(confidence, count - 1) * stddev / math.sqrt(count) if count > 1 else 0.0
+
+    return {
+        "count": count,
+        "mean": mean,
+        "stddev": stddev,
+        "ciLow": mean - margin,
+        "ciHigh": mean + margin,
+        "min": times[0],
+        "p50": percentile(times, 50),
+        "p90": percentile(times, 90),
+        "p99": percentile(times, 99),
+        "max": times[-1]
+    }
+
+
+def displaySummaries(summaries, confidence=0.95):
+    # summaries maps an operation name to the output of summariseTimes
+    ciLabel = f"{confidence * 100:g}% CI"
+    data = {
+        "Operation:": [],
+        "Runs:": [],
+        "Mean (s):": [],
+        "Std Dev (s):": [],
+        f"{ciLabel} (s):": [],
+        "p50 (s):": [],
+        "p90 (s):": [],
+        "p99 (s):": [],
+        "Max (s):": []
+    }
+    for name, summary in summaries.items():
+        if summary["count"] == 0:
+            continue
+        data["Operation:"].append(name)
+        data["Runs:"].append(summary["count"])
+        data["Mean (s):"].append(f"{summary['mean']:.6f}")
+        data["Std Dev (s):"].append(f"{summary['stddev']:.6f}")
+        data[f"{ciLabel} (s):"].append(f"{summary['ciLow']:.6f} - {summary['ciHigh']:.6f}")
+        data["p50 (s):"].append(f"{summary['p50']:.6f}")
+        data["p90 (s):"].append(f"{summary['p90']:.6f}")
+        data["p99 (s):"].append(f"{summary['p99']:.6f}")
+        data["Max (s):"].append(f"{summary['max']:.6f}")
+
+    displayTable(data)
+
+
+def displayTable(data):
+    df = pd.DataFrame(data)
+    resultString = df.to_string(index=False)
+    separator = "-" * max(len(line) for line in resultString.split('\n'))
+    print(separator)
+    print(resultString)
+    print(separator)
+
+
+def displayThroughput(results):
+    # results is a list of dicts with a label, batch size, row count, total time and per-batch summary
+    data = {
+        "Operation:": [result["label"] for result in results],
+        "Batch Size:": [result["batchSize"] for result in results],
+        "Rows:": [result["rows"] for result in results],
+        "Rows/s:": [f"{result['rows'] / result['totalTime']:.1f}" if result["totalTime"] else "N/A" for result in results],
+        "Batch Mean (s):": [f"{result['summary']['mean']:.6f}" for result in results],
+        "Batch p99 (s):": [f"{result['summary']['p99']:.6f}" for result in results],
+        "Batch Max (s):": [f"{result['summary']['max']:.6f}" for result in results]
+    }
+    displayTable(data)
+
+
+def displayClientServer(clientSummaries, serverSummaries):
+    # Shows client and server means next to each other, the difference being network and driver overhead
+    data = {
+        "Operation:": [],
+        "Client Mean (s):": [],
+        "Server Mean (s):": [],
+        "Overhead (s):": [],
+        "Client p99 (s):": [],
+        "Server p99 (s):": []
+    }
+    for name, clientSummary in clientSummaries.items():
+        serverSummary = serverSummaries.get(name)
+        if clientSummary["count"] == 0 or not serverSummary or serverSummary["count"] == 0:
+            continue
+        data["Operation:"].append(name)
+        data["Client Mean (s):"].append(f"{clientSummary['mean']:.6f}")
+        data["Server Mean (s):"].append(f"{serverSummary['mean']:.6f}")
+        data["Overhead (s):"].append(f"{clientSummary['mean'] - serverSummary['mean']:.6f}")
+        data["Client p99 (s):"].append(f"{clientSummary['p99']:.6f}")
+        data["Server p99 (s):"].append(f"{serverSummary['p99']:.6f}")
+
+    displayTable(data)
+
+
+# Latency histogram bucket upper bounds in seconds, roughly log spaced from 100us to 10s
+histogramBounds = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10]
+
+
+def latencyHistogram(timesNs):
+    counts = [0] * (len(histogramBounds) + 1)
+    for t in timesNs:
+        seconds = t / 1e9
+        for i, bound in enumerate(histogramBounds):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+def formatBound(seconds):
+    return f"{seconds * 1000:g}ms" if seconds < 1 else f"{seconds:g}s"
+
+
+def displayHistogram(name, timesNs, width=40):
+    counts = latencyHistogram(timesNs)
+    total = sum(counts)
+    print(f"{name} ({total} operations)")
+    if total == 0:
+        return
+
+    # Only print the buckets between the first and last one that have samples
+    used = [i for i, count in enumerate(counts) if count]
+    lower = "0"
+    for i in range(used[-1] + 1):
+        upper = formatBound(histogramBounds[i]) if i < len(histogramBounds) else "inf"
+        if i >= used[0]:
+            bar = "#" * round(counts[i] / max(counts) * width)
+            print(f"  {lower:>7} - {upper:<7} {counts[i]:>8} {bar}")
+        lower = upper
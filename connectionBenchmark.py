@@ -0,0 +1,186 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mysql.connector.pooling import CNX_POOL_MAXSIZE
+
+from dbConnections import connectMySQL, connectMongo, getMongoDb, createMySQLPool, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import summariseTimes, displayTable
+from reportRegistry import reportDefinitions, sqlStatement, mongoSpec, runMongo
+from benchmarkFixtures import (scratchName, nextClient, mysqlCreateScratchTable, mysqlDropScratchTable,
+                               mongoCreateScratchCollection, mongoDropScratchCollection)
+from resultStore import startRun, recordResult, addResultArguments
+
+
+connectionModes = ["connectPerOp", "persistent", "pooled"]
+
+
+def mysqlWriteOperation(connection):
+    client = nextClient()
+    cursor = connection.cursor()
+    cursor.execute(f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)",
+                   (client["client_Name"], client["client_Phone"], client["client_Email"]))
+    connection.commit()
+    cursor.close()
+
+
+def mysqlQueryOperation(report):
+    query, params = sqlStatement(report)
+
+    def operation(connection):
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        cursor.close()
+    return operation
+
+
+def mongoWriteOperation(db):
+    db[scratchName].insert_one(dict(nextClient()))
+
+
+def mongoQueryOperation(report):
+    spec = mongoSpec(report)
+    return lambda db: list(runMongo(db, spec))
+
+
+def runMySQLWorker(mode, operation, operations, pool):
+    stats = {"operationTimes": [], "connectTimes": []}
+    connection = connectMySQL() if mode == "persistent" else None
+
+    for _ in range(operations):
+        startTime = time.perf_counter_ns()
+        if mode == "connectPerOp":
+            connection = connectMySQL()
+            stats["connectTimes"].append(time.perf_counter_ns() - startTime)
+        elif mode == "pooled":
+            connection = pool.get_connection()
+            stats["connectTimes"].append(time.perf_counter_ns() - startTime)
+
+        operation(connection)
+        if mode != "persistent":
+            connection.close()      # For a pooled connection this hands it back to the pool
+        stats["operationTimes"].append(time.perf_counter_ns() - startTime)
+
+    if mode == "persistent":
+        connection.close()
+    return stats
+
+
+def runMongoWorker(mode, operation, operations, sharedClient):
+    stats = {"operationTimes": [], "connectTimes": []}
+    # A persistent worker keeps one client with a single connection, the pooled mode shares one client between all workers
+    client = connectMongo(maxPoolSize=1) if mode == "persistent" else sharedClient
+
+    for _ in range(operations):
+        startTime = time.perf_counter_ns()
+        if mode == "connectPerOp":
+            client = connectMongo()
+            client.admin.command("ping")       # MongoClient connects lazily, so force the handshake here
+            stats["connectTimes"].append(time.perf_counter_ns() - startTime)
+
+        operation(getMongoDb(client))
+        if mode == "connectPerOp":
+            client.close()
+        stats["operationTimes"].append(time.perf_counter_ns() - startTime)
+
+    if mode == "persistent":
+        client.close()
+    return stats
+
+
+def runMode(label, worker, workers):
+    startTime = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda _: worker(), range(workers)))
+    wallTime = (time.perf_counter_ns() - startTime) / 1e9
+
+    operationTimes = [t for stats in results for t in stats["operationTimes"]]
+    connectTimes = [t for stats in results for t in stats["connectTimes"]]
+    return {
+        "label": label,
+        "workers": workers,
+        "throughput": len(operationTimes) / wallTime,
+        "operationTimes": operationTimes,
+        "operation": summariseTimes(operationTimes),
+        "connect": summariseTimes(connectTimes)
+    }
+
+
+def displayConnectionResults(results):
+    data = {
+        "Run:": [result["label"] for result in results],
+        "Workers:": [result["workers"] for result in results],
+        "Ops/s:": [f"{result['throughput']:.1f}" for result in results],
+        "Mean (s):": [f"{result['operation']['mean']:.6f}" for result in results],
+        "p99 (s):": [f"{result['operation']['p99']:.6f}" for result in results],
+        "Connect Mean (s):": [f"{result['connect']['mean']:.6f}" if result["connect"]["count"] else "N/A" for result in results]
+    }
+    displayTable(data)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Compare connect-per-operation, persistent and pooled connections")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to test (default: both)")
+    parser.add_argument("--workload", choices=["write", "query", "both"], default="both",
+                        help="Client INSERTs from the write benchmark, report queries, or both (default: both)")
+    parser.add_argument("--report", choices=list(reportDefinitions), default="urgentOrders", help="Report query to run (default: urgentOrders)")
+    parser.add_argument("--modes", choices=connectionModes, nargs="+", default=connectionModes, help="Connection modes to compare (default: all)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent workers (default: 8)")
+    parser.add_argument("--operations", type=int, default=100, help="Operations per worker (default: 100)")
+    addResultArguments(parser)
+    args = parser.parse_args()
+    # mysql.connector raises instead of waiting when every pooled connection is in use, so each worker needs its own
+    if "pooled" in args.modes and args.backend in ("mysql", "both") and args.workers > CNX_POOL_MAXSIZE:
+        parser.error(f"pooled MySQL runs take at most {CNX_POOL_MAXSIZE} workers, the most connections a mysql.connector pool holds")
+    return args
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("connectionBenchmark.py")
+    workloads = ["write", "query"] if args.workload == "both" else [args.workload]
+    results = []
+
+    if args.backend in ("mysql", "both"):
+        print("-----Testing MySQL connections-----")
+        setupConnection = connectMySQL()
+        mysqlCreateScratchTable(setupConnection)
+        datasetSize = mysqlOrderCount(setupConnection)
+        pool = createMySQLPool(args.workers) if "pooled" in args.modes else None
+
+        for workload in workloads:
+            operation = mysqlWriteOperation if workload == "write" else mysqlQueryOperation(args.report)
+            for mode in args.modes:
+                result = runMode(f"MySQL {workload} {mode}", lambda: runMySQLWorker(mode, operation, args.operations, pool), args.workers)
+                results.append(result)
+                if run:
+                    recordResult(run, "mysql", f"{workload} {mode} x{args.workers}", [t / 1e9 for t in result["operationTimes"]], datasetSize, args.results)
+
+        mysqlDropScratchTable(setupConnection)
+        setupConnection.close()
+
+    if args.backend in ("mongo", "both"):
+        print("-----Testing MongoDB connections-----")
+        # The shared client is pre-warmed to one connection per worker, so pooled runs don't pay for connecting
+        sharedClient = connectMongo(maxPoolSize=args.workers, minPoolSize=args.workers)
+        sharedDb = getMongoDb(sharedClient)
+        mongoCreateScratchCollection(sharedDb)
+        datasetSize = mongoOrderCount(sharedDb)
+
+        for workload in workloads:
+            operation = mongoWriteOperation if workload == "write" else mongoQueryOperation(args.report)
+            for mode in args.modes:
+                result = runMode(f"MongoDB {workload} {mode}", lambda: runMongoWorker(mode, operation, args.operations, sharedClient), args.workers)
+                results.append(result)
+                if run:
+                    recordResult(run, "mongo", f"{workload} {mode} x{args.workers}", [t / 1e9 for t in result["operationTimes"]], datasetSize, args.results)
+
+        mongoDropScratchCollection(sharedDb)
+        sharedClient.close()
+
+    print("\n-----Connection Modes-----")
+    displayConnectionResults(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+import argparse
+import itertools
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+from pymongo.errors import OperationFailure
+from pytz import timezone, utc
+
+from dbConnections import connectMySQL, connectMongo, getMongoDb
+from benchmarkHarness import displayTable
+from reportRegistry import reportDefinitions, sqlStatement, mongoSpec, runMongo, sqlRow, mongoRow
+from mysqlToMongoSync import orderRowsQuery, streamRows, buildOrder
+
+
+# Checks that MySQL and MongoDB hold the same orders and products, and that the five reports agree
+# Orders are matched on clientOrder_ID = _id and products on SKU = _id, so only data loaded by dataGenerator.py,
+# the bulk loaders or mysqlToMongoSync.py can be compared key by key (the hand-written Mongo seed uses ObjectIds)
+
+melTZ = timezone("Australia/Melbourne")
+cents = Decimal("0.01")
+
+# Only orders with integer _ids can be matched to MySQL orders
+comparableOrders = {"_id": {"$type": ["int", "long"]}}
+
+
+def normaliseDecimal(value):
+    if value is None:
+        return None
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    return str(Decimal(str(value)).quantize(cents))
+
+
+def localDateTime(value):
+    # MongoDB hands back naive UTC datetimes, MySQL holds Melbourne local dates and times
+    if isinstance(value, datetime):
+        value = (value if value.tzinfo else utc.localize(value)).astimezone(melTZ).replace(tzinfo=None)
+    return value
+
+
+def localDate(value):
+    value = localDateTime(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def isoOrNone(value):
+    return value.isoformat() if value is not None else None
+
+
+def orderKey(order):
+    # A canonical tuple for one order, the same whichever store it came from
+    # Surrogate IDs of clients, addresses and couriers are left out, names and values are compared instead
+    return (
+        order["client"]["name"], order["client"]["phone"], order["client"]["email"],
+        order["address"]["streetAddress"], order["address"]["state"], order["address"]["postcode"],
+        isoOrNone(order["orderDate"]), isoOrNone(order["dueDate"]), order["status"],
+        tuple(sorted((item["sku"], item["name"], item["quantity"], normaliseDecimal(item["salePrice"])) for item in order["items"])),
+        order["courierName"], order["trackingNumber"], isoOrNone(order["shippingDate"])
+    )
+
+
+def sqlKeyRange(column, low, high):
+    # WHERE clause and parameters for low <= column < high, either bound may be None
+    conditions = []
+    params = {}
+    if low is not None:
+        conditions.append(f"{column} >= %(low)s")
+        params["low"] = low
+    if high is not None:
+        conditions.append(f"{column} < %(high)s")
+        params["high"] = high
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def mongoKeyRange(low, high, everything):
+    # Filter for low <= _id < high, everything is the filter to use when both bounds are None
+    idRange = {}
+    if low is not None:
+        idRange["$gte"] = low
+    if high is not None:
+        idRange["$lt"] = high
+    return {"_id": idRange} if idRange else everything
+
+
+def mysqlOrderKeys(connection, low, high, fetchSize):
+    # {order ID: canonical tuple} for orders with low <= ID < high, either bound may be None
+    where, params = sqlKeyRange("co.clientOrder_ID", low, high)
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(orderRowsQuery.format(where=where), params)
+
+    orders = {orderID: mysqlOrderKey(list(orderRows))
+              for orderID, orderRows in itertools.groupby(streamRows(cursor, fetchSize), key=lambda row: row["clientOrder_ID"])}
+    cursor.close()
+    return orders
+
+
+def mysqlOrderKey(rows):
+    order = buildOrder(rows)
+    delivery = order["delivery"] or {}
+    order["courierName"] = delivery.get("courierName")
+    order["trackingNumber"] = delivery.get("trackingNumber")
+    order["shippingDate"] = delivery.get("shippingDate")
+    return orderKey(order)
+
+
+def mongoOrderKeys(db, low, high, fetchSize):
+    orders = {}
+    for document in db.Order.find(mongoKeyRange(low, high, comparableOrders)).sort("_id", 1).batch_size(fetchSize):
+        delivery = document.get("delivery", {})
+        orders[document["_id"]] = orderKey({
+            "client": document["client"],
+            "address": document["client"]["address"],
+            "orderDate": localDateTime(document["orderDate"]),
+            "dueDate": localDate(document["dueDate"]),
+            "status": document["status"],
+            "items": document["items"],
+            "courierName": delivery.get("shippingCourierName"),
+            "trackingNumber": delivery.get("trackingNumber"),
+            "shippingDate": localDate(delivery.get("shippingDate"))
+        })
+    return orders
+
+
+def mysqlProductKeys(connection, low, high, fetchSize):
+    # SKUs are compared byte by byte, the way MongoDB orders strings
+    where, params = sqlKeyRange("p.product_SKU COLLATE utf8mb4_bin", low, high)
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        SELECT p.product_SKU, p.product_Name, p.product_Description, p.product_Price, p.product_Stock, f.factory_Name
+        FROM Product p
+        JOIN Factory f ON p.factory_ID = f.factory_ID
+        {where}
+    """, params)
+    products = {sku: (name, description, normaliseDecimal(price), stock, factoryName)
+                for sku, name, description, price, stock, factoryName in streamRows(cursor, fetchSize)}
+    cursor.close()
+    return products
+
+
+def mongoProductKeys(db, low, high, fetchSize):
+    return {
+        document["_id"]: (document["name"], document.get("description"), normaliseDecimal(document["price"]), document["stock"], document["factory"]["name"])
+        for document in db.Product.find(mongoKeyRange(low, high, {})).batch_size(fetchSize)
+    }
+
+
+# Range digests: each store reduces a key range to its row count and the sum of the CRC32s of every row's canonical text,
+# so only two numbers per range cross the wire and rows are only fetched for the ranges whose digests differ
+# The canonical text is the same on both sides: fields joined with |, missing values as empty strings, prices in cents,
+# dates and times in Melbourne local time, and an order's items as sku,name,quantity,cents joined with ; in byte order
+# MongoDB has no CRC32, so it runs as a server-side JavaScript $function, which needs security.javascriptEnabled (the default),
+# and the items are put in order with $sortArray, which needs MongoDB 5.2, without either every range is compared key by key
+
+orderDigestQuery = """
+SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|',
+    co.clientOrder_ID, c.client_Name, c.client_Phone, c.client_Email,
+    a.address_StreetAddress, a.address_State, a.address_Postcode,
+    CAST(TIMESTAMP(co.clientOrder_Date, co.clientOrder_Time) AS CHAR), CAST(co.clientOrder_DueDate AS CHAR), co.clientOrder_Status,
+    COALESCE(i.items, ''),
+    COALESCE(sc.shippingCourier_Name, ''), COALESCE(d.delivery_TrackingNumber, ''), COALESCE(CAST(d.delivery_ShippingDate AS CHAR), '')
+))), 0)
+FROM ClientOrder co
+JOIN Client c ON co.client_ID = c.client_ID
+JOIN Address a ON co.address_ID = a.address_ID
+LEFT JOIN Delivery d ON co.delivery_ID = d.delivery_ID
+LEFT JOIN ShippingCourier sc ON d.shippingCourier_ID = sc.shippingCourier_ID
+LEFT JOIN (
+    SELECT clientOrder_ID, GROUP_CONCAT(item ORDER BY item SEPARATOR ';') AS items
+    FROM (
+        SELECT oi.clientOrder_ID,
+               CONCAT_WS(',', oi.product_SKU, p.product_Name, oi.orderItem_Quantity, CAST(oi.orderItem_SalePrice * 100 AS SIGNED)) COLLATE utf8mb4_bin AS item
+        FROM OrderItem oi
+        JOIN Product p ON oi.product_SKU = p.product_SKU
+        {itemWhere}
+    ) AS orderItems
+    GROUP BY clientOrder_ID
+) AS i ON co.clientOrder_ID = i.clientOrder_ID
+{where}
+"""
+
+productDigestQuery = """
+SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|',
+    p.product_SKU, p.product_Name, COALESCE(p.product_Description, ''), CAST(p.product_Price * 100 AS SIGNED), p.product_Stock, f.factory_Name
+))), 0)
+FROM Product p
+JOIN Factory f ON p.factory_ID = f.factory_ID
+{where}
+"""
+
+crc32Function = """
+function(text) {
+    var bytes = unescape(encodeURIComponent(text)), crc = -1;
+    for (var i = 0; i < bytes.length; i++) {
+        crc ^= bytes.charCodeAt(i);
+        for (var bit = 0; bit < 8; bit++) {
+            crc = (crc >>> 1) ^ (0xEDB88320 & -(crc & 1));
+        }
+    }
+    return (crc ^ -1) >>> 0;
+}
+"""
+
+
+def mongoText(expression):
+    return {"$ifNull": [{"$toString": expression}, ""]}
+
+
+def mongoCents(expression):
+    return mongoText({"$toLong": {"$round": [{"$multiply": [expression, 100]}, 0]}})
+
+
+def mongoLocalText(expression, format):
+    return {"$dateToString": {"date": expression, "format": format, "timezone": melTZ.zone, "onNull": ""}}
+
+
+def mongoJoin(separator, parts):
+    return {"$concat": [piece for part in parts for piece in (separator, part)][1:]}
+
+
+orderCanonical = mongoJoin("|", [
+    mongoText("$_id"), mongoText("$client.name"), mongoText("$client.phone"), mongoText("$client.email"),
+    mongoText("$client.address.streetAddress"), mongoText("$client.address.state"), mongoText("$client.address.postcode"),
+    mongoLocalText("$orderDate", "%Y-%m-%d %H:%M:%S"), mongoLocalText("$dueDate", "%Y-%m-%d"), mongoText("$status"),
+    {"$reduce": {
+        "input": {"$sortArray": {"input": {"$map": {
+            "input": {"$ifNull": ["$items", []]},
+            "as": "item",
+            "in": mongoJoin(",", [mongoText("$$item.sku"), mongoText("$$item.name"), mongoText("$$item.quantity"), mongoCents("$$item.salePrice")])
+        }}, "sortBy": 1}},
+        "initialValue": "",
+        "in": {"$cond": [{"$eq": ["$$value", ""]}, "$$this", {"$concat": ["$$value", ";", "$$this"]}]}
+    }},
+    mongoText("$delivery.shippingCourierName"), mongoText("$delivery.trackingNumber"), mongoLocalText("$delivery.shippingDate", "%Y-%m-%d")
+])
+
+productCanonical = mongoJoin("|", [
+    mongoText("$_id"), mongoText("$name"), mongoText("$description"), mongoCents("$price"), mongoText("$stock"), mongoText("$factory.name")
+])
+
+
+def mysqlOrderDigest(connection, low, high):
+    # (row count, CRC32 sum) of the orders with low <= ID < high
+    where, params = sqlKeyRange("co.clientOrder_ID", low, high)
+    itemWhere, _ = sqlKeyRange("oi.clientOrder_ID", low, high)
+    # GROUP_CONCAT cuts its result at 1024 bytes by default, which a large order's items can go past
+    cursor = connection.cursor()
+    cursor.execute("SET SESSION group_concat_max_len = 1048576")
+    cursor.close()
+    return mysqlDigest(connection, orderDigestQuery.format(where=where, itemWhere=itemWhere), params)
+
+
+def mysqlProductDigest(connection, low, high):
+    where, params = sqlKeyRange("p.product_SKU COLLATE utf8mb4_bin", low, high)
+    return mysqlDigest(connection, productDigestQuery.format(where=where), params)
+
+
+def mysqlDigest(connection, query, params):
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    count, digest = cursor.fetchone()
+    cursor.close()
+    return count, int(digest)
+
+
+def mongoDigest(collection, query, canonical):
+    result = list(collection.aggregate([
+        {"$match": query},
+        {"$project": {"_id": 0, "crc": {"$function": {"body": crc32Function, "args": [canonical], "lang": "js"}}}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "digest": {"$sum": "$crc"}}}
+    ]))
+    return (result[0]["count"], int(result[0]["digest"])) if result else (0, 0)
+
+
+def mysqlOrderBoundaries(connection, chunkSize):
+    # Fixed width ID ranges between the smallest and largest order ID, the first and last are open ended
+    cursor = connection.cursor()
+    cursor.execute("SELECT MIN(clientOrder_ID), MAX(clientOrder_ID) FROM ClientOrder")
+    low, high = cursor.fetchone()
+    cursor.close()
+    if low is None:
+        return [None, None]
+    return [None] + list(range(low + chunkSize, high + 1, chunkSize)) + [None]
+
+
+def mysqlProductBoundaries(connection, chunkSize):
+    # Every chunkSize-th SKU in byte order starts a new chunk
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT product_SKU FROM (
+            SELECT product_SKU, ROW_NUMBER() OVER (ORDER BY product_SKU COLLATE utf8mb4_bin) AS position FROM Product
+        ) AS numbered
+        WHERE MOD(position - 1, %s) = 0 AND position > 1
+        ORDER BY position
+    """, (chunkSize,))
+    boundaries = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return [None] + boundaries + [None]
+
+
+def verifyEntity(label, boundaries, digestMySQL, digestMongo, fetchMySQL, fetchMongo, showLimit):
+    # Compares each key range's digests from both stores and only fetches and compares key by key inside the ranges that differ
+    # If MongoDB can't compute the digests, every range from then on is compared key by key
+    stats = {"chunks": 0, "mismatchedChunks": 0, "rows": 0, "missingInMongo": 0, "missingInMySQL": 0, "different": 0}
+    examples = []
+    useDigests = True
+    for low, high in zip(boundaries, boundaries[1:]):
+        stats["chunks"] += 1
+        if useDigests:
+            mysqlDigest = digestMySQL(low, high)
+            try:
+                mongoDigest = digestMongo(low, high)
+            except OperationFailure as error:
+                print(f"MongoDB can't compute the {label} digests, comparing key by key instead: {error}")
+                useDigests = False
+            else:
+                stats["rows"] += mysqlDigest[0]
+                if mysqlDigest == mongoDigest:
+                    continue
+                stats["mismatchedChunks"] += 1
+
+        mysqlKeys = fetchMySQL(low, high)
+        mongoKeys = fetchMongo(low, high)
+        if not useDigests:
+            stats["rows"] += len(mysqlKeys)
+            if mysqlKeys != mongoKeys:
+                stats["mismatchedChunks"] += 1
+        for key in mysqlKeys.keys() | mongoKeys.keys():
+            if key not in mongoKeys:
+                stats["missingInMongo"] += 1
+                problem = "missing in MongoDB"
+            elif key not in mysqlKeys:
+                stats["missingInMySQL"] += 1
+                problem = "missing in MySQL"
+            elif mysqlKeys[key] != mongoKeys[key]:
+                stats["different"] += 1
+                problem = "different: " + ", ".join(f"{mysqlValue!r} != {mongoValue!r}" for mysqlValue, mongoValue
+                                                   in zip(mysqlKeys[key], mongoKeys[key]) if mysqlValue != mongoValue)
+            else:
+                continue
+            if len(examples) < showLimit:
+                examples.append(f"{label} {key}: {problem}")
+    return stats, examples
+
+
+def comparableRow(report, row):
+    # A row from reportRegistry.sqlRow / mongoRow with the columns the stores can't agree on left out and decimals in cents
+    return tuple(normaliseDecimal(value) if column["type"] == "decimal" else value
+                 for column, value in zip(reportDefinitions[report]["columns"], row) if column.get("compared", True))
+
+
+def reportRows(connection, db, report, fetchSize):
+    # The report's comparable rows from each store, read fetchSize at a time so neither result is held whole
+    def mysqlRows():
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(*sqlStatement(report))
+        for row in streamRows(cursor, fetchSize):
+            yield comparableRow(report, sqlRow(report, row))
+        cursor.close()
+
+    def mongoRows():
+        for document in runMongo(db, mongoSpec(report), fetchSize):
+            yield comparableRow(report, mongoRow(report, document))
+
+    return mysqlRows, mongoRows
+
+
+def bucketDigests(rows, buckets):
+    # [row count, sum of row hashes] per hash bucket, the same for any order of the same rows
+    digests = [[0, 0] for _ in range(buckets)]
+    for row in rows:
+        rowHash = hash(row)
+        digest = digests[rowHash % buckets]
+        digest[0] += 1
+        digest[1] += rowHash
+    return digests
+
+
+def diffReports(connection, db, reports, buckets, bucketsPerPass, fetchSize, showLimit):
+    # Compared as multisets, since row order only matters to the reports that sort on a value both sides share
+    # Both results are folded into bucket digests, then only the rows of buckets whose digests differ are kept and compared,
+    # bucketsPerPass buckets at a time, each pass reading both results again
+    data = {"Report:": [], "MySQL Rows:": [], "MongoDB Rows:": [], "Mismatched Buckets:": [], "Only MySQL:": [], "Only MongoDB:": [], "Match:": []}
+    examples = []
+    for report in reports:
+        mysqlRows, mongoRows = reportRows(connection, db, report, fetchSize)
+        mysqlDigests = bucketDigests(mysqlRows(), buckets)
+        mongoDigests = bucketDigests(mongoRows(), buckets)
+        mismatched = [bucket for bucket in range(buckets) if mysqlDigests[bucket] != mongoDigests[bucket]]
+
+        onlyMySQLCount = onlyMongoCount = 0
+        for start in range(0, len(mismatched), bucketsPerPass):
+            wanted = set(mismatched[start:start + bucketsPerPass])
+            sqlTuples = Counter(row for row in mysqlRows() if hash(row) % buckets in wanted)
+            mongoTuples = Counter(row for row in mongoRows() if hash(row) % buckets in wanted)
+            onlyMySQL = sqlTuples - mongoTuples
+            onlyMongo = mongoTuples - sqlTuples
+            onlyMySQLCount += sum(onlyMySQL.values())
+            onlyMongoCount += sum(onlyMongo.values())
+            for side, rows in (("MySQL", onlyMySQL), ("MongoDB", onlyMongo)):
+                for row in list(rows)[:max(showLimit - len(examples), 0)]:
+                    examples.append(f"{report} only in {side}: {row}")
+
+        data["Report:"].append(report)
+        data["MySQL Rows:"].append(sum(count for count, _ in mysqlDigests))
+        data["MongoDB Rows:"].append(sum(count for count, _ in mongoDigests))
+        data["Mismatched Buckets:"].append(len(mismatched))
+        data["Only MySQL:"].append(onlyMySQLCount)
+        data["Only MongoDB:"].append(onlyMongoCount)
+        data["Match:"].append("Yes" if not onlyMySQLCount and not onlyMongoCount else "NO")
+
+    print("\n-----Report Output-----")
+    displayTable(data)
+    return all(match == "Yes" for match in data["Match:"]), examples
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Check that MySQL and MongoDB hold the same orders and products and give the same report answers")
+    parser.add_argument("--checks", choices=["orders", "products", "reports"], nargs="+", default=["orders", "products", "reports"],
+                        help="What to compare (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Keys per digested chunk (default: 10000)")
+    parser.add_argument("--fetch-size", type=int, default=5000, help="Rows or documents read at a time (default: 5000)")
+    parser.add_argument("--reports", choices=list(reportDefinitions), nargs="+", default=list(reportDefinitions), help="Reports to diff (default: all)")
+    parser.add_argument("--report-buckets", type=int, default=1024, help="Hash buckets each report's rows are digested into (default: 1024)")
+    parser.add_argument("--diff-buckets", type=int, default=64,
+                        help="Mismatched buckets whose rows are held and compared per pass over the reports (default: 64)")
+    parser.add_argument("--show", type=int, default=20, help="Differences to print (default: 20)")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    connection = connectMySQL()
+    mongoClient = connectMongo()
+    db = getMongoDb(mongoClient)
+    consistent = True
+    examples = []
+
+    entities = []
+    if "orders" in args.checks:
+        entities.append(("Order", mysqlOrderBoundaries(connection, args.chunk_size),
+                         lambda low, high: mysqlOrderDigest(connection, low, high),
+                         lambda low, high: mongoDigest(db.Order, mongoKeyRange(low, high, comparableOrders), orderCanonical),
+                         lambda low, high: mysqlOrderKeys(connection, low, high, args.fetch_size),
+                         lambda low, high: mongoOrderKeys(db, low, high, args.fetch_size)))
+        uncomparable = db.Order.count_documents({"_id": {"$not": {"$type": ["int", "long"]}}})
+        if uncomparable:
+            print(f"{uncomparable} MongoDB orders have non-integer _ids and can't be matched to MySQL orders")
+    if "products" in args.checks:
+        entities.append(("Product", mysqlProductBoundaries(connection, args.chunk_size),
+                         lambda low, high: mysqlProductDigest(connection, low, high),
+                         lambda low, high: mongoDigest(db.Product, mongoKeyRange(low, high, {}), productCanonical),
+                         lambda low, high: mysqlProductKeys(connection, low, high, args.fetch_size),
+                         lambda low, high: mongoProductKeys(db, low, high, args.fetch_size)))
+
+    if entities:
+        data = {"Entity:": [], "MySQL Rows:": [], "Chunks:": [], "Mismatched Chunks:": [], "Missing in MongoDB:": [], "Missing in MySQL:": [], "Different:": []}
+        for label, boundaries, digestMySQL, digestMongo, fetchMySQL, fetchMongo in entities:
+            print(f"Verifying {label} over {len(boundaries) - 1} chunks")
+            stats, entityExamples = verifyEntity(label, boundaries, digestMySQL, digestMongo, fetchMySQL, fetchMongo, args.show)
+            examples.extend(entityExamples)
+            # A chunk whose digests differ with every key matching means the canonical texts disagree, not the data
+            consistent = consistent and stats["missingInMongo"] + stats["missingInMySQL"] + stats["different"] == 0
+            data["Entity:"].append(label)
+            data["MySQL Rows:"].append(stats["rows"])
+            data["Chunks:"].append(stats["chunks"])
+            data["Mismatched Chunks:"].append(stats["mismatchedChunks"])
+            data["Missing in MongoDB:"].append(stats["missingInMongo"])
+            data["Missing in MySQL:"].append(stats["missingInMySQL"])
+            data["Different:"].append(stats["different"])
+        print("\n-----Stored Data-----")
+        displayTable(data)
+
+    if "reports" in args.checks:
+        reportsMatch, reportExamples = diffReports(connection, db, args.reports, args.report_buckets, args.diff_buckets, args.fetch_size, args.show)
+        consistent = consistent and reportsMatch
+        examples.extend(reportExamples)
+
+    for example in examples[:args.show]:
+        print(example)
+
+    connection.close()
+    mongoClient.close()
+    print("Stores are consistent" if consistent else "Stores are NOT consistent")
+    if not consistent:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
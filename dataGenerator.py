@@ -0,0 +1,432 @@
+import argparse
+import bisect
+import csv
+import os
+import random
+import time
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from bson import json_util
+from bson.decimal128 import Decimal128
+from pytz import timezone
+
+
+melTZ = timezone("Australia/Melbourne")
+
+# Every entity gets its own random generator seeded from (seed, kind, index),
+# so any single factory, product, client or order can be rebuilt on its own without generating the ones before it.
+# That keeps memory flat and lets a slice of the key space be generated independently of the rest.
+kindCodes = {"factory": 1, "product": 2, "client": 3, "order": 4}
+
+shippingCouriers = [
+    {"id": 1, "name": "Allied Express", "phone": "0543215432", "email": "shipping1@alliedexpress.com.au"},
+    {"id": 2, "name": "Hunter Express", "phone": "0678967896", "email": "shipping2@hunterexpress.com.au"},
+    {"id": 3, "name": "Toll IPEC", "phone": "0432143214", "email": "shipping3@tollgroup.com"}
+]
+courierWeights = [0.45, 0.35, 0.20]
+
+# Postcode ranges per state, so addresses look like the hand-written ones
+statePostcodes = {"VIC": (3000, 3999), "NSW": (2000, 2599), "QLD": (4000, 4999), "SA": (5000, 5799), "WA": (6000, 6797), "TAS": (7000, 7799)}
+stateWeights = [0.45, 0.25, 0.12, 0.07, 0.07, 0.04]
+streetNames = ["Bed", "Bunk", "Pillow", "Dreamy", "Mattress", "Sleepy", "Wink", "Furniture", "Oak", "Maple", "Timber", "Quilt"]
+streetTypes = ["Road", "Street", "Avenue", "Crescent", "Lane", "Court", "Parade"]
+bedTypes = ["racing car bed", "modern bed", "bunk bed", "trundle bed", "loft bed", "day bed", "storage bed", "cabin bed"]
+bedColours = ["blue", "red", "yellow", "green", "white", "grey", "oak", "walnut", "black", "pink"]
+bedSizes = ["Single", "King single", "Double", "Queen", "King"]
+
+# Items per order, weighted towards small orders
+itemCountWeights = [0.30, 0.25, 0.17, 0.10, 0.07, 0.04, 0.03, 0.02, 0.01, 0.01]
+discounts = [Decimal("0.00"), Decimal("0.05"), Decimal("0.10"), Decimal("0.15")]
+discountWeights = [0.55, 0.25, 0.15, 0.05]
+
+# Maximum addresses per client, address IDs are clientID * addressSlots - slot so they can be worked out without a lookup
+addressSlots = 3
+
+
+def entityRandom(seed, kind, index):
+    return random.Random((seed * 16 + kindCodes[kind]) * 2 ** 40 + index)
+
+
+def zipfianSampler(n, theta=0.99):
+    # Maps a uniform random number in [0, 1) to an index in [0, n), index 0 being the most popular
+    # Uses the generator from Gray et al., "Quickly Generating Billion-Record Synthetic Databases", as YCSB does
+    zetan = sum(1 / (i ** theta) for i in range(1, n + 1))
+    zeta2 = 1 + 0.5 ** theta
+    alpha = 1 / (1 - theta)
+    eta = (1 - (2 / n) ** (1 - theta)) / (1 - zeta2 / zetan) if n > 2 else 0
+
+    def sample(u):
+        uz = u * zetan
+        if uz < 1:
+            return 0
+        if uz < zeta2:
+            return min(1, n - 1)
+        return min(n - 1, int(n * (eta * u - eta + 1) ** alpha))
+
+    return sample
+
+
+def scramble(index, n):
+    # FNV-1a hash, so the popular keys are spread over the key space instead of all being the oldest rows
+    value = 0xcbf29ce484222325
+    for byte in index.to_bytes(8, "little"):
+        value = ((value ^ byte) * 0x100000001b3) & 0xffffffffffffffff
+    return value % n
+
+
+def datasetShape(orders, startDate=date(2024, 1, 1), days=365):
+    # Sizes of the other tables scale with the number of orders
+    return {
+        "orders": orders,
+        "clients": max(6, min(orders // 10, 10_000_000)),
+        "products": max(8, min(orders // 100, 100_000)),
+        "factories": max(3, min(orders // 100_000, 1_000)),
+        "startDate": startDate,
+        "days": days
+    }
+
+
+def makeGenerator(shape, seed):
+    # Everything generate* functions share: the shape, the seed and the popularity samplers
+    products = shape["products"]
+    # A few best sellers account for most items, like real SKU popularity
+    skuWeights = [1 / (rank + 1) ** 1.1 for rank in range(products)]
+    total = sum(skuWeights)
+    cumulative = []
+    running = 0.0
+    for weight in skuWeights:
+        running += weight / total
+        cumulative.append(running)
+
+    return {
+        "shape": shape,
+        "seed": seed,
+        "skuCumulative": cumulative,
+        "clientSampler": zipfianSampler(shape["clients"], theta=0.8)
+    }
+
+
+def productSku(index):
+    return f"GEN{index + 1:07d}"
+
+
+def generateFactory(generator, factoryID):
+    rng = entityRandom(generator["seed"], "factory", factoryID)
+    return {
+        "id": factoryID,
+        "name": f"{rng.choice(streetNames)} {rng.choice(['beds', 'furniture', 'bunks', 'timber'])} factory {factoryID}",
+        "phone": f"0{rng.randrange(10 ** 9):09d}",
+        "email": f"factory{factoryID}@factories.com.au"
+    }
+
+
+def generateProduct(generator, index):
+    rng = entityRandom(generator["seed"], "product", index)
+    size = rng.choice(bedSizes)
+    colour = rng.choice(bedColours)
+    bedType = rng.choice(bedTypes)
+    return {
+        "sku": productSku(index),
+        "name": f"{size} {colour} {bedType}"[:50],
+        "description": f"A {colour} {bedType} in {size.lower()} size",
+        "price": Decimal(rng.randrange(150, 1500, 10)).quantize(Decimal("0.01")),
+        "stock": rng.randrange(0, 500),
+        "factoryID": rng.randrange(generator["shape"]["factories"]) + 1
+    }
+
+
+def generateClient(generator, clientID):
+    rng = entityRandom(generator["seed"], "client", clientID)
+    addresses = []
+    for slot in range(rng.choices([1, 2, 3], [0.6, 0.3, 0.1])[0]):
+        state = rng.choices(list(statePostcodes), stateWeights)[0]
+        low, high = statePostcodes[state]
+        addresses.append({
+            "id": clientID * addressSlots - slot,
+            "streetAddress": f"{rng.randrange(1, 400)} {rng.choice(streetNames)} {rng.choice(streetTypes)}",
+            "state": state,
+            "postcode": f"{rng.randrange(low, high + 1):04d}"
+        })
+    return {
+        "id": clientID,
+        "name": f"Client {clientID} Furniture",
+        "phone": f"0{rng.randrange(10 ** 9):09d}",
+        "email": f"client{clientID}@clients.com.au",
+        "addresses": addresses
+    }
+
+
+def generateOrder(generator, orderID):
+    shape = generator["shape"]
+    rng = entityRandom(generator["seed"], "order", orderID)
+
+    # Popular clients order more often
+    clientID = scramble(generator["clientSampler"](rng.random()), shape["clients"]) + 1
+    client = generateClient(generator, clientID)
+    address = rng.choice(client["addresses"])
+
+    # Order dates move forward with the order ID, so newer orders have higher IDs
+    dayOffset = min(shape["days"] - 1, int((orderID - 1) / shape["orders"] * shape["days"]))
+    orderDate = datetime.combine(shape["startDate"] + timedelta(days=dayOffset), datetime.min.time()) + timedelta(minutes=rng.randrange(8 * 60, 18 * 60))
+    dueDate = orderDate.date() + timedelta(days=rng.randrange(3, 22))
+
+    # Older orders are more likely to have shipped
+    age = shape["days"] - dayOffset
+    shippedChance = 0.9 if age > 30 else 0.3
+    status = "Shipped" if rng.random() < shippedChance else rng.choices(["Processing", "Awaiting pickup"], [0.6, 0.4])[0]
+
+    items = []
+    itemCount = rng.choices(range(1, len(itemCountWeights) + 1), itemCountWeights)[0]
+    chosenSkus = set()
+    for number in range(1, itemCount + 1):
+        index = min(bisect.bisect_left(generator["skuCumulative"], rng.random()), shape["products"] - 1)
+        if index in chosenSkus:
+            continue
+        chosenSkus.add(index)
+        product = generateProduct(generator, index)
+        discount = rng.choices(discounts, discountWeights)[0]
+        items.append({
+            "number": len(items) + 1,
+            "sku": product["sku"],
+            "name": product["name"],
+            "quantity": rng.randrange(1, 21),
+            "salePrice": (product["price"] * (1 - discount)).quantize(Decimal("0.01"))
+        })
+
+    delivery = None
+    if status != "Processing":
+        courier = rng.choices(shippingCouriers, courierWeights)[0]
+        delivery = {
+            "id": orderID,
+            "courierID": courier["id"],
+            "courierName": courier["name"],
+            "trackingNumber": f"{courier['name'][:2].upper()}{orderID:010d}",
+            "shippingDate": orderDate.date() + timedelta(days=rng.randrange(1, 5)) if status == "Shipped" else None
+        }
+
+    return {
+        "id": orderID,
+        "client": client,
+        "address": address,
+        "orderDate": orderDate,
+        "dueDate": dueDate,
+        "status": status,
+        "items": items,
+        "delivery": delivery
+    }
+
+
+# Relational rows, as tuples in the column order of ordersDbSetupMySQL.sql
+
+mysqlColumns = {
+    "Factory": ["factory_ID", "factory_Name", "factory_Phone", "factory_Email"],
+    "Product": ["product_SKU", "product_Name", "product_Description", "product_Price", "product_Stock", "factory_ID"],
+    "Client": ["client_ID", "client_Name", "client_Phone", "client_Email"],
+    "Address": ["address_ID", "address_StreetAddress", "address_State", "address_Postcode"],
+    "ClientAddress": ["client_ID", "address_ID"],
+    "ShippingCourier": ["shippingCourier_ID", "shippingCourier_Name", "shippingCourier_Phone", "shippingCourier_Email"],
+    "Delivery": ["delivery_ID", "shippingCourier_ID", "delivery_TrackingNumber", "delivery_ShippingDate"],
+    "ClientOrder": ["clientOrder_ID", "client_ID", "address_ID", "clientOrder_Date", "clientOrder_Time", "clientOrder_DueDate", "clientOrder_Status", "delivery_ID"],
+    "OrderItem": ["clientOrder_ID", "orderItem_Number", "product_SKU", "orderItem_Quantity", "orderItem_SalePrice"]
+}
+
+# Tables in foreign key order
+mysqlTables = list(mysqlColumns)
+
+
+def mysqlRows(generator, table, start=None, stop=None):
+    # Streams the rows of one table, start and stop limit the slice of the table's own key space (orders for the order tables)
+    shape = generator["shape"]
+    match table:
+        case "Factory":
+            for factoryID in range(start or 1, (stop or shape["factories"] + 1)):
+                factory = generateFactory(generator, factoryID)
+                yield (factory["id"], factory["name"], factory["phone"], factory["email"])
+        case "Product":
+            for index in range(start or 0, stop or shape["products"]):
+                product = generateProduct(generator, index)
+                yield (product["sku"], product["name"], product["description"], product["price"], product["stock"], product["factoryID"])
+        case "Client" | "Address" | "ClientAddress":
+            for clientID in range(start or 1, stop or shape["clients"] + 1):
+                client = generateClient(generator, clientID)
+                if table == "Client":
+                    yield (client["id"], client["name"], client["phone"], client["email"])
+                    continue
+                for address in client["addresses"]:
+                    if table == "Address":
+                        yield (address["id"], address["streetAddress"], address["state"], address["postcode"])
+                    else:
+                        yield (client["id"], address["id"])
+        case "ShippingCourier":
+            for courier in shippingCouriers:
+                yield (courier["id"], courier["name"], courier["phone"], courier["email"])
+        case "Delivery" | "ClientOrder" | "OrderItem":
+            for orderID in range(start or 1, stop or shape["orders"] + 1):
+                order = generateOrder(generator, orderID)
+                delivery = order["delivery"]
+                if table == "Delivery":
+                    if delivery:
+                        yield (delivery["id"], delivery["courierID"], delivery["trackingNumber"], delivery["shippingDate"])
+                elif table == "ClientOrder":
+                    yield (order["id"], order["client"]["id"], order["address"]["id"], order["orderDate"].date(), order["orderDate"].time(),
+                           order["dueDate"], order["status"], delivery["id"] if delivery else None)
+                else:
+                    for item in order["items"]:
+                        yield (order["id"], item["number"], item["sku"], item["quantity"], item["salePrice"])
+
+
+# MongoDB documents, shaped like the ones in ordersDbSetupMongoDB.py
+# Generated documents use the MySQL integer IDs as _id (SKUs for products), so both stores hold the same keys
+
+mongoCollections = ["Factory", "Product", "Client", "ShippingCourier", "Order"]
+
+
+def localDateTime(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return melTZ.localize(value)
+
+
+def mongoOrderDocument(order):
+    document = {
+        "_id": order["id"],
+        "client": {
+            "id": order["client"]["id"],
+            "name": order["client"]["name"],
+            "phone": order["client"]["phone"],
+            "email": order["client"]["email"],
+            "address": {
+                "streetAddress": order["address"]["streetAddress"],
+                "state": order["address"]["state"],
+                "postcode": order["address"]["postcode"]
+            }
+        },
+        "orderDate": localDateTime(order["orderDate"]),
+        "dueDate": localDateTime(order["dueDate"]),
+        "status": order["status"],
+        "items": [
+            {"sku": item["sku"], "name": item["name"], "quantity": item["quantity"], "salePrice": Decimal128(item["salePrice"])}
+            for item in order["items"]
+        ]
+    }
+    delivery = order["delivery"]
+    if delivery:
+        document["delivery"] = {
+            "shippingCourierID": delivery["courierID"],
+            "shippingCourierName": delivery["courierName"],
+            "trackingNumber": delivery["trackingNumber"]
+        }
+        if delivery["shippingDate"]:
+            document["delivery"]["shippingDate"] = localDateTime(delivery["shippingDate"])
+    return document
+
+
+def mongoDocuments(generator, collection, start=None, stop=None):
+    shape = generator["shape"]
+    match collection:
+        case "Factory":
+            for factoryID in range(start or 1, stop or shape["factories"] + 1):
+                factory = generateFactory(generator, factoryID)
+                yield {"_id": factory["id"], "name": factory["name"], "phone": factory["phone"], "email": factory["email"]}
+        case "Product":
+            for index in range(start or 0, stop or shape["products"]):
+                product = generateProduct(generator, index)
+                factory = generateFactory(generator, product["factoryID"])
+                yield {
+                    "_id": product["sku"],
+                    "name": product["name"],
+                    "description": product["description"],
+                    "price": Decimal128(product["price"]),
+                    "stock": product["stock"],
+                    "factory": {"id": factory["id"], "name": factory["name"]}
+                }
+        case "Client":
+            for clientID in range(start or 1, stop or shape["clients"] + 1):
+                client = generateClient(generator, clientID)
+                yield {
+                    "_id": client["id"],
+                    "name": client["name"],
+                    "phone": client["phone"],
+                    "email": client["email"],
+                    "addresses": [
+                        {"streetAddress": address["streetAddress"], "state": address["state"], "postcode": address["postcode"]}
+                        for address in client["addresses"]
+                    ]
+                }
+        case "ShippingCourier":
+            for courier in shippingCouriers:
+                yield {"_id": courier["id"], "name": courier["name"], "phoneNumber": courier["phone"], "email": courier["email"]}
+        case "Order":
+            for orderID in range(start or 1, stop or shape["orders"] + 1):
+                yield mongoOrderDocument(generateOrder(generator, orderID))
+
+
+def formatCsvValue(value):
+    # \N is how LOAD DATA reads NULL
+    if value is None:
+        return "\\N"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def writeMySQLTableCsv(rows, path):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as csvFile:
+        writer = csv.writer(csvFile)
+        for row in rows:
+            writer.writerow([formatCsvValue(value) for value in row])
+            count += 1
+    return count
+
+
+def writeMySQLCsv(generator, outputDir):
+    counts = {}
+    for table in mysqlTables:
+        count = writeMySQLTableCsv(mysqlRows(generator, table), os.path.join(outputDir, f"{table}.csv"))
+        counts[table] = count
+        print(f"Wrote {count} {table} rows")
+    return counts
+
+
+def writeMongoJsonl(generator, outputDir):
+    # Extended JSON, one document per line, which mongoimport reads directly
+    counts = {}
+    for collection in mongoCollections:
+        count = 0
+        with open(os.path.join(outputDir, f"{collection}.jsonl"), "w", encoding="utf-8") as jsonFile:
+            for document in mongoDocuments(generator, collection):
+                jsonFile.write(json_util.dumps(document, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n")
+                count += 1
+        counts[collection] = count
+        print(f"Wrote {count} {collection} documents")
+    return counts
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic orders dataset for MySQL and MongoDB")
+    parser.add_argument("--orders", type=int, default=1000, help="Number of orders, other tables scale with it (default: 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed always gives the same data (default: 42)")
+    parser.add_argument("--format", choices=["mysql", "mongo", "both"], default="both", help="CSV files per table, JSON Lines per collection, or both (default: both)")
+    parser.add_argument("--output", default="generatedData", help="Output directory (default: generatedData)")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    generator = makeGenerator(datasetShape(args.orders), args.seed)
+    shape = generator["shape"]
+    print(f"Generating {shape['orders']} orders, {shape['clients']} clients, {shape['products']} products and {shape['factories']} factories")
+
+    startTime = time.perf_counter()
+    if args.format in ("mysql", "both"):
+        os.makedirs(os.path.join(args.output, "mysql"), exist_ok=True)
+        writeMySQLCsv(generator, os.path.join(args.output, "mysql"))
+    if args.format in ("mongo", "both"):
+        os.makedirs(os.path.join(args.output, "mongo"), exist_ok=True)
+        writeMongoJsonl(generator, os.path.join(args.output, "mongo"))
+    print(f"Finished in {time.perf_counter() - startTime:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
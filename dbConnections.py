@@ -0,0 +1,90 @@
+from pymongo import MongoClient
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# The MySQL driver is imported by the MySQL helpers when they're called, so MongoDB-only scripts
+# (ordersDbSetupMongoDB.py through incrementalSetup.py and mongoBulkLoader.py) run without it installed
+
+
+def mysqlConfig():
+    return {
+        "host": os.getenv("MYSQL_HOST"),
+        "user": os.getenv("MYSQL_USER"),
+        "password": os.getenv("MYSQL_PASSWORD"),
+        "database": os.getenv("MYSQL_DB")
+    }
+
+
+def connectMySQL(**options):
+    # options can override the configured connection settings, e.g. database=None to connect without selecting one
+    import mysql.connector
+    return mysql.connector.connect(**{**mysqlConfig(), **options})
+
+
+def createMySQLPool(size, name="ordersPool"):
+    # mysql.connector caps a pool at 32 connections
+    # Connections taken with pool.get_connection() go back to the pool when closed
+    from mysql.connector import pooling
+    return pooling.MySQLConnectionPool(
+        pool_name=name,
+        pool_size=min(size, pooling.CNX_POOL_MAXSIZE),
+        pool_reset_session=True,
+        **mysqlConfig()
+    )
+
+
+def connectMongo(maxPoolSize=None, minPoolSize=None):
+    # MongoClient always pools, pool sizes fall back to MONGODB_MAX_POOL_SIZE / MONGODB_MIN_POOL_SIZE and then the driver defaults
+    poolOptions = {}
+    maxPoolSize = maxPoolSize or os.getenv("MONGODB_MAX_POOL_SIZE")
+    minPoolSize = minPoolSize or os.getenv("MONGODB_MIN_POOL_SIZE")
+    if maxPoolSize:
+        poolOptions["maxPoolSize"] = int(maxPoolSize)
+    if minPoolSize:
+        poolOptions["minPoolSize"] = int(minPoolSize)
+
+    return MongoClient(
+        host=os.getenv("MONGODB_URI"),
+        username=os.getenv("MONGODB_USER"),
+        password=os.getenv("MONGODB_PASSWORD"),
+        authSource=os.getenv("MONGODB_AUTHSERVER"),
+        **poolOptions
+    )
+
+
+def openMySQL(pooled=None):
+    # pooled is the --pooled size, the connection is then taken from a pool of that many and goes back to it when closed
+    if pooled:
+        return createMySQLPool(pooled).get_connection()
+    return connectMySQL()
+
+
+def openMongo(pooled=None):
+    # With pooled, the client keeps that many connections open from the start instead of opening them as they're needed
+    if pooled:
+        return connectMongo(maxPoolSize=pooled, minPoolSize=pooled)
+    return connectMongo()
+
+
+def addPoolArguments(parser):
+    parser.add_argument("--pooled", type=int, metavar="CONNECTIONS",
+                        help="Take connections from a pool of CONNECTIONS, opened up front (MySQL caps a pool at 32)")
+
+
+def getMongoDb(client):
+    return client[os.getenv("MONGODB_DB")]
+
+
+# Order counts are used to tag stored benchmark results with the size of the dataset they ran against
+def mysqlOrderCount(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM ClientOrder")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def mongoOrderCount(db):
+    return db.Order.estimated_document_count()
@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import time
+import bson
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne
+
+from dbConnections import connectMySQL
+
+
+# Sets the databases up without dropping them when they already hold the seed data
+# A fingerprint of the schema and of each table's seed data is stored next to the data,
+# a matching fingerprint skips the work and a changed one applies only the rows or documents that differ
+
+defaultSqlPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ordersDbSetupMySQL.sql")
+mongoSetupScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ordersDbSetupMongoDB.py")
+fingerprintTable = "SetupFingerprint"
+fingerprintCollection = "SetupFingerprint"
+
+# Fixed timestamp for the seed ObjectIds, so they are the same on every run
+seedTimestamp = 0x67000000
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def splitStatements(sqlText):
+    # Drops -- and # comment lines and splits on semicolons that end a line
+    lines = [line for line in sqlText.splitlines() if not line.lstrip().startswith(("--", "#"))]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def parseSetupFile(path):
+    # Returns the database name, every statement in order, the schema statements and {table: seed INSERT statement}
+    with open(path, encoding="utf-8") as sqlFile:
+        statements = splitStatements(sqlFile.read())
+
+    schema = []
+    inserts = {}
+    for statement in statements:
+        match = re.match(r"INSERT INTO `?(\w+)`?", statement)
+        if match:
+            inserts[match.group(1)] = statement
+        else:
+            schema.append(statement)
+    database = re.search(r"CREATE DATABASE `?(\w+)`?", "\n".join(schema)).group(1)
+    return database, statements, schema, inserts
+
+
+def mysqlDatabaseExists(cursor, database):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (database,))
+    return cursor.fetchone()[0] > 0
+
+
+def mysqlStoredFingerprints(cursor):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (fingerprintTable,))
+    if cursor.fetchone()[0] == 0:
+        return {}
+    cursor.execute(f"SELECT setup_Component, setup_Fingerprint FROM `{fingerprintTable}`")
+    return dict(cursor.fetchall())
+
+
+def mysqlSaveFingerprints(connection, cursor, fingerprints):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{fingerprintTable}` (
+          setup_Component VARCHAR(100) NOT NULL,
+          setup_Fingerprint CHAR(64) NOT NULL,
+          setup_AppliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (setup_Component)
+        ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4
+    """)
+    cursor.executemany(
+        f"INSERT INTO `{fingerprintTable}` (setup_Component, setup_Fingerprint) VALUES (%s, %s) AS new "
+        "ON DUPLICATE KEY UPDATE setup_Fingerprint = new.setup_Fingerprint",
+        list(fingerprints.items())
+    )
+    connection.commit()
+
+
+def mysqlTableColumns(cursor, table):
+    # Columns set by the seed data (not the *_UpdatedAt bookkeeping) and the primary key columns
+    cursor.execute("""
+        SELECT COLUMN_NAME, COLUMN_KEY = 'PRI' FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME NOT LIKE '%%\\_UpdatedAt'
+        ORDER BY ORDINAL_POSITION
+    """, (table,))
+    columns = cursor.fetchall()
+    return [name for name, _ in columns], [name for name, primary in columns if primary]
+
+
+def mysqlApplySeedTable(connection, cursor, table, insertStatement):
+    # Loads the seed rows into a temporary copy of the table, so AUTO_INCREMENT IDs come out the same as on a fresh setup,
+    # then inserts the missing rows, updates the changed ones and deletes the ones no longer in the seed
+    # Rows that already match are left alone, so their *_UpdatedAt doesn't move
+    seedTable = f"Seed_{table}"
+    columns, keys = mysqlTableColumns(cursor, table)
+    columnList = ", ".join(f"`{column}`" for column in columns)
+
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{seedTable}`")
+    cursor.execute(f"CREATE TEMPORARY TABLE `{seedTable}` LIKE `{table}`")
+    cursor.execute(re.sub(rf"^INSERT INTO `?{table}`?", f"INSERT INTO `{seedTable}`", insertStatement))
+
+    updates = ", ".join(f"`{column}` = seed.`{column}`" for column in columns if column not in keys)
+    if updates:
+        cursor.execute(f"""
+            INSERT INTO `{table}` ({columnList})
+            SELECT {columnList} FROM `{seedTable}` AS seed
+            ON DUPLICATE KEY UPDATE {updates}
+        """)
+    else:
+        # Link tables like ClientAddress are all key, a row is either there or missing
+        cursor.execute(f"INSERT IGNORE INTO `{table}` ({columnList}) SELECT {columnList} FROM `{seedTable}`")
+    upserted = cursor.rowcount
+    cursor.execute(f"""
+        DELETE target FROM `{table}` AS target
+        LEFT JOIN `{seedTable}` AS seed ON {" AND ".join(f"target.`{key}` = seed.`{key}`" for key in keys)}
+        WHERE seed.`{keys[0]}` IS NULL
+    """)
+    deleted = cursor.rowcount
+    cursor.execute(f"DROP TEMPORARY TABLE `{seedTable}`")
+    connection.commit()
+    return upserted, deleted
+
+
+def setupMySQL(path, force):
+    database, statements, schema, inserts = parseSetupFile(path)
+    fingerprints = {"schema": fingerprint("\n".join(schema))}
+    fingerprints.update({f"data:{table}": fingerprint(statement) for table, statement in inserts.items()})
+
+    connection = connectMySQL(database=None)
+    cursor = connection.cursor()
+    stored = {}
+    if mysqlDatabaseExists(cursor, database):
+        cursor.execute(f"USE `{database}`")
+        stored = mysqlStoredFingerprints(cursor)
+
+    if force or stored.get("schema") != fingerprints["schema"]:
+        # A schema change, or a database this script didn't set up, needs the full drop-and-recreate
+        print("MySQL schema changed or unknown, rebuilding the database")
+        for statement in statements:
+            cursor.execute(statement)
+        connection.commit()
+    elif stored == fingerprints:
+        print("MySQL seed data unchanged, nothing to do")
+    else:
+        # Parents before children, as they appear in the setup file, with foreign keys checked once everything is in place
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        for table, statement in inserts.items():
+            if stored.get(f"data:{table}") == fingerprints[f"data:{table}"]:
+                continue
+            upserted, deleted = mysqlApplySeedTable(connection, cursor, table, statement)
+            print(f"Applied {table} seed changes: {upserted} rows affected by upsert, {deleted} deleted")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+
+    mysqlSaveFingerprints(connection, cursor, fingerprints)
+    cursor.close()
+    connection.close()
+
+
+def seedObjectId(kind, key):
+    # Deterministic ObjectId for a seed document, from its collection and natural key (e.g. a factory name)
+    digest = hashlib.sha256(f"{kind}:{key}".encode("utf-8")).hexdigest()
+    return ObjectId(f"{seedTimestamp:08x}{digest[:16]}")
+
+
+def documentBytes(document):
+    # _id is left out, since MongoDB moves it to the front of the stored document
+    return bson.encode({key: value for key, value in document.items() if key != "_id"})
+
+
+def seedFingerprint(seed):
+    # seed maps each collection name to its list of documents
+    digest = hashlib.sha256()
+    for collection, documents in seed.items():
+        digest.update(collection.encode("utf-8"))
+        for document in documents:
+            digest.update(str(document["_id"]).encode("utf-8"))
+            digest.update(documentBytes(document))
+    return digest.hexdigest()
+
+
+def mongoStoredFingerprint(db):
+    state = db[fingerprintCollection].find_one({"_id": "seed"})
+    return state["fingerprint"] if state else None
+
+
+def mongoSaveFingerprint(db, seedPrint):
+    db[fingerprintCollection].update_one({"_id": "seed"}, {"$set": {"fingerprint": seedPrint}}, upsert=True)
+
+
+def mongoApplySeedCollection(collection, documents):
+    # Inserts missing documents, replaces changed ones and deletes the ones no longer in the seed, matching on _id
+    existing = {document["_id"]: documentBytes(document) for document in collection.find({})}
+    requests = []
+    for document in documents:
+        current = existing.pop(document["_id"], None)
+        if current != documentBytes(document):
+            requests.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+    if existing:
+        collection.delete_many({"_id": {"$in": list(existing)}})
+    return len(requests), len(existing)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Set up the orders databases, skipping or patching them when the seed data hasn't changed")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to set up (default: both)")
+    parser.add_argument("--sql", default=defaultSqlPath, help="MySQL setup script (default: ordersDbSetupMySQL.sql)")
+    parser.add_argument("--force", action="store_true", help="Drop and rebuild even if the fingerprints match")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+
+    if args.backend in ("mysql", "both"):
+        startTime = time.perf_counter()
+        setupMySQL(args.sql, args.force)
+        print(f"MySQL setup took {time.perf_counter() - startTime:.3f} seconds")
+
+    if args.backend in ("mongo", "both"):
+        # The Mongo seed documents live in the setup script, which does the fingerprinting itself when run with --incremental
+        command = [sys.executable, mongoSetupScript] + ([] if args.force else ["--incremental"])
+        subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+
+from dbConnections import connectMySQL, connectMongo, getMongoDb, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import runBenchmark, summariseTimes, displayTable
+from reportRegistry import reportDefinitions, sqlStatement, mongoSpec, runMongo, mongoExplainCommand
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Declared secondary indexes, keyed by index name
+# reports lists the report queries each index is meant to help
+mysqlIndexes = {
+    "idx_clientOrder_status_dueDate": {
+        "table": "ClientOrder",
+        "columns": ["clientOrder_Status", "clientOrder_DueDate"],
+        "reports": ["urgentOrders"]
+    },
+    "idx_shippingCourier_name": {
+        "table": "ShippingCourier",
+        "columns": ["shippingCourier_Name"],
+        "reports": ["alliedSc"]
+    },
+    "idx_orderItem_sku_quantity_price": {
+        # Covers the per-SKU grouping, so it can be answered from the index alone
+        "table": "OrderItem",
+        "columns": ["product_SKU", "orderItem_Quantity", "orderItem_SalePrice"],
+        "reports": ["revenue", "alliedSc"]
+    }
+}
+
+mongoIndexes = {
+    "status_dueDate": {
+        "collection": "Order",
+        "keys": [("status", 1), ("dueDate", 1)],
+        "reports": ["urgentOrders"]
+    },
+    "delivery_shippingCourierName": {
+        "collection": "Order",
+        "keys": [("delivery.shippingCourierName", 1)],
+        "reports": ["alliedSc"]
+    }
+}
+
+
+def mysqlExistingIndexes(connection):
+    # Secondary indexes on the current database, as {index name: table}
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME, TABLE_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND INDEX_NAME <> 'PRIMARY'
+    """)
+    existing = {name: table for name, table in cursor.fetchall()}
+    cursor.close()
+    return existing
+
+
+def mysqlCreateIndex(connection, name):
+    index = mysqlIndexes[name]
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE INDEX `{name}` ON `{index['table']}` ({', '.join(index['columns'])})")
+    cursor.close()
+
+
+def mysqlDropIndex(connection, name):
+    cursor = connection.cursor()
+    cursor.execute(f"DROP INDEX `{name}` ON `{mysqlIndexes[name]['table']}`")
+    cursor.close()
+
+
+def mongoExistingIndexes(db):
+    # Secondary indexes on the collections the declared set uses, as {index name: collection}
+    existing = {}
+    for collection in {index["collection"] for index in mongoIndexes.values()}:
+        for name in db[collection].index_information():
+            if name != "_id_":
+                existing[name] = collection
+    return existing
+
+
+def mongoCreateIndex(db, name):
+    index = mongoIndexes[name]
+    db[index["collection"]].create_index(index["keys"], name=name)
+
+
+def mongoDropIndex(db, name):
+    db[mongoIndexes[name]["collection"]].drop_index(name)
+
+
+def mysqlRowsExamined(connection, report):
+    # Runs the report once and reads ROWS_EXAMINED for it from this connection's performance_schema statement history
+    cursor = connection.cursor(buffered=True)
+    cursor.execute(*sqlStatement(report))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT ROWS_EXAMINED FROM performance_schema.events_statements_history
+        WHERE THREAD_ID = PS_CURRENT_THREAD_ID() AND SQL_TEXT NOT LIKE '%performance_schema%'
+        ORDER BY EVENT_ID DESC LIMIT 1
+    """)
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+
+def sumExplainField(explain, field):
+    # Aggregation explains nest the execution stats inside their stages, so add up every occurrence of the field
+    if isinstance(explain, dict):
+        return sum(value if key == field else sumExplainField(value, field) for key, value in explain.items())
+    if isinstance(explain, list):
+        return sum(sumExplainField(value, field) for value in explain)
+    return 0
+
+
+def mongoDocsExamined(db, report):
+    explain = db.command("explain", mongoExplainCommand(mongoSpec(report)), verbosity="executionStats")
+    return sumExplainField(explain, "totalDocsExamined")
+
+
+def mysqlReportOnce(connection, report):
+    cursor = connection.cursor()
+    cursor.execute(*sqlStatement(report))
+    cursor.fetchall()
+    cursor.close()
+
+
+def measureReports(backend, reports, args):
+    # Latency summary and rows/documents examined for each report
+    measurements = {}
+    for report in reports:
+        if backend["name"] == "mysql":
+            operation = lambda: mysqlReportOnce(backend["connection"], report)
+            examined = mysqlRowsExamined(backend["connection"], report)
+        else:
+            operation = lambda: list(runMongo(backend["db"], mongoSpec(report)))
+            examined = mongoDocsExamined(backend["db"], report)
+        times, _ = runBenchmark(operation, args.warmup, args.iterations)
+        measurements[report] = {"times": times, "summary": summariseTimes(times), "examined": examined}
+    return measurements
+
+
+def adviseIndexes(backend, candidates, reports, args, run):
+    # Every candidate is measured on its own against a baseline with none of the declared indexes
+    # The declared indexes present beforehand are put back afterwards
+    declared = backend["declared"]
+    originallyPresent = [name for name in declared if name in backend["existing"]()]
+
+    # Whatever fails or is interrupted, the candidate being measured is dropped and the declared indexes are put back
+    candidate = None
+    try:
+        for name in originallyPresent:
+            backend["drop"](name)
+
+        print(f"Measuring {backend['label']} without any declared index")
+        baseline = measureReports(backend, reports, args)
+
+        data = {"Index:": [], "Report:": [], "Without (s):": [], "With (s):": [], "Change:": [], "Examined Without:": [], "Examined With:": []}
+        for name in candidates:
+            print(f"Measuring {backend['label']} with {name}")
+            candidate = name
+            backend["create"](name)
+            indexed = measureReports(backend, reports, args)
+            backend["drop"](name)
+            candidate = None
+
+            for report in reports:
+                without = baseline[report]["summary"]["mean"]
+                withIndex = indexed[report]["summary"]["mean"]
+                data["Index:"].append(name + (" *" if report in declared[name]["reports"] else ""))
+                data["Report:"].append(report)
+                data["Without (s):"].append(f"{without:.6f}")
+                data["With (s):"].append(f"{withIndex:.6f}")
+                data["Change:"].append(f"{(withIndex - without) / without * 100:+.1f}%" if without else "N/A")
+                data["Examined Without:"].append(baseline[report]["examined"])
+                data["Examined With:"].append(indexed[report]["examined"])
+                if run:
+                    recordResult(run, backend["name"], f"{report} with {name}", [t / 1e9 for t in indexed[report]["times"]], backend["datasetSize"],
+                                 args.results, extra={"examined": indexed[report]["examined"]})
+
+        if run:
+            for report in reports:
+                recordResult(run, backend["name"], f"{report} without indexes", [t / 1e9 for t in baseline[report]["times"]], backend["datasetSize"],
+                             args.results, extra={"examined": baseline[report]["examined"]})
+    finally:
+        if candidate is not None and candidate in backend["existing"]():
+            backend["drop"](candidate)
+        existing = backend["existing"]()
+        for name in originallyPresent:
+            if name not in existing:
+                backend["create"](name)
+
+    print(f"\n-----{backend['label']} Index Advisor (* marks the reports an index was declared for)-----")
+    displayTable(data)
+
+
+def listIndexes(backend):
+    existing = backend["existing"]()
+    data = {"Index:": [], "On:": [], "Declared:": [], "Present:": []}
+    for name, index in backend["declared"].items():
+        data["Index:"].append(name)
+        data["On:"].append(index.get("table") or index.get("collection"))
+        data["Declared:"].append("Yes")
+        data["Present:"].append("Yes" if name in existing else "No")
+    # Secondary indexes that exist but aren't part of the declared set, such as the ones backing foreign keys
+    for name, on in existing.items():
+        if name not in backend["declared"]:
+            data["Index:"].append(name)
+            data["On:"].append(on)
+            data["Declared:"].append("No")
+            data["Present:"].append("Yes")
+    print(f"\n-----{backend['label']} Indexes-----")
+    displayTable(data)
+
+
+def mysqlBackend():
+    connection = connectMySQL()
+    return {
+        "name": "mysql",
+        "label": "MySQL",
+        "connection": connection,
+        "declared": mysqlIndexes,
+        "existing": lambda: mysqlExistingIndexes(connection),
+        "create": lambda name: mysqlCreateIndex(connection, name),
+        "drop": lambda name: mysqlDropIndex(connection, name),
+        "datasetSize": mysqlOrderCount(connection),
+        "close": connection.close
+    }
+
+
+def mongoBackend():
+    client = connectMongo()
+    db = getMongoDb(client)
+    return {
+        "name": "mongo",
+        "label": "MongoDB",
+        "db": db,
+        "declared": mongoIndexes,
+        "existing": lambda: mongoExistingIndexes(db),
+        "create": lambda name: mongoCreateIndex(db, name),
+        "drop": lambda name: mongoDropIndex(db, name),
+        "datasetSize": mongoOrderCount(db),
+        "close": client.close
+    }
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Manage the declared secondary indexes and advise on them using the report queries")
+    parser.add_argument("command", choices=["create", "drop", "list", "advise"], help="What to do with the declared indexes")
+    parser.add_argument("indexes", nargs="*", help="Index names to act on (default: every declared index)")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to manage (default: both)")
+    parser.add_argument("--reports", choices=list(reportDefinitions), nargs="+", default=list(reportDefinitions), help="Reports the advisor runs (default: all)")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per report for the advisor (default: 20)")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed runs per report for the advisor (default: 3)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record or args.command != "advise" else startRun("indexManager.py")
+
+    backends = []
+    if args.backend in ("mysql", "both"):
+        backends.append(mysqlBackend())
+    if args.backend in ("mongo", "both"):
+        backends.append(mongoBackend())
+
+    known = [name for backend in backends for name in backend["declared"]]
+    unknown = [name for name in args.indexes if name not in known]
+    if unknown:
+        raise SystemExit(f"Unknown indexes {', '.join(unknown)}, expected one of {', '.join(known)}")
+
+    for backend in backends:
+        # Index names only belong to one backend, so each backend takes the ones it declares
+        names = [name for name in args.indexes if name in backend["declared"]] if args.indexes else list(backend["declared"])
+
+        match args.command:
+            case "create":
+                existing = backend["existing"]()
+                for name in names:
+                    if name in existing:
+                        print(f"{backend['label']} index {name} already exists")
+                    else:
+                        backend["create"](name)
+                        print(f"Created {backend['label']} index {name}")
+            case "drop":
+                existing = backend["existing"]()
+                for name in names:
+                    if name in existing:
+                        backend["drop"](name)
+                        print(f"Dropped {backend['label']} index {name}")
+            case "list":
+                listIndexes(backend)
+            case "advise":
+                adviseIndexes(backend, names, args.reports, args, run)
+
+        backend["close"]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pandas as pd
+
+from dbConnections import connectMySQL, connectMongo, getMongoDb
+from benchmarkHarness import summariseTimes, displayTable
+
+
+defaultConcurrency = [1, 2, 4, 8, 16, 32]
+
+
+def mysqlClearLoadClients():
+    connection = connectMySQL()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM Client WHERE client_Email LIKE 'load%@email.com'")
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def mongoClearLoadClients():
+    client = connectMongo()
+    getMongoDb(client)["Client"].delete_many({"client_Email": {"$regex": "^load[0-9]+-[0-9]+@email\\.com$"}})
+    client.close()
+
+
+def connectWorker(connect, startBarrier):
+    # A worker that can't connect breaks the barrier, so the others fail instead of waiting for it forever
+    try:
+        return connect()
+    except Exception:
+        startBarrier.abort()
+        raise
+
+
+def runMySQLWorker(workerID, operations, updateRatio, seed, startBarrier):
+    # Every worker opens its own connection, so no driver state is shared between workers
+    # Connecting happens before the start barrier, only the operation loop is inside the measured window
+    # Returns the operation times and the wall clock start and end of the loop, comparable between processes
+    rng = random.Random(seed)
+    connection = connectWorker(connectMySQL, startBarrier)
+    cursor = connection.cursor()
+    insertTimes = []
+    updateTimes = []
+    emails = []
+
+    startBarrier.wait()
+    loopStart = time.time_ns()
+    for i in range(operations):
+        if emails and rng.random() < updateRatio:
+            startTime = time.perf_counter_ns()
+            cursor.execute("UPDATE Client SET client_Name = %s WHERE client_Email = %s", (f"Updated {i}", rng.choice(emails)))
+            connection.commit()
+            updateTimes.append(time.perf_counter_ns() - startTime)
+        else:
+            email = f"load{workerID}-{i}@email.com"
+            startTime = time.perf_counter_ns()
+            cursor.execute("INSERT INTO Client (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)",
+                           (f"Load Client {workerID}-{i}", f"{i:011d}", email))
+            connection.commit()
+            insertTimes.append(time.perf_counter_ns() - startTime)
+            emails.append(email)
+    loopEnd = time.time_ns()
+
+    cursor.close()
+    connection.close()
+    return insertTimes, updateTimes, loopStart, loopEnd
+
+
+def runMongoWorker(workerID, operations, updateRatio, seed, startBarrier):
+    rng = random.Random(seed)
+    client = connectWorker(connectMongo, startBarrier)
+    collection = getMongoDb(client)["Client"]
+    insertTimes = []
+    updateTimes = []
+    emails = []
+
+    startBarrier.wait()
+    loopStart = time.time_ns()
+    for i in range(operations):
+        if emails and rng.random() < updateRatio:
+            startTime = time.perf_counter_ns()
+            collection.update_one({"client_Email": rng.choice(emails)}, {"$set": {"client_Name": f"Updated {i}"}})
+            updateTimes.append(time.perf_counter_ns() - startTime)
+        else:
+            email = f"load{workerID}-{i}@email.com"
+            startTime = time.perf_counter_ns()
+            collection.insert_one({"client_Name": f"Load Client {workerID}-{i}", "client_Phone": f"{i:011d}", "client_Email": email})
+            insertTimes.append(time.perf_counter_ns() - startTime)
+            emails.append(email)
+    loopEnd = time.time_ns()
+
+    client.close()
+    return insertTimes, updateTimes, loopStart, loopEnd
+
+
+def runWorkers(executorType, worker, workerArgs):
+    # Each worker gets the start barrier as its last argument, there is one worker per thread or process
+    # so they all reach it together, process workers share theirs through a manager
+    match executorType:
+        case "thread":
+            startBarrier = threading.Barrier(len(workerArgs))
+            with ThreadPoolExecutor(max_workers=len(workerArgs)) as executor:
+                return list(executor.map(worker, *zip(*[args + (startBarrier,) for args in workerArgs])))
+        case "process":
+            with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=len(workerArgs)) as executor:
+                startBarrier = manager.Barrier(len(workerArgs))
+                return list(executor.map(worker, *zip(*[args + (startBarrier,) for args in workerArgs])))
+
+
+def runConcurrencyLevel(label, worker, clearRows, workers, args):
+    clearRows()         # Reset outside the measured window
+    workerArgs = [(workerID, args.operations, args.update_ratio, args.seed + workerID) for workerID in range(workers)]
+
+    # Throughput covers the operation loops only, from the first worker starting to the last finishing,
+    # so connecting and starting threads or processes doesn't count and the executors can be compared
+    results = runWorkers(args.executor, worker, workerArgs)
+    wallTime = (max(loopEnd for _, _, _, loopEnd in results) - min(loopStart for _, _, loopStart, _ in results)) / 1e9
+
+    insertTimes = [t for insertResult, _, _, _ in results for t in insertResult]
+    updateTimes = [t for _, updateResult, _, _ in results for t in updateResult]
+    return {
+        "label": label,
+        "workers": workers,
+        "operations": len(insertTimes) + len(updateTimes),
+        "throughput": (len(insertTimes) + len(updateTimes)) / wallTime,
+        "insert": summariseTimes(insertTimes),
+        "update": summariseTimes(updateTimes)
+    }
+
+
+def displayLoadResults(results):
+    data = {
+        "Backend:": [result["label"] for result in results],
+        "Workers:": [result["workers"] for result in results],
+        "Operations:": [result["operations"] for result in results],
+        "Ops/s:": [f"{result['throughput']:.1f}" for result in results],
+        "INSERT p50 (s):": [f"{result['insert'].get('p50', 0):.6f}" for result in results],
+        "INSERT p99 (s):": [f"{result['insert'].get('p99', 0):.6f}" for result in results],
+        "UPDATE p50 (s):": [f"{result['update'].get('p50', 0):.6f}" for result in results],
+        "UPDATE p99 (s):": [f"{result['update'].get('p99', 0):.6f}" for result in results]
+    }
+    displayTable(data)
+    return data
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Concurrent INSERT/UPDATE load against the Client table and collection")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to test (default: both)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="How workers are run (default: thread)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=defaultConcurrency, help="Worker counts to sweep (default: 1 2 4 8 16 32)")
+    parser.add_argument("--operations", type=int, default=200, help="Operations per worker (default: 200)")
+    parser.add_argument("--update-ratio", type=float, default=0.5, help="Fraction of operations that are updates (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the operation mix (default: 42)")
+    parser.add_argument("--csv", help="Also write the throughput/latency curve to this CSV file")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    results = []
+
+    for workers in args.concurrency:
+        if args.backend in ("mysql", "both"):
+            print(f"Running MySQL with {workers} worker(s)")
+            results.append(runConcurrencyLevel("MySQL", runMySQLWorker, mysqlClearLoadClients, workers, args))
+        if args.backend in ("mongo", "both"):
+            print(f"Running MongoDB with {workers} worker(s)")
+            results.append(runConcurrencyLevel("MongoDB", runMongoWorker, mongoClearLoadClients, workers, args))
+
+    if args.backend in ("mysql", "both"):
+        mysqlClearLoadClients()
+    if args.backend in ("mongo", "both"):
+        mongoClearLoadClients()
+
+    print("\n-----Throughput and Tail Latency by Concurrency-----")
+    data = displayLoadResults(results)
+
+    if args.csv:
+        pd.DataFrame(data).to_csv(args.csv, index=False)
+        print(f"Wrote results to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dataGenerator import datasetShape, makeGenerator, mongoCollections, mongoDocuments
+from dbConnections import connectMongo, getMongoDb
+from benchmarkHarness import summariseTimes, displayThroughput
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Loads a generated dataset into MongoDB, replacing the collections it loads
+
+
+def insertChunk(collection, chunk):
+    startTime = time.perf_counter_ns()
+    collection.insert_many(chunk, ordered=False)
+    return time.perf_counter_ns() - startTime
+
+
+def insertChunks(collection, documents, chunkSize=1000, workers=1):
+    # Streams documents into unordered insert_many calls, with up to workers chunks in flight at once
+    # Returns the document count and the time each chunk took
+    iterator = iter(documents)
+    count = 0
+    chunkTimes = []
+
+    if workers <= 1:
+        while chunk := list(itertools.islice(iterator, chunkSize)):
+            chunkTimes.append(insertChunk(collection, chunk))
+            count += len(chunk)
+        return count, chunkTimes
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while chunk := list(itertools.islice(iterator, chunkSize)):
+            # Only a couple of chunks per worker are kept in memory
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                chunkTimes.extend(future.result() for future in done)
+            pending.add(executor.submit(insertChunk, collection, chunk))
+            count += len(chunk)
+        chunkTimes.extend(future.result() for future in pending)
+    return count, chunkTimes
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Bulk load a generated orders dataset into MongoDB")
+    parser.add_argument("--orders", type=int, default=100000, help="Orders to generate (default: 100000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for generated data (default: 42)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Documents per insert_many (default: 1000)")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks inserted in parallel (default: 4)")
+    parser.add_argument("--collections", choices=mongoCollections, nargs="+", default=mongoCollections, help="Collections to load (default: all)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("mongoBulkLoader.py")
+    generator = makeGenerator(datasetShape(args.orders), args.seed)
+
+    client = connectMongo(maxPoolSize=max(args.workers, 1))
+    db = getMongoDb(client)
+
+    results = []
+    for collection in [name for name in mongoCollections if name in args.collections]:
+        print(f"Loading {collection}")
+        db[collection].drop()
+        startTime = time.perf_counter_ns()
+        count, chunkTimes = insertChunks(db[collection], mongoDocuments(generator, collection), args.chunk_size, args.workers)
+        wallTime = (time.perf_counter_ns() - startTime) / 1e9
+
+        # Wall time includes generating the documents, which overlaps with the inserts when running in parallel
+        results.append({
+            "label": collection,
+            "batchSize": args.chunk_size,
+            "rows": count,
+            "totalTime": wallTime,
+            "summary": summariseTimes(chunkTimes)
+        })
+        if run:
+            recordResult(run, "mongo", f"bulkLoad {collection} x{args.workers}", [t / 1e9 for t in chunkTimes], args.orders, args.results,
+                         extra={"documents": count, "chunkSize": args.chunk_size, "wallTime": wallTime})
+
+    client.close()
+
+    totalDocuments = sum(result["rows"] for result in results)
+    totalTime = sum(result["totalTime"] for result in results)
+    print(f"\n-----MongoDB bulk load: {totalDocuments} documents in {totalTime:.2f} seconds ({totalDocuments / totalTime:.1f} documents/s)-----")
+    displayThroughput(results)
+
+
+if __name__ == "__main__":
+    main()
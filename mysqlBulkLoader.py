@@ -0,0 +1,148 @@
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+import time
+
+from dataGenerator import datasetShape, makeGenerator, mysqlColumns, mysqlTables, mysqlRows, writeMySQLTableCsv
+from dbConnections import connectMySQL
+from benchmarkHarness import summariseTimes, displayThroughput
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Loads generated data, or CSV files in the dataGenerator.py layout (one <Table>.csv per table, \N for NULL), into the orders schema
+# The tables are emptied first
+
+
+def batched(rows, batchSize):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, batchSize)):
+        yield batch
+
+
+def readCsvRows(path):
+    with open(path, newline="", encoding="utf-8") as csvFile:
+        for row in csv.reader(csvFile):
+            yield [None if value == "\\N" else value for value in row]
+
+
+def deferChecks(cursor):
+    # Foreign keys and unique keys aren't checked row by row during the load, the data is trusted to be consistent
+    cursor.execute("SET SESSION foreign_key_checks = 0, SESSION unique_checks = 0")
+
+
+def restoreChecks(cursor):
+    cursor.execute("SET SESSION foreign_key_checks = 1, SESSION unique_checks = 1")
+
+
+def truncateTables(connection, cursor, tables):
+    # Children first, although with foreign key checks deferred the order doesn't matter
+    for table in reversed(tables):
+        cursor.execute(f"TRUNCATE TABLE `{table}`")
+    connection.commit()
+
+
+def loadMultiRow(connection, cursor, table, rows, batchSize):
+    # One INSERT ... VALUES (...), (...) statement and commit per batch, only the statement is timed
+    columns = mysqlColumns[table]
+    rowPlaceholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    columnList = ", ".join(columns)
+    batchTimes = []
+    count = 0
+    for batch in batched(rows, batchSize):
+        query = f"INSERT INTO `{table}` ({columnList}) VALUES {', '.join([rowPlaceholder] * len(batch))}"
+        params = [value for row in batch for value in row]
+        startTime = time.perf_counter_ns()
+        cursor.execute(query, params)
+        connection.commit()
+        batchTimes.append(time.perf_counter_ns() - startTime)
+        count += len(batch)
+    return count, batchTimes
+
+
+def loadDataInfile(connection, cursor, table, path):
+    # LOAD DATA LOCAL INFILE needs local_infile=ON on the server and allow_local_infile on the connection
+    # The file name can't be a parameter, so it is quoted here
+    quotedPath = path.replace("\\", "\\\\").replace("'", "\\'")
+    startTime = time.perf_counter_ns()
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE '{quotedPath}'
+        INTO TABLE `{table}`
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\r\\n'
+        ({", ".join(mysqlColumns[table])})
+    """)
+    connection.commit()
+    return cursor.rowcount, [time.perf_counter_ns() - startTime]
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Bulk load the MySQL orders schema from generated data or CSV files")
+    parser.add_argument("--method", choices=["loadData", "multiRow"], default="loadData",
+                        help="LOAD DATA LOCAL INFILE or multi-row INSERT statements (default: loadData)")
+    parser.add_argument("--csv-dir", help="Directory of <Table>.csv files to load instead of generating data")
+    parser.add_argument("--orders", type=int, default=100000, help="Orders to generate when no --csv-dir is given (default: 100000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for generated data (default: 42)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT for the multiRow method (default: 5000)")
+    parser.add_argument("--tables", choices=mysqlTables, nargs="+", default=mysqlTables, help="Tables to load (default: all)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("mysqlBulkLoader.py")
+    # Keep the foreign key order whichever order the tables were given in
+    tables = [table for table in mysqlTables if table in args.tables]
+    generator = None if args.csv_dir else makeGenerator(datasetShape(args.orders), args.seed)
+
+    connection = connectMySQL(allow_local_infile=True, autocommit=False)
+    cursor = connection.cursor()
+    deferChecks(cursor)
+    truncateTables(connection, cursor, tables)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tempDir:
+        for table in tables:
+            if args.csv_dir:
+                path = os.path.join(args.csv_dir, f"{table}.csv")
+            else:
+                path = os.path.join(tempDir, f"{table}.csv")
+
+            print(f"Loading {table}")
+            if args.method == "loadData":
+                # Generated rows are written out before the timer starts, only the server side load is measured
+                if generator:
+                    writeMySQLTableCsv(mysqlRows(generator, table), path)
+                count, batchTimes = loadDataInfile(connection, cursor, table, path)
+                batchSize = count
+            else:
+                rows = readCsvRows(path) if args.csv_dir else mysqlRows(generator, table)
+                count, batchTimes = loadMultiRow(connection, cursor, table, rows, args.batch_size)
+                batchSize = args.batch_size
+
+            results.append({
+                "label": table,
+                "batchSize": batchSize,
+                "rows": count,
+                "totalTime": sum(batchTimes) / 1e9,
+                "summary": summariseTimes(batchTimes)
+            })
+            if run:
+                recordResult(run, "mysql", f"bulkLoad {table} {args.method}", [t / 1e9 for t in batchTimes], args.orders if generator else None,
+                             args.results, extra={"rows": count, "batchSize": batchSize})
+
+    restoreChecks(cursor)
+    cursor.close()
+    connection.close()
+
+    totalRows = sum(result["rows"] for result in results)
+    totalTime = sum(result["totalTime"] for result in results)
+    print(f"\n-----MySQL bulk load ({args.method}): {totalRows} rows in {totalTime:.2f} seconds-----")
+    displayThroughput(results)
+
+
+if __name__ == "__main__":
+    main()
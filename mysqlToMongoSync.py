@@ -0,0 +1,223 @@
+import argparse
+import itertools
+import time
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, DeleteOne
+
+from dataGenerator import mongoOrderDocument
+from dbConnections import connectMySQL, connectMongo, getMongoDb
+from benchmarkHarness import summariseTimes, displayThroughput
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Builds the embedded Order documents from the normalised MySQL tables and upserts them into MongoDB
+# Orders keep their MySQL clientOrder_ID as _id, the same convention dataGenerator.py uses
+# Deletes reach MongoDB through the delete triggers in ordersDbSetupMySQL.sql: a deleted order item bumps its order's
+# clientOrder_UpdatedAt so the order is rebuilt, and a deleted order leaves a DeletedClientOrder tombstone so it is removed
+# Note: TRUNCATE doesn't fire triggers, so reload MongoDB as well after the bulk loaders empty a table
+
+checkpointCollection = "SyncCheckpoint"
+checkpointID = "mysqlOrders"
+
+# One row per order item, ordered so all the rows of an order arrive together
+orderRowsQuery = """
+SELECT
+    co.clientOrder_ID, co.clientOrder_Date, co.clientOrder_Time, co.clientOrder_DueDate, co.clientOrder_Status,
+    c.client_ID, c.client_Name, c.client_Phone, c.client_Email,
+    a.address_StreetAddress, a.address_State, a.address_Postcode,
+    d.delivery_ID, d.delivery_TrackingNumber, d.delivery_ShippingDate, sc.shippingCourier_ID, sc.shippingCourier_Name,
+    oi.orderItem_Number, oi.product_SKU, p.product_Name, oi.orderItem_Quantity, oi.orderItem_SalePrice
+FROM ClientOrder co
+JOIN Client c ON co.client_ID = c.client_ID
+JOIN Address a ON co.address_ID = a.address_ID
+LEFT JOIN Delivery d ON co.delivery_ID = d.delivery_ID
+LEFT JOIN ShippingCourier sc ON d.shippingCourier_ID = sc.shippingCourier_ID
+LEFT JOIN OrderItem oi ON co.clientOrder_ID = oi.clientOrder_ID
+LEFT JOIN Product p ON oi.product_SKU = p.product_SKU
+{where}
+ORDER BY co.clientOrder_ID, oi.orderItem_Number
+"""
+
+# Orders with a change to any row that ends up in their document since the checkpoint
+changedOrdersFilter = """
+WHERE co.clientOrder_ID IN (
+    SELECT clientOrder_ID FROM ClientOrder WHERE clientOrder_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT clientOrder_ID FROM OrderItem WHERE orderItem_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT oi.clientOrder_ID FROM OrderItem oi JOIN Product p ON oi.product_SKU = p.product_SKU WHERE p.product_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT o.clientOrder_ID FROM ClientOrder o JOIN Client c ON o.client_ID = c.client_ID WHERE c.client_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT o.clientOrder_ID FROM ClientOrder o JOIN Address a ON o.address_ID = a.address_ID WHERE a.address_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT o.clientOrder_ID FROM ClientOrder o JOIN Delivery d ON o.delivery_ID = d.delivery_ID WHERE d.delivery_UpdatedAt > %(checkpoint)s
+    UNION
+    SELECT o.clientOrder_ID FROM ClientOrder o
+    JOIN Delivery d ON o.delivery_ID = d.delivery_ID
+    JOIN ShippingCourier sc ON d.shippingCourier_ID = sc.shippingCourier_ID
+    WHERE sc.shippingCourier_UpdatedAt > %(checkpoint)s
+)
+"""
+
+
+# Orders deleted since the checkpoint, or every tombstone on a full sync
+deletedOrdersQuery = """
+SELECT DISTINCT clientOrder_ID FROM DeletedClientOrder
+{where}
+"""
+
+
+def streamRows(cursor, fetchSize):
+    # The cursor is unbuffered, so rows are read off the connection as they're needed instead of all at once
+    while rows := cursor.fetchmany(fetchSize):
+        yield from rows
+
+
+def buildOrder(rows):
+    # rows are the order item rows of one order, as dictionaries
+    first = rows[0]
+    delivery = None
+    if first["delivery_ID"] is not None:
+        delivery = {
+            "id": first["delivery_ID"],
+            "courierID": first["shippingCourier_ID"],
+            "courierName": first["shippingCourier_Name"],
+            "trackingNumber": first["delivery_TrackingNumber"],
+            "shippingDate": first["delivery_ShippingDate"]
+        }
+
+    return {
+        "id": first["clientOrder_ID"],
+        "client": {"id": first["client_ID"], "name": first["client_Name"], "phone": first["client_Phone"], "email": first["client_Email"]},
+        "address": {"streetAddress": first["address_StreetAddress"], "state": first["address_State"], "postcode": first["address_Postcode"]},
+        # TIME columns come back as timedeltas
+        "orderDate": datetime.combine(first["clientOrder_Date"], datetime.min.time()) + first["clientOrder_Time"],
+        "dueDate": first["clientOrder_DueDate"],
+        "status": first["clientOrder_Status"],
+        "items": [
+            {"number": row["orderItem_Number"], "sku": row["product_SKU"], "name": row["product_Name"],
+             "quantity": row["orderItem_Quantity"], "salePrice": row["orderItem_SalePrice"]}
+            for row in rows if row["orderItem_Number"] is not None
+        ],
+        "delivery": delivery
+    }
+
+
+def streamOrderDocuments(cursor, fetchSize):
+    for _, orderRows in itertools.groupby(streamRows(cursor, fetchSize), key=lambda row: row["clientOrder_ID"]):
+        yield mongoOrderDocument(buildOrder(list(orderRows)))
+
+
+def upsertBatch(collection, documents):
+    startTime = time.perf_counter_ns()
+    collection.bulk_write([ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents], ordered=False)
+    return time.perf_counter_ns() - startTime
+
+
+def deleteBatch(collection, orderIDs):
+    # Orders deleted in MySQL and added again under the same ID are upserted back afterwards
+    collection.bulk_write([DeleteOne({"_id": orderID}) for orderID in orderIDs], ordered=False)
+
+
+def loadCheckpoint(db):
+    state = db[checkpointCollection].find_one({"_id": checkpointID})
+    return state["checkpoint"] if state else None
+
+
+def saveCheckpoint(db, checkpoint):
+    db[checkpointCollection].update_one({"_id": checkpointID}, {"$set": {"checkpoint": checkpoint}}, upsert=True)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Sync the MySQL orders into embedded MongoDB Order documents")
+    parser.add_argument("--mode", choices=["full", "incremental"], default="incremental",
+                        help="Every order, or only orders changed since the last checkpoint (default: incremental, full when there is no checkpoint)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Order documents per bulk upsert (default: 1000)")
+    parser.add_argument("--fetch-size", type=int, default=5000, help="Rows read from MySQL at a time (default: 5000)")
+    parser.add_argument("--safety-lag", type=float, default=300.0,
+                        help="Seconds the saved checkpoint is set back by, longer than the longest write transaction (default: 300)")
+    parser.add_argument("--drop", action="store_true", help="Drop the Order collection before a full sync, e.g. to remove the hand-written seed orders")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("mysqlToMongoSync.py")
+
+    connection = connectMySQL()
+    mongoClient = connectMongo()
+    db = getMongoDb(mongoClient)
+
+    previousCheckpoint = loadCheckpoint(db) if args.mode == "incremental" else None
+    mode = "incremental" if previousCheckpoint else "full"
+    if args.mode == "incremental" and not previousCheckpoint:
+        print("No checkpoint found, running a full sync")
+    if mode == "full" and args.drop:
+        db.Order.drop()
+
+    # The orders are read from one consistent snapshot, opened before the new checkpoint is read,
+    # so changes made while syncing are picked up again next time
+    # *_UpdatedAt is set when a write runs, not when it commits, so a transaction still open when the snapshot is taken
+    # can commit rows stamped before the checkpoint that this run doesn't see. The checkpoint is saved set back by
+    # --safety-lag to catch them next time, and the orders synced twice because of the overlap are just upserted again
+    connection.start_transaction(consistent_snapshot=True, readonly=True)
+    checkpointCursor = connection.cursor()
+    checkpointCursor.execute("SELECT NOW(6)")
+    newCheckpoint = checkpointCursor.fetchone()[0] - timedelta(seconds=args.safety_lag)
+    checkpointCursor.close()
+
+    # Deletes go first, so an order deleted and then recreated in MySQL ends up upserted
+    deleteCursor = connection.cursor()
+    if mode == "incremental":
+        deleteCursor.execute(deletedOrdersQuery.format(where="WHERE deletedClientOrder_DeletedAt > %(checkpoint)s"), {"checkpoint": previousCheckpoint})
+    else:
+        deleteCursor.execute(deletedOrdersQuery.format(where=""))
+    deleted = 0
+    deletedIDs = (row[0] for row in streamRows(deleteCursor, args.fetch_size))
+    while batch := list(itertools.islice(deletedIDs, args.batch_size)):
+        deleteBatch(db.Order, batch)
+        deleted += len(batch)
+    deleteCursor.close()
+
+    cursor = connection.cursor(dictionary=True)
+
+    if mode == "incremental":
+        print(f"Syncing orders changed since {previousCheckpoint}")
+        cursor.execute(orderRowsQuery.format(where=changedOrdersFilter), {"checkpoint": previousCheckpoint})
+    else:
+        cursor.execute(orderRowsQuery.format(where=""))
+
+    startTime = time.perf_counter_ns()
+    batchTimes = []
+    count = 0
+    documents = streamOrderDocuments(cursor, args.fetch_size)
+    while batch := list(itertools.islice(documents, args.batch_size)):
+        batchTimes.append(upsertBatch(db.Order, batch))
+        count += len(batch)
+    wallTime = (time.perf_counter_ns() - startTime) / 1e9
+
+    cursor.close()
+    connection.commit()
+    connection.close()
+    saveCheckpoint(db, newCheckpoint)
+
+    print(f"\n-----{mode.capitalize()} sync: {count} orders in {wallTime:.2f} seconds, {deleted} deleted orders removed-----")
+    displayThroughput([{
+        "label": f"{mode} sync",
+        "batchSize": args.batch_size,
+        "rows": count,
+        # Rows/s covers reading from MySQL and building the documents as well as the upserts
+        "totalTime": wallTime,
+        "summary": summariseTimes(batchTimes)
+    }])
+    if run:
+        recordResult(run, "mongo", f"{mode} sync", [t / 1e9 for t in batchTimes], None, args.results,
+                     extra={"orders": count, "deletedOrders": deleted, "wallTime": wallTime, "batchSize": args.batch_size})
+
+    mongoClient.close()
+
+
+if __name__ == "__main__":
+    main()
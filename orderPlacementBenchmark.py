@@ -0,0 +1,349 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+from pytz import timezone
+import mysql.connector
+from mysql.connector import errorcode
+
+from dbConnections import connectMySQL, connectMongo, getMongoDb, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import summariseTimes, displayTable
+from resultStore import startRun, recordResult, addResultArguments
+
+
+melTZ = timezone("Australia/Melbourne")
+
+defaultConcurrency = [1, 2, 4, 8, 16]
+
+# Stock is raised to this for the run, so orders only abort because of contention and not because the shelves are empty
+benchmarkStock = 1_000_000_000
+
+# Deadlocks and lock wait timeouts are retried, the way an application would
+mysqlRetryErrors = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def makeOrderItems(products, rng, maxItems):
+    # Items are sorted by SKU so every transaction locks products in the same order
+    chosen = rng.sample(products, rng.randint(1, min(maxItems, len(products))))
+    return sorted(({"product": product, "quantity": rng.randint(1, 10)} for product in chosen), key=lambda item: item["product"]["sku"])
+
+
+def mysqlLoadFixtures(connection):
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT client_ID, address_ID FROM ClientAddress")
+    destinations = cursor.fetchall()
+    cursor.execute("SELECT product_SKU AS sku, product_Price AS price, product_Stock AS stock FROM Product ORDER BY product_SKU")
+    products = cursor.fetchall()
+    cursor.close()
+    return destinations, products
+
+
+def mysqlSetStock(connection, stockBySku):
+    cursor = connection.cursor()
+    cursor.executemany("UPDATE Product SET product_Stock = %s WHERE product_SKU = %s", [(stock, sku) for sku, stock in stockBySku.items()])
+    connection.commit()
+    cursor.close()
+
+
+def mysqlDeleteOrders(connection, orderIDs, chunkSize=1000):
+    cursor = connection.cursor()
+    for start in range(0, len(orderIDs), chunkSize):
+        chunk = orderIDs[start:start + chunkSize]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"DELETE FROM OrderItem WHERE clientOrder_ID IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM ClientOrder WHERE clientOrder_ID IN ({placeholders})", chunk)
+        connection.commit()
+    cursor.close()
+
+
+def mysqlPlaceOrder(connection, cursor, destination, items):
+    # One transaction: decrement stock, create the order and its items
+    now = datetime.now(melTZ)
+    connection.start_transaction()
+    try:
+        for item in items:
+            cursor.execute(
+                "UPDATE Product SET product_Stock = product_Stock - %s WHERE product_SKU = %s AND product_Stock >= %s",
+                (item["quantity"], item["product"]["sku"], item["quantity"])
+            )
+            if cursor.rowcount == 0:
+                raise OutOfStock(item["product"]["sku"])
+
+        cursor.execute(
+            "INSERT INTO ClientOrder (client_ID, address_ID, clientOrder_Date, clientOrder_Time, clientOrder_DueDate, clientOrder_Status, delivery_ID) "
+            "VALUES (%s, %s, %s, %s, %s, 'Processing', NULL)",
+            (destination["client_ID"], destination["address_ID"], now.date(), now.time().replace(microsecond=0), (now + timedelta(days=7)).date())
+        )
+        orderID = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO OrderItem (clientOrder_ID, orderItem_Number, product_SKU, orderItem_Quantity, orderItem_SalePrice) VALUES (%s, %s, %s, %s, %s)",
+            [(orderID, number, item["product"]["sku"], item["quantity"], item["product"]["price"]) for number, item in enumerate(items, start=1)]
+        )
+        connection.commit()
+        return orderID
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def runMySQLWorker(destinations, products, orders, maxItems, maxRetries, seed):
+    rng = random.Random(seed)
+    connection = connectMySQL()
+    cursor = connection.cursor()
+    stats = {"latencies": [], "commits": 0, "aborts": 0, "retries": 0, "createdIDs": []}
+
+    for _ in range(orders):
+        destination = rng.choice(destinations)
+        items = makeOrderItems(products, rng, maxItems)
+        startTime = time.perf_counter_ns()
+        for attempt in range(maxRetries + 1):
+            try:
+                stats["createdIDs"].append(mysqlPlaceOrder(connection, cursor, destination, items))
+                stats["commits"] += 1
+                stats["latencies"].append(time.perf_counter_ns() - startTime)
+                break
+            except OutOfStock:
+                stats["aborts"] += 1
+                break
+            except mysql.connector.Error as error:
+                if error.errno not in mysqlRetryErrors or attempt == maxRetries:
+                    stats["aborts"] += 1
+                    break
+                stats["retries"] += 1
+
+    cursor.close()
+    connection.close()
+    return stats
+
+
+def mongoLoadFixtures(db):
+    # Every (client, address) pair becomes a possible order destination, like ClientAddress in MySQL
+    destinations = [
+        {"client": {"id": client["_id"], "name": client["name"], "phone": client["phone"], "email": client["email"]}, "address": address}
+        for client in db.Client.find({}, {"name": 1, "phone": 1, "email": 1, "addresses": 1})
+        for address in client.get("addresses", [])
+    ]
+    products = [
+        {"sku": product["_id"], "name": product["name"], "price": product["price"], "stock": product["stock"]}
+        for product in db.Product.find({}, {"name": 1, "price": 1, "stock": 1}).sort("_id", 1)
+    ]
+    return destinations, products
+
+
+def mongoSetStock(db, stockBySku):
+    for sku, stock in stockBySku.items():
+        db.Product.update_one({"_id": sku}, {"$set": {"stock": stock}})
+
+
+def mongoDeleteOrders(db, orderIDs, chunkSize=1000):
+    for start in range(0, len(orderIDs), chunkSize):
+        db.Order.delete_many({"_id": {"$in": orderIDs[start:start + chunkSize]}})
+
+
+def makeOrderDocument(destination, items):
+    now = datetime.now(melTZ)
+    return {
+        "client": dict(destination["client"], address=destination["address"]),
+        "orderDate": now,
+        "dueDate": now + timedelta(days=7),
+        "status": "Processing",
+        "items": [
+            {
+                "sku": item["product"]["sku"],
+                "name": item["product"]["name"],
+                "quantity": item["quantity"],
+                "salePrice": item["product"]["price"]
+            }
+            for item in items
+        ]
+    }
+
+
+def mongoPlaceOrderEmbedded(db, destination, items):
+    # Without a transaction: decrement stock one product at a time and put it back if a later product runs out
+    decremented = []
+    for item in items:
+        result = db.Product.update_one({"_id": item["product"]["sku"], "stock": {"$gte": item["quantity"]}}, {"$inc": {"stock": -item["quantity"]}})
+        if result.modified_count == 0:
+            for done in decremented:
+                db.Product.update_one({"_id": done["product"]["sku"]}, {"$inc": {"stock": done["quantity"]}})
+            raise OutOfStock(item["product"]["sku"])
+        decremented.append(item)
+
+    return db.Order.insert_one(makeOrderDocument(destination, items)).inserted_id
+
+
+def mongoPlaceOrderTransaction(client, db, destination, items, stats, maxRetries):
+    # Multi-document transaction (needs a replica set), retried on transient errors like write conflicts
+    with client.start_session() as session:
+        for attempt in range(maxRetries + 1):
+            try:
+                session.start_transaction()
+                for item in items:
+                    result = db.Product.update_one({"_id": item["product"]["sku"], "stock": {"$gte": item["quantity"]}},
+                                                   {"$inc": {"stock": -item["quantity"]}}, session=session)
+                    if result.modified_count == 0:
+                        session.abort_transaction()
+                        raise OutOfStock(item["product"]["sku"])
+                orderID = db.Order.insert_one(makeOrderDocument(destination, items), session=session).inserted_id
+                commitTransaction(session)
+                return orderID
+            except PyMongoError as error:
+                if session.in_transaction:
+                    session.abort_transaction()
+                if not error.has_error_label("TransientTransactionError") or attempt == maxRetries:
+                    raise
+                stats["retries"] += 1
+
+
+def commitTransaction(session):
+    while True:
+        try:
+            session.commit_transaction()
+            return
+        except PyMongoError as error:
+            if not error.has_error_label("UnknownTransactionCommitResult"):
+                raise
+
+
+def runMongoWorker(mode, destinations, products, orders, maxItems, maxRetries, seed):
+    rng = random.Random(seed)
+    client = connectMongo()
+    db = getMongoDb(client)
+    stats = {"latencies": [], "commits": 0, "aborts": 0, "retries": 0, "createdIDs": []}
+
+    for _ in range(orders):
+        destination = rng.choice(destinations)
+        items = makeOrderItems(products, rng, maxItems)
+        startTime = time.perf_counter_ns()
+        try:
+            if mode == "embedded":
+                orderID = mongoPlaceOrderEmbedded(db, destination, items)
+            else:
+                orderID = mongoPlaceOrderTransaction(client, db, destination, items, stats, maxRetries)
+            stats["createdIDs"].append(orderID)
+            stats["commits"] += 1
+            stats["latencies"].append(time.perf_counter_ns() - startTime)
+        except (OutOfStock, PyMongoError):
+            stats["aborts"] += 1
+
+    client.close()
+    return stats
+
+
+def runConcurrencyLevel(label, worker, workers, args):
+    startTime = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(worker, args.seed + workerID) for workerID in range(workers)]
+        results = [future.result() for future in futures]
+    wallTime = (time.perf_counter_ns() - startTime) / 1e9
+
+    latencies = [t for stats in results for t in stats["latencies"]]
+    commits = sum(stats["commits"] for stats in results)
+    aborts = sum(stats["aborts"] for stats in results)
+    retries = sum(stats["retries"] for stats in results)
+    attempts = commits + aborts
+    return {
+        "label": label,
+        "workers": workers,
+        "commits": commits,
+        "commitsPerSecond": commits / wallTime,
+        "abortRate": aborts / attempts if attempts else 0.0,
+        "retryRate": retries / attempts if attempts else 0.0,
+        "latencies": latencies,
+        "summary": summariseTimes(latencies),
+        "createdIDs": [orderID for stats in results for orderID in stats["createdIDs"]]
+    }
+
+
+def displayPlacementResults(results):
+    data = {
+        "Backend:": [result["label"] for result in results],
+        "Workers:": [result["workers"] for result in results],
+        "Commits:": [result["commits"] for result in results],
+        "Commits/s:": [f"{result['commitsPerSecond']:.1f}" for result in results],
+        "Abort Rate:": [f"{result['abortRate'] * 100:.2f}%" for result in results],
+        "Retry Rate:": [f"{result['retryRate'] * 100:.2f}%" for result in results],
+        "p50 (s):": [f"{result['summary'].get('p50', 0):.6f}" for result in results],
+        "p99 (s):": [f"{result['summary'].get('p99', 0):.6f}" for result in results]
+    }
+    displayTable(data)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark placing orders transactionally on MySQL and MongoDB")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to test (default: both)")
+    parser.add_argument("--mongo-mode", choices=["embedded", "transaction", "both"], default="both",
+                        help="Embedded document with separate stock updates, multi-document transaction, or both (default: both)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=defaultConcurrency, help="Worker counts to sweep (default: 1 2 4 8 16)")
+    parser.add_argument("--orders", type=int, default=200, help="Orders placed per worker (default: 200)")
+    parser.add_argument("--max-items", type=int, default=5, help="Maximum items per order (default: 5)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries on deadlocks and transient errors (default: 5)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("orderPlacementBenchmark.py")
+    results = []
+
+    if args.backend in ("mysql", "both"):
+        print("-----Placing orders on MySQL-----")
+        connection = connectMySQL()
+        destinations, products = mysqlLoadFixtures(connection)
+        originalStock = {product["sku"]: product["stock"] for product in products}
+        datasetSize = mysqlOrderCount(connection)
+        mysqlSetStock(connection, {sku: benchmarkStock for sku in originalStock})
+
+        try:
+            for workers in args.concurrency:
+                worker = lambda seed: runMySQLWorker(destinations, products, args.orders, args.max_items, args.max_retries, seed)
+                result = runConcurrencyLevel("MySQL transaction", worker, workers, args)
+                results.append(result)
+                mysqlDeleteOrders(connection, result["createdIDs"])
+                if run:
+                    recordResult(run, "mysql", f"placeOrder x{workers}", [t / 1e9 for t in result["latencies"]], datasetSize, args.results,
+                                 extra={"abortRate": result["abortRate"], "retryRate": result["retryRate"]})
+        finally:
+            # Put the data back the way it was
+            mysqlSetStock(connection, originalStock)
+            connection.close()
+
+    if args.backend in ("mongo", "both"):
+        mongoClient = connectMongo()
+        mongoDb = getMongoDb(mongoClient)
+        destinations, products = mongoLoadFixtures(mongoDb)
+        originalStock = {product["sku"]: product["stock"] for product in products}
+        datasetSize = mongoOrderCount(mongoDb)
+        mongoSetStock(mongoDb, {sku: benchmarkStock for sku in originalStock})
+        modes = ["embedded", "transaction"] if args.mongo_mode == "both" else [args.mongo_mode]
+
+        try:
+            for mode in modes:
+                print(f"-----Placing orders on MongoDB ({mode})-----")
+                for workers in args.concurrency:
+                    worker = lambda seed: runMongoWorker(mode, destinations, products, args.orders, args.max_items, args.max_retries, seed)
+                    result = runConcurrencyLevel(f"MongoDB {mode}", worker, workers, args)
+                    results.append(result)
+                    mongoDeleteOrders(mongoDb, result["createdIDs"])
+                    if run:
+                        recordResult(run, "mongo", f"placeOrder {mode} x{workers}", [t / 1e9 for t in result["latencies"]], datasetSize, args.results,
+                                     extra={"abortRate": result["abortRate"], "retryRate": result["retryRate"]})
+        finally:
+            mongoSetStock(mongoDb, originalStock)
+            mongoClient.close()
+
+    print("\n-----Order Placement by Concurrency-----")
+    displayPlacementResults(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import argparse
+import time
 from pymongo import MongoClient, WriteConcern
 from bson.objectid import ObjectId
 from bson.decimal128 import Decimal128
@@ -6,8 +8,18 @@ from pytz import timezone, utc
 from dotenv import load_dotenv
 import os
 
+from mongoBulkLoader import insertChunks
+from incrementalSetup import seedObjectId, seedFingerprint, mongoStoredFingerprint, mongoSaveFingerprint, mongoApplySeedCollection
+
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Create/reset the orders database in MongoDB")
+parser.add_argument("--chunk-size", type=int, default=1000, help="Orders per insert_many (default: 1000)")
+parser.add_argument("--workers", type=int, default=1, help="Order chunks inserted in parallel (default: 1)")
+parser.add_argument("--incremental", action="store_true",
+                    help="Skip the setup if the seed data is unchanged since the last run, otherwise apply only the changed documents")
+args = parser.parse_args()
+
 # Connect to MongoDB
 client = MongoClient(
     host=os.getenv("MONGODB_URI"),
@@ -19,18 +31,11 @@ adminDb = client["admin"]
 db = client[os.getenv("MONGODB_DB")]
 print("Connected to database")
 
-
-# Drop existing collections
-db.Product.drop()
-db.Factory.drop()
-db.Client.drop()
-db.Order.drop()
-db.Delivery.drop()
-db.ShippingCourier.drop()
-print("Dropped existing collections")
+# Seed documents get IDs derived from their natural keys, so every run builds exactly the same documents
+# That is what lets --incremental compare them with the ones already in the database
 
 # Insert factories
-db.Factory.insert_many([
+factories = [
     {
         "name": "Kid's beds factory",
         "phone": "0321321321",
@@ -46,15 +51,18 @@ db.Factory.insert_many([
         "phone": "0987654321",
         "email": "factory3@bbfactory.com"
     },
-])
+]
 
-# Obtain factory object IDs
-factory1ID = db.Factory.find_one({"name": "Kid's beds factory"})["_id"]
-factory2ID = db.Factory.find_one({"name": "Modern furniture factory"})["_id"]
-factory3ID = db.Factory.find_one({"name": "Bunk bed factory"})["_id"]
+# Assign factory object IDs up front instead of looking each one up after inserting
+for factory in factories:
+    factory["_id"] = seedObjectId("Factory", factory["name"])
+factoryIDs = {factory["name"]: factory["_id"] for factory in factories}
+factory1ID = factoryIDs["Kid's beds factory"]
+factory2ID = factoryIDs["Modern furniture factory"]
+factory3ID = factoryIDs["Bunk bed factory"]
 
 # Insert products
-db.Product.insert_many([
+products = [
     {
         "_id": "KF1001-SBB",
         "name": "Single blue racing car bed",
@@ -143,11 +151,11 @@ db.Product.insert_many([
             "name": "Bunk bed factory"
         }
     }
-])
+]
 
 # Insert clients
 # Table for addresses and client addresses no longer required due to embedded documents
-db.Client.insert_many([
+clients = [
     {
         "name": "Temple & Webster",
         "phone": "0111111111",
@@ -255,11 +263,14 @@ db.Client.insert_many([
             }
         ]
     }
-])
+]
+for seedClient in clients:
+    seedClient["_id"] = seedObjectId("Client", seedClient["name"])
+clientIDs = {seedClient["name"]: seedClient["_id"] for seedClient in clients}
 
 
 # Insert shipping couriers
-db.ShippingCourier.insert_many([
+shippingCouriers = [
     {
         "name": "Allied Express",
         "phoneNumber": "0543215432",
@@ -275,16 +286,19 @@ db.ShippingCourier.insert_many([
         "phoneNumber": "0432143214",
         "email": "shipping3@tollgroup.com"
     }
-])
+]
+for courier in shippingCouriers:
+    courier["_id"] = seedObjectId("ShippingCourier", courier["name"])
+shippingCourierIDs = {courier["name"]: courier["_id"] for courier in shippingCouriers}
 
 melTZ = timezone("Australia/Melbourne")
 
 # Insert orders
 # Here, the client, order items and delivery information have been included
-db.Order.insert_many([
+orders = [
     {
         "client": {
-            "id": db.Client.find_one({"name": "Temple & Webster"})["_id"],
+            "id": clientIDs["Temple & Webster"],
             "name": "Temple & Webster",
             "phone": "0111111111",
             "email": "client1@tpw.com.au",
@@ -332,7 +346,7 @@ db.Order.insert_many([
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Temple & Webster"})["_id"],
+            "id": clientIDs["Temple & Webster"],
             "name": "Temple & Webster",
             "phone": "0111111111",
             "email": "client1@tpw.com.au",
@@ -372,14 +386,14 @@ db.Order.insert_many([
             }
         ],
         "delivery": {
-            "shippingCourierID": db.ShippingCourier.find_one({"name": "Allied Express"})["_id"],
+            "shippingCourierID": shippingCourierIDs["Allied Express"],
             "shippingCourierName": "Allied Express",
             "trackingNumber": "TNW111111111"
         }
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Fantastic Furniture"})["_id"],
+            "id": clientIDs["Fantastic Furniture"],
             "name": "Fantastic Furniture",
             "phone": "0222222222",
             "email": "client2@fantastic.com.au",
@@ -415,7 +429,7 @@ db.Order.insert_many([
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Fantastic Furniture"})["_id"],
+            "id": clientIDs["Fantastic Furniture"],
             "name": "Fantastic Furniture",
             "phone": "0222222222",
             "email": "client2@fantastic.com.au",
@@ -449,7 +463,7 @@ db.Order.insert_many([
             }
         ],
         "delivery": {
-            "shippingCourierID": db.ShippingCourier.find_one({"name": "Hunter Express"})["_id"],
+            "shippingCourierID": shippingCourierIDs["Hunter Express"],
             "shippingCourierName": "Hunter Express",
             "trackingNumber": "H222222",
             "shippingDate": melTZ.localize(datetime(2024, 10, 5))
@@ -457,7 +471,7 @@ db.Order.insert_many([
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Sleep Doctor"})["_id"],
+            "id": clientIDs["Sleep Doctor"],
             "name": "Sleep Doctor",
             "phone": "0333333333",
             "email": "client3@sleepdoctor.com.au",
@@ -503,14 +517,14 @@ db.Order.insert_many([
             }
         ],
         "delivery": {
-            "shippingCourierID": db.ShippingCourier.find_one({"name": "Allied Express"})["_id"],
+            "shippingCourierID": shippingCourierIDs["Allied Express"],
             "shippingCourierName": "Allied Express",
             "trackingNumber": "AL333333333"
         }
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Temple & Webster"})["_id"],
+            "id": clientIDs["Temple & Webster"],
             "name": "Temple & Webster",
             "phone": "0111111111",
             "email": "client1@tpw.com.au",
@@ -552,7 +566,7 @@ db.Order.insert_many([
     },
     {
         "client": {
-            "id": db.Client.find_one({"name": "Forty Winks"})["_id"],
+            "id": clientIDs["Forty Winks"],
             "name": "Forty Winks",
             "phone": "0555555555",
             "email": "client5@fortywinks.com.au",
@@ -580,13 +594,48 @@ db.Order.insert_many([
             }
         ],
         "delivery": {
-            "shippingCourierID": db.ShippingCourier.find_one({"name": "Hunter Express"})["_id"],
+            "shippingCourierID": shippingCourierIDs["Hunter Express"],
             "shippingCourierName": "Hunter Express",
             "trackingNumber": "H444444"
         }
     }
-])
+]
+
+for order in orders:
+    order["_id"] = seedObjectId("Order", f"{order['client']['name']}|{order['orderDate'].isoformat()}")
+
+seed = {"Factory": factories, "Product": products, "Client": clients, "ShippingCourier": shippingCouriers, "Order": orders}
+seedPrint = seedFingerprint(seed)
+setupStart = time.perf_counter()
+
+if args.incremental and mongoStoredFingerprint(db) == seedPrint:
+    print("Seed data unchanged, nothing to do")
+elif args.incremental:
+    # Documents no longer in the seed are removed, so the collections end up exactly as a full setup leaves them
+    for name, documents in seed.items():
+        changed, deleted = mongoApplySeedCollection(db[name], documents)
+        print(f"Applied {name} seed changes: {changed} inserted or replaced, {deleted} deleted")
+else:
+    # Drop existing collections
+    db.Product.drop()
+    db.Factory.drop()
+    db.Client.drop()
+    db.Order.drop()
+    db.Delivery.drop()
+    db.ShippingCourier.drop()
+    print("Dropped existing collections")
+
+    documentCount = 0
+    for name in ["Factory", "Product", "Client", "ShippingCourier"]:
+        db[name].insert_many(seed[name])
+        documentCount += len(seed[name])
+
+    # Orders go in unordered chunks, optionally in parallel, since there is nothing left to look up while building them
+    orderCount, _ = insertChunks(db.Order, orders, args.chunk_size, args.workers)
+    documentCount += orderCount
 
+    setupTime = time.perf_counter() - setupStart
+    print(f"Inserted collections: {documentCount} documents in {setupTime:.3f} seconds ({documentCount / setupTime:.1f} documents/s)")
 
-print("Inserted collections")
-print("Database setup completed")
\ No newline at end of file
+mongoSaveFingerprint(db, seedPrint)
+print(f"Database setup completed in {time.perf_counter() - setupStart:.3f} seconds")
\ No newline at end of file
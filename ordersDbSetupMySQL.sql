@@ -17,6 +17,7 @@ DROP TABLE IF EXISTS `ShippingCourier`;
 DROP TABLE IF EXISTS `Delivery`;
 DROP TABLE IF EXISTS `ClientOrder`;
 DROP TABLE IF EXISTS `OrderItem`;
+DROP TABLE IF EXISTS `DeletedClientOrder`;
 
 --
 -- Create Factory table
@@ -41,7 +42,9 @@ CREATE TABLE `Product` (
   product_Price DECIMAL(7, 2) NOT NULL,
   product_Stock INT UNSIGNED NOT NULL,
   factory_ID INT UNSIGNED NOT NULL,
+  product_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (product_SKU),
+  KEY (product_UpdatedAt),
   FOREIGN KEY (factory_ID) REFERENCES `Factory`(factory_ID)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
@@ -55,7 +58,10 @@ CREATE TABLE `Client` (
   client_Name VARCHAR(100) NOT NULL,
   client_Phone CHAR(12) NOT NULL,
   client_Email VARCHAR(100) NOT NULL,
-  PRIMARY KEY (client_ID)
+  client_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (client_ID),
+  KEY (client_UpdatedAt),
+  UNIQUE KEY (client_Email)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
 
@@ -68,7 +74,9 @@ CREATE TABLE `Address` (
   address_StreetAddress VARCHAR(150) NOT NULL,
   address_State CHAR(3) NOT NULL,
   address_Postcode CHAR(4) NOT NULL,
-  PRIMARY KEY (address_ID)
+  address_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (address_ID),
+  KEY (address_UpdatedAt)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
 
@@ -94,7 +102,9 @@ CREATE TABLE `ShippingCourier` (
   shippingCourier_Name VARCHAR(100) NOT NULL,
   shippingCourier_Phone CHAR(12) NOT NULL,
   shippingCourier_Email VARCHAR(100) NOT NULL,
-  PRIMARY KEY (shippingCourier_ID)
+  shippingCourier_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (shippingCourier_ID),
+  KEY (shippingCourier_UpdatedAt)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
 
@@ -107,7 +117,9 @@ CREATE TABLE `Delivery` (
   shippingCourier_ID INT UNSIGNED NOT NULL,
   delivery_TrackingNumber VARCHAR(20) NOT NULL,
   delivery_ShippingDate DATE,
+  delivery_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (delivery_ID),
+  KEY (delivery_UpdatedAt),
   FOREIGN KEY (shippingCourier_ID) REFERENCES `ShippingCourier`(shippingCourier_ID)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
@@ -125,7 +137,9 @@ CREATE TABLE `ClientOrder` (
   clientOrder_DueDate DATE NOT NULL,
   clientOrder_Status VARCHAR(15) NOT NULL,
   delivery_ID INT UNSIGNED NULL,
+  clientOrder_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (clientOrder_ID),
+  KEY (clientOrder_UpdatedAt),
   FOREIGN KEY (client_ID, address_ID) REFERENCES `ClientAddress`(client_ID, address_ID),
   FOREIGN KEY (delivery_ID) REFERENCES `Delivery`(delivery_ID)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
@@ -141,12 +155,36 @@ CREATE TABLE `OrderItem` (
   product_SKU VARCHAR(20) NOT NULL,
   orderItem_Quantity INT UNSIGNED NOT NULL,
   orderItem_SalePrice DECIMAL(7, 2) NOT NULL,
+  orderItem_UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (clientOrder_ID, orderItem_Number),
+  KEY (orderItem_UpdatedAt),
   FOREIGN KEY (clientOrder_ID) REFERENCES `ClientOrder`(clientOrder_ID),
   FOREIGN KEY (product_SKU) REFERENCES `Product`(product_SKU)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
 
 
+--
+-- Create DeletedClientOrder table
+--
+
+-- Tombstones for deleted orders, so mysqlToMongoSync.py can remove them from MongoDB
+CREATE TABLE `DeletedClientOrder` (
+  clientOrder_ID INT UNSIGNED NOT NULL,
+  deletedClientOrder_DeletedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  KEY (deletedClientOrder_DeletedAt)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
+
+
+--
+-- Create delete triggers
+--
+
+-- A deleted order item leaves no row with a newer *_UpdatedAt behind, so its order is marked as changed instead
+CREATE TRIGGER `OrderItem_AfterDelete` AFTER DELETE ON `OrderItem` FOR EACH ROW UPDATE `ClientOrder` SET clientOrder_UpdatedAt = CURRENT_TIMESTAMP(6) WHERE clientOrder_ID = OLD.clientOrder_ID;
+
+CREATE TRIGGER `ClientOrder_AfterDelete` AFTER DELETE ON `ClientOrder` FOR EACH ROW INSERT INTO `DeletedClientOrder` (clientOrder_ID) VALUES (OLD.clientOrder_ID);
+
+
 --
 -- Insert table data
 --
@@ -0,0 +1,191 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataGenerator import datasetShape, makeGenerator, mysqlTables, mysqlRows, mongoCollections, mongoDocuments
+from dbConnections import connectMySQL, connectMongo, getMongoDb
+from benchmarkHarness import summariseTimes, displayThroughput, displayTable
+from mysqlBulkLoader import deferChecks, restoreChecks, truncateTables, loadMultiRow
+from mongoBulkLoader import insertChunks
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Generates and loads a dataset with a pool of processes, each taking disjoint slices of the client and order key spaces
+# The small tables (factories, products and couriers) are loaded by the coordinator first
+# The tables and collections are emptied first
+
+sharedTables = ["Factory", "Product", "ShippingCourier"]
+clientTables = ["Client", "Address", "ClientAddress"]
+orderTables = ["Delivery", "ClientOrder", "OrderItem"]
+sharedCollections = ["Factory", "Product", "ShippingCourier"]
+
+# Set up once in each worker process by initWorker
+workerState = {}
+
+
+def initWorker(orders, seed, backends):
+    # The generator and connections are reused for every partition this process handles
+    workerState["generator"] = makeGenerator(datasetShape(orders), seed)
+    if "mysql" in backends:
+        workerState["connection"] = connectMySQL(autocommit=False)
+        workerState["cursor"] = workerState["connection"].cursor()
+        deferChecks(workerState["cursor"])
+    if "mongo" in backends:
+        workerState["mongoClient"] = connectMongo(maxPoolSize=1)
+        workerState["db"] = getMongoDb(workerState["mongoClient"])
+
+
+def splitRange(start, stop, parts):
+    # [start, stop) split into at most parts contiguous, roughly equal ranges
+    size = stop - start
+    bounds = [start + size * part // parts for part in range(parts + 1)]
+    return [(bounds[part], bounds[part + 1]) for part in range(parts) if bounds[part] < bounds[part + 1]]
+
+
+def loadPartition(clientRange, orderRange, batchSize, chunkSize):
+    # Returns {(backend, table or collection): (rows, batch times)} for this partition
+    generator = workerState["generator"]
+    stats = {}
+
+    if "connection" in workerState:
+        connection, cursor = workerState["connection"], workerState["cursor"]
+        for table in clientTables + orderTables:
+            start, stop = clientRange if table in clientTables else orderRange
+            stats[("mysql", table)] = loadMultiRow(connection, cursor, table, mysqlRows(generator, table, start, stop), batchSize)
+
+    if "db" in workerState:
+        db = workerState["db"]
+        stats[("mongo", "Client")] = insertChunks(db.Client, mongoDocuments(generator, "Client", *clientRange), chunkSize)
+        stats[("mongo", "Order")] = insertChunks(db.Order, mongoDocuments(generator, "Order", *orderRange), chunkSize)
+
+    return os.getpid(), stats
+
+
+def loadShared(generator, backends, batchSize, chunkSize):
+    # Empties everything the load writes to, then loads the tables every partition refers to
+    stats = {}
+    if "mysql" in backends:
+        connection = connectMySQL(autocommit=False)
+        cursor = connection.cursor()
+        deferChecks(cursor)
+        truncateTables(connection, cursor, mysqlTables)
+        for table in sharedTables:
+            stats[("mysql", table)] = loadMultiRow(connection, cursor, table, mysqlRows(generator, table), batchSize)
+        restoreChecks(cursor)
+        cursor.close()
+        connection.close()
+
+    if "mongo" in backends:
+        client = connectMongo()
+        db = getMongoDb(client)
+        for collection in mongoCollections:
+            db[collection].drop()
+        for collection in sharedCollections:
+            stats[("mongo", collection)] = insertChunks(db[collection], mongoDocuments(generator, collection), chunkSize)
+        client.close()
+    return stats
+
+
+def mergeStats(merged, stats):
+    for key, (rows, batchTimes) in stats.items():
+        totalRows, totalTimes = merged.get(key, (0, []))
+        merged[key] = (totalRows + rows, totalTimes + batchTimes)
+
+
+def checkCounts(merged, backends):
+    # Compares what the workers reported loading with what the databases now hold
+    data = {"Backend:": [], "Table:": [], "Loaded:": [], "Counted:": [], "Match:": []}
+    actual = {}
+    if "mysql" in backends:
+        connection = connectMySQL()
+        cursor = connection.cursor()
+        for table in mysqlTables:
+            cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+            actual[("mysql", table)] = cursor.fetchone()[0]
+        cursor.close()
+        connection.close()
+    if "mongo" in backends:
+        client = connectMongo()
+        db = getMongoDb(client)
+        for collection in mongoCollections:
+            actual[("mongo", collection)] = db[collection].count_documents({})
+        client.close()
+
+    allMatch = True
+    for (backend, table), counted in actual.items():
+        loaded = merged.get((backend, table), (0, []))[0]
+        allMatch = allMatch and loaded == counted
+        data["Backend:"].append(backend)
+        data["Table:"].append(table)
+        data["Loaded:"].append(loaded)
+        data["Counted:"].append(counted)
+        data["Match:"].append("Yes" if loaded == counted else "NO")
+    print("\n-----Final Counts-----")
+    displayTable(data)
+    return allMatch
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Generate and load a dataset into MySQL and MongoDB with a pool of processes")
+    parser.add_argument("--orders", type=int, default=1000000, help="Orders to generate (default: 1000000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for generated data (default: 42)")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to load (default: both)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--partitions", type=int, help="Slices of the key spaces to hand out, more than workers evens out the load (default: 4 per worker)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per multi-row INSERT (default: 5000)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Documents per insert_many (default: 1000)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("partitionedLoader.py")
+    backends = ["mysql", "mongo"] if args.backend == "both" else [args.backend]
+    shape = datasetShape(args.orders)
+    partitions = args.partitions or args.workers * 4
+
+    print(f"Loading {shape['orders']} orders and {shape['clients']} clients with {args.workers} processes over {partitions} partitions")
+    merged = {}
+    startTime = time.perf_counter()
+    mergeStats(merged, loadShared(makeGenerator(shape, args.seed), backends, args.batch_size, args.chunk_size))
+
+    # Partition n gets the nth slice of both key spaces
+    clientRanges = splitRange(1, shape["clients"] + 1, partitions)
+    orderRanges = splitRange(1, shape["orders"] + 1, partitions)
+    processes = set()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=initWorker, initargs=(args.orders, args.seed, backends)) as executor:
+        futures = [executor.submit(loadPartition, clientRange, orderRange, args.batch_size, args.chunk_size)
+                   for clientRange, orderRange in zip(clientRanges, orderRanges)]
+        for done, future in enumerate(as_completed(futures), 1):
+            pid, stats = future.result()
+            processes.add(pid)
+            mergeStats(merged, stats)
+            print(f"Finished partition {done} of {len(futures)}")
+    wallTime = time.perf_counter() - startTime
+
+    results = []
+    for (backend, table), (rows, batchTimes) in merged.items():
+        # Tables load at the same time in different processes, so their rate is rows over the summed batch time
+        results.append({
+            "label": f"{backend} {table}",
+            "batchSize": args.batch_size if backend == "mysql" else args.chunk_size,
+            "rows": rows,
+            "totalTime": sum(batchTimes) / 1e9,
+            "summary": summariseTimes(batchTimes)
+        })
+        if run:
+            recordResult(run, backend, f"partitionedLoad {table} x{args.workers}", [t / 1e9 for t in batchTimes], args.orders, args.results,
+                         extra={"rows": rows, "wallTime": wallTime, "partitions": partitions})
+
+    totalRows = sum(result["rows"] for result in results)
+    print(f"\n-----Partitioned load: {totalRows} rows/documents in {wallTime:.2f} seconds ({totalRows / wallTime:.1f}/s) using {len(processes)} processes-----")
+    displayThroughput(results)
+
+    if not checkCounts(merged, backends):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+
+import queriesSQL
+from dbConnections import connectMySQL, mysqlOrderCount
+from benchmarkHarness import runBenchmark, summariseTimes, displayTable
+from reportRegistry import reportDefinitions, sqlStatement
+from benchmarkFixtures import scratchName, nextClient, mysqlCreateScratchTable, mysqlDropScratchTable, mysqlSeedClient
+from resultStore import startRun, recordResult, addResultArguments
+
+
+def makeStatements(updateClient):
+    # Each entry is (SQL, function returning the parameters for one execution, whether it writes)
+    insertParams = lambda: tuple(nextClient().values())
+    statements = {
+        "Client INSERT": (f"INSERT INTO {scratchName} (client_Name, client_Phone, client_Email) VALUES (%s, %s, %s)", insertParams, True),
+        "Client UPDATE": (f"UPDATE {scratchName} SET client_Name = %s WHERE client_Email = %s",
+                          lambda: ("Jane Doe", updateClient["client_Email"]), True)
+    }
+    for name in reportDefinitions:
+        query, params = sqlStatement(name)
+        statements[name] = (queriesSQL.preparableQuery(query), lambda params=params: params, False)
+    return statements
+
+
+def executeStatement(connection, cursor, query, params, writes):
+    cursor.execute(query, params)
+    if writes:
+        connection.commit()
+    else:
+        cursor.fetchall()
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Compare text protocol queries with server-side prepared statements on MySQL")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed executions per statement and protocol (default: 500)")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed executions before measuring (default: 20)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("preparedStatementBenchmark.py")
+
+    connection = connectMySQL()
+    datasetSize = mysqlOrderCount(connection)
+    mysqlCreateScratchTable(connection)
+    setupCursor = connection.cursor()
+    statements = makeStatements(mysqlSeedClient(connection, setupCursor))
+
+    data = {"Statement:": [], "Text Mean (s):": [], "Prepared Mean (s):": [], "Saving/Execution (s):": [], "Saving:": []}
+    for name, (query, makeParams, writes) in statements.items():
+        print(f"Running {name}")
+        summaries = {}
+        for protocol in ("text", "prepared"):
+            # A dedicated cursor per statement, so the prepared one is only parsed and planned once and then re-executed
+            cursor = connection.cursor(prepared=(protocol == "prepared"))
+            times, _ = runBenchmark(lambda params: executeStatement(connection, cursor, query, params, writes),
+                                    args.warmup, args.iterations, setup=makeParams)
+            cursor.close()
+            summaries[protocol] = summariseTimes(times)
+            if run:
+                recordResult(run, "mysql", f"{name} {protocol}", [t / 1e9 for t in times], datasetSize, args.results)
+
+        saving = summaries["text"]["mean"] - summaries["prepared"]["mean"]
+        data["Statement:"].append(name)
+        data["Text Mean (s):"].append(f"{summaries['text']['mean']:.6f}")
+        data["Prepared Mean (s):"].append(f"{summaries['prepared']['mean']:.6f}")
+        data["Saving/Execution (s):"].append(f"{saving:.6f}")
+        data["Saving:"].append(f"{saving / summaries['text']['mean'] * 100:+.1f}%")
+
+    mysqlDropScratchTable(connection)
+    setupCursor.close()
+    connection.close()
+
+    print("\n-----Text Protocol vs Prepared Statements-----")
+    displayTable(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,335 +1,171 @@
-from pymongo import MongoClient
+import argparse
+import itertools
 from bson.objectid import ObjectId
-from bson.decimal128 import Decimal128
-from datetime import datetime, timedelta
-from pytz import timezone, utc
-from dotenv import load_dotenv
-import pandas as pd
-import os
 import time
 
-load_dotenv()
-
-melTZ = timezone("Australia/Melbourne")
-
-# Aggregation pipeline, so we can calculate the sum of sold items and the revenue
-revenueQuery = [
-    # The embedded items document in each order is unwinded so we can work with each one individually
-    # This contains the order items and some product info
-    # The embedded info means we don't need to reference any other collection
-    {"$unwind": "$items"},
-
-    # GROUP BY product SKU and Name
-    # This is to calculate the quantity sold and the revenue
-    {
-        "$group":  {
-            "_id": {
-                "product_SKU": "$items.sku",
-                "product_Name": "$items.name"
-            },
-            "Quantity_Sold": {"$sum": "$items.quantity"},
-            "Revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.salePrice"]}}
-        }
-    },
-
-    # ORDER BY Revenue in descending order
-    {"$sort": {"Revenue": -1}}
-]
-
-# Python dictionary to store the query with the projection
-urgentOrdersQuery = {
-    # Basically the WHERE clause
-    "query": {
-        "dueDate": {
-            "$gte": melTZ.localize(datetime(2024, 10, 7, 0, 0, 0)).astimezone(utc),
-            "$lt": melTZ.localize(datetime(2024, 10, 14, 0, 0, 0)).astimezone(utc)
-        },
-        "status": "Processing"
-    },
-    # Basically the SELECT clause
-    "projection": {
-        "_id": 1,
-        "client.name": 1,
-        "client.address.streetAddress": 1,
-        "client.address.postcode": 1,
-        "dueDate": 1,
-        "status": 1
-    }
-}
-
-
-alliedScQuery = [
-    # Match orders shipped by Allied Express
-    {"$match": {"delivery.shippingCourierName": "Allied Express"}},
-
-    # Unwind the embedded items document
-    {"$unwind": "$items"},
-
-    # Group by the SKU and sum up the quantities sold
-    {
-        "$group": {
-            "_id": "$items.sku",
-            "quantity": {"$sum":  "$items.quantity"},
-            "shippingCourierName": {"$first": "$delivery.shippingCourierName"}  # Use first to retain the shipping courier name for each grouped document
-        }                                                                       # This is safe, since all documents will have "Allied Express"
-    }
-]
-
-discountQuery = [
-    # Expand embedded items document
-    {"$unwind": "$items"},
-    # This is equivalent to a JOIN
-    # Get product document associated with item
-    {
-        "$lookup": {
-            "from": "Product",
-            "localField": "items.sku",
-            "foreignField": "_id",
-            "as": "productDetails"
-        }
-    },
-    # Expand obtained product document
-    {"$unwind": "$productDetails"},
-    # Group together values according to the order ID
-    {
-        "$group": {
-            "_id": "$_id",
-            "clientName": {"$first": "$client.name"},
-            "originalTotal": {"$sum": {"$multiply": [{"$toDecimal": "$items.quantity"}, {"$toDecimal": "$productDetails.price"}]}},
-            "salesTotal": {"$sum": {"$multiply": [{"$toDecimal": "$items.quantity"}, {"$toDecimal": "$items.salePrice"}]}},
-            "totalDiscountAmount": {
-                "$sum": {
-                    "$multiply": [
-                        {"$toDecimal": "$items.quantity"},
-                        {"$subtract": [{"$toDecimal": "$productDetails.price"}, {"$toDecimal": "$items.salePrice"}]}
-                    ]
-                }
-            }
-        }
-    },
-    # Fields to display
-    # Calculate discount percent
-    {
-        "$project": {
-            "clientName": 1,
-            "originalTotal": 1,
-            "salesTotal": 1,
-            "discountPercentage": {
-                "$round": [
-                    {
-                        "$cond": {
-                            "if": {"$gt": ["$originalTotal", Decimal128("0.0")]},
-                            "then": {"$multiply": [{"$divide": ["$totalDiscountAmount", "$originalTotal"]}, 100]},
-                            "else": Decimal128("0.0")
-                        }
-                    },
-                    2           # Round to 2 decimal places for readability
-                ]
-            }
-        }
-    },
-    # Order results by their ID
-    {"$sort": {"_id": 1}}
-]
-
-ordersInfoQuery = {
-    # Basically the WHERE clause
-    "query": {},
-    # Basically the SELECT clause
-    "projection": {
-        "_id": 1,
-        "client.name": 1,
-        "client.phone": 1,
-        "client.email": 1,
-        "client.address.streetAddress": 1,
-        "client.address.state": 1,
-        "client.address.postcode": 1,
-        "orderDate": 1,
-        "dueDate": 1,
-        "status": 1,
-        "delivery.shippingCourierName": 1,
-        "delivery.trackingNumber": 1,
-        "delivery.shippingDate": 1
-    }
-}
-
-
-def displayQueryResults(df):
-    resultString = df.to_string(index=False)
-    separatorLength = max(len(resultString.split('\n')[0]), len(resultString.split('\n')[1]))  # Find the longest line in the resultString
-    separator = "-" * separatorLength
-
-    print(separator)
-    print(df.to_string(index=False))
-    print(separator)
+from dbConnections import openMongo, addPoolArguments, getMongoDb, mongoOrderCount
+from reportRegistry import timedOperation, mongoSpec, runMongo, mongoRow, mongoColumns, reportFrame, columnsFrame, displayResults, showStreamedResults, reportMenu
+from reportCache import createCache, cacheKey, cacheGet, cachePut, checkCacheArguments, sourceGenerations, watchMongoWrites, displayCacheStats, addCacheArguments
+from resultStore import startRun, recordResult
 
+# Turned off by batch runs, so the report tables and timings aren't printed
+showResults = True
 
-def executeRevenueQuery(db):
-    global revenueQuery
+# Set by the --stream option, reads the results in chunks of this many documents instead of all at once
+streamBatchSize = None
 
-    startTime = time.time()
-    results = list(db.Order.aggregate(revenueQuery))
-    execTime = time.time() - startTime
+# Set by the --decode option, "columns" fills each DataFrame column in one pass over the documents,
+# "rows" builds a tuple for every document first
+decodeMode = "columns"
 
-    # Create a pandas DataFrame to display the results
-    data = {
-        "Product SKU:": [result["_id"]["product_SKU"] for result in results],
-        "Product Name:": [result["_id"]["product_Name"] for result in results],
-        "Quantity Sold:": [result["Quantity_Sold"] for result in results],
-        "Revenue:": [result["Revenue"] for result in results],
-    }
+# Set by the --cache options, a reportCache cache that serves repeated reports until they expire or their collections are
+# written to, writes are only seen when watchMongoWrites could open a change stream
+resultCache = None
 
-    df = pd.DataFrame(data)
-    displayQueryResults(df)
-
-    print(f"Execution Time: {execTime:.6f} seconds")
-    
-
-def executeUrgentOrdersQuery(db):
-    global melTZ, urgentOrdersQuery
 
-    startTime = time.time()
-    results = list(db.Order.find(urgentOrdersQuery["query"], urgentOrdersQuery["projection"]).sort("dueDate", 1))
-    execTime = time.time() - startTime
+def decodeResults(name, results):
+    # Builds the report DataFrame from the fetched documents, a column at a time or a row at a time as set by --decode
+    global decodeMode
 
-    # Create a pandas DataFrame to display the results
-    data = {
-        "Order ID:": [result["_id"] for result in results],
-        "Client:": [result["client"]["name"] for result in results],
-        "Street Address:": [result["client"]["address"]["streetAddress"] for result in results],
-        "Postcode:": [result["client"]["address"]["postcode"] for result in results],
-        "Due Date:": [result["dueDate"].replace(tzinfo=utc).astimezone(melTZ).strftime("%Y-%m-%d") for result in results],
-        "Status:": [result["status"] for result in results]
-    }
+    if decodeMode == "columns":
+        return columnsFrame(name, mongoColumns(name, results))
+    return reportFrame(name, [mongoRow(name, result) for result in results])
 
-    df = pd.DataFrame(data)
-    displayQueryResults(df)
 
-    print(f"Execution Time: {execTime:.6f} seconds")
+def executeReport(db, name, params=None, handleChunk=None):
+    # handleChunk, if given, is called with the report as DataFrames, one per chunk when streaming
+    # Returns the query time, the row count and the time taken to decode the documents into DataFrames
+    # A cache hit returns its lookup time and None for the decode time
+    global showResults, streamBatchSize, resultCache
 
+    if streamBatchSize:
+        return streamReport(db, name, params, handleChunk)
 
-def executeAlliedScQuery(db):
-    global alliedScQuery
+    if resultCache is not None:
+        key = cacheKey("mongo", name, params)
+        startTime = time.time()
+        df = cacheGet(resultCache, key)
+        if df is not None:
+            lookupTime = time.time() - startTime
+            if handleChunk:
+                handleChunk(df)
+            if showResults:
+                displayResults(df)
+                print(f"Served from cache, Lookup Time: {lookupTime:.6f} seconds")
+            return lookupTime, len(df), None
+        # Taken before the query, so a change stream invalidation arriving while it runs keeps the result out of the cache
+        generations = sourceGenerations(resultCache, "mongo", name)
 
     startTime = time.time()
-    results = list(db.Order.aggregate(alliedScQuery))
+    results = list(runMongo(db, mongoSpec(name, params)))
     execTime = time.time() - startTime
 
     # Create a pandas DataFrame to display the results
-    data = {
-        "Product SKU:": [result["_id"] for result in results],
-        "Quantity Sold:": [result["quantity"] for result in results],
-        "Shipping Courier:": [result["shippingCourierName"] for result in results],
-    }
+    startTime = time.time()
+    df = decodeResults(name, results)
+    decodeTime = time.time() - startTime
+    if resultCache is not None:
+        cachePut(resultCache, key, df, generations=generations)
+    if handleChunk:
+        handleChunk(df)
+    if showResults:
+        displayResults(df)
+        print(f"Execution Time: {execTime:.6f} seconds, Decode Time: {decodeTime:.6f} seconds")
+    return execTime, len(df), decodeTime
+
+
+def streamReport(db, name, params, handleChunk):
+    global showResults, streamBatchSize
+
+    # The cursor's getMore batches match the chunk size, so each chunk is roughly one round trip
+    # aggregate runs the pipeline straight away, find waits for the first fetch
+    startTime = time.time()
+    cursor = runMongo(db, mongoSpec(name, params), streamBatchSize)
+    execTime = time.time() - startTime
+    decodeTime = 0
+    preview = None
+    rowCount = 0
+    while True:
+        # Fetching and decoding are timed separately, what handleChunk does with the chunk isn't timed
+        startTime = time.time()
+        results = list(itertools.islice(cursor, streamBatchSize))
+        execTime += time.time() - startTime
+        if not results:
+            break
+        startTime = time.time()
+        df = decodeResults(name, results)
+        decodeTime += time.time() - startTime
+        if preview is None:
+            preview = df
+        if handleChunk:
+            handleChunk(df)
+        rowCount += len(df)
+    cursor.close()
+
+    if showResults:
+        showStreamedResults(preview, rowCount)
+        print(f"Execution Time: {execTime:.6f} seconds, Decode Time: {decodeTime:.6f} seconds")
+    return execTime, rowCount, decodeTime
 
-    df = pd.DataFrame(data)
-    displayQueryResults(df)
 
-    print(f"Execution Time: {execTime:.6f} seconds")
+def executeRevenueQuery(db):
+    return executeReport(db, "revenue")
 
 
-def executeDiscountQuery(db):
-    global discountQuery
+def executeUrgentOrdersQuery(db):
+    return executeReport(db, "urgentOrders")
 
-    startTime = time.time()
-    results = list(db.Order.aggregate(discountQuery))
-    execTime = time.time() - startTime
 
-    # Create a pandas DataFrame to display the results
-    data = {
-        "Order ID:": [result["_id"] for result in results],
-        "Client:": [result["clientName"] for result in results],
-        "Original Total:": [result["originalTotal"] for result in results],
-        "Sales Total:": [result["salesTotal"] for result in results],
-        "Discount (%):": [result["discountPercentage"] for result in results],
-    }
+def executeAlliedScQuery(db):
+    return executeReport(db, "alliedSc")
 
-    df = pd.DataFrame(data)
-    displayQueryResults(df)
 
-    print(f"Execution Time: {execTime:.6f} seconds")
+def executeDiscountQuery(db):
+    return executeReport(db, "discount")
 
 
 def executeOrdersInfoQuery(db):
-    global ordersInfoQuery
+    return executeReport(db, "ordersInfo")
 
-    startTime = time.time()
-    results = list(db.Order.find(ordersInfoQuery["query"], ordersInfoQuery["projection"]))
-    execTime = time.time() - startTime
 
-    # Create a pandas DataFrame to display the results
-    data = {
-        "Order ID:": [result["_id"] for result in results],
-        "Client:": [result["client"]["name"] for result in results],
-        "Client Phone:": [result["client"]["phone"] for result in results],
-        "Client Email:": [result["client"]["email"] for result in results],
-        "Street Address:": [result["client"]["address"]["streetAddress"] for result in results],
-        "State:": [result["client"]["address"]["state"] for result in results],
-        "Postcode:": [result["client"]["address"]["postcode"] for result in results],
-        "Order Date:": [result["orderDate"].replace(tzinfo=utc).astimezone(melTZ).strftime("%Y-%m-%d") for result in results],
-        "Due Date:": [result["dueDate"].replace(tzinfo=utc).astimezone(melTZ).strftime("%Y-%m-%d") for result in results],
-        "Status:": [result["status"] for result in results],
-        "Shipping Courier:": [result.get("delivery", {}).get("shippingCourierName", "N/A") for result in results],
-        "Tracking Number:": [result.get("delivery", {}).get("trackingNumber", "N/A") for result in results],
-        "Shipping Date:": [
-           (result.get("delivery", {}).get("shippingDate", "N/A"))
-            if result.get("delivery", {}).get("shippingDate") is None
-            else result ["delivery"]["shippingDate"].replace(tzinfo=utc).astimezone(melTZ).strftime("%Y-%m-%d")
-            for result in results
-        ]
-    }
-
-    df = pd.DataFrame(data)
-    displayQueryResults(df)
-
-    print(f"Execution Time: {execTime:.6f} seconds")
-
-
-def queryMenu(db):
-    finished = False
-    
-    while not finished:
-        
-        print("\nQueries menu:")
-        print("1. Total revenue per product")
-        print("2. Urgent orders")
-        print("3. Order items shipped by Allied Express")
-        print("4. Discount on all orders")
-        print("5. Order information")
-        print("6. Exit program")
-
-        choice = input("Please enter your choice (1-6): ")
-
-        match choice:
-            case "1":
-                executeRevenueQuery(db)
-            case "2":
-                executeUrgentOrdersQuery(db)
-            case "3":
-                executeAlliedScQuery(db)
-            case "4":
-                executeDiscountQuery(db)
-            case "5":
-                executeOrdersInfoQuery(db)
-            case "6":
-                print("Exiting program")
-                finished = True
-            case _:
-                print("Please input an integer (1-6)")
+def recordQuery(run, operation, result, datasetSize):
+    # Each menu choice is stored as one sample of that report, so repeating a choice builds up a distribution
+    execTime, rows, decodeTime = result
+    if run:
+        recordResult(run, "mongo", timedOperation(operation, decodeTime), [execTime], datasetSize,
+                     extra={"rows": rows, "decodeTime": decodeTime, "cache": resultCache is not None})
+
+
+def queryMenu(db, run=None, datasetSize=None):
+    reportMenu(lambda name: recordQuery(run, name, executeReport(db, name), datasetSize))
 
 
 def main():
+    global streamBatchSize, decodeMode, resultCache
+
+    parser = argparse.ArgumentParser(description="Run the orders report queries against MongoDB")
+    parser.add_argument("--stream", type=int, metavar="DOCUMENTS", help="Read the results DOCUMENTS at a time and only show the first chunk, for reports too large to hold in memory")
+    parser.add_argument("--decode", choices=["columns", "rows"], default="columns", help="Decode the results a column or a row at a time (default: columns)")
+    addCacheArguments(parser)
+    addPoolArguments(parser)
+    args = parser.parse_args()
+    checkCacheArguments(parser, args)
+    streamBatchSize = args.stream
+    decodeMode = args.decode
+
     # Connect to MongoDB
-    client = MongoClient(
-        host=os.getenv("MONGODB_URI"),
-        username=os.getenv("MONGODB_USER"),
-        password=os.getenv("MONGODB_PASSWORD"),
-        authSource=os.getenv("MONGODB_AUTHSERVER")
-    )
-    db = client[os.getenv("MONGODB_DB")]
+    client = openMongo(args.pooled)
+    db = getMongoDb(client)
     print("Connected to database")
-    
-    queryMenu(db)
+    if args.cache:
+        resultCache = createCache(args.cache_entries, args.cache_rows, args.cache_ttl)
+        watchMongoWrites(resultCache, db)
+
+    run = startRun("queriesMongo.py")
+    queryMenu(db, run, mongoOrderCount(db))
+    print(f"Stored timings as run {run['runID']}")
+    if resultCache is not None:
+        displayCacheStats(resultCache)
 
     client.close()
 
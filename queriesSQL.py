@@ -1,180 +1,239 @@
-import mysql.connector
-from dotenv import load_dotenv
-import pandas as pd
-import os
+import argparse
 import time
 
-load_dotenv()
+from dbConnections import openMySQL, addPoolArguments, mysqlOrderCount
+from reportRegistry import timedOperation, sqlStatement, sqlRow, sqlColumns, reportFrame, columnsFrame, displayResults, showStreamedResults, reportMenu
+from reportCache import createCache, cacheKey, cacheGet, cachePut, checkCacheArguments, sourceGenerations, mysqlIsCurrent, mysqlServerTime, displayCacheStats, addCacheArguments
+from resultStore import startRun, recordResult
 
+# Set by the --prepared option, runs the reports as server-side prepared statements instead of text protocol queries
+usePreparedStatements = False
+
+# Turned off by batch runs, so the report tables and timings aren't printed
+showResults = True
+
+# Set by the --stream option, reads the results in chunks of this many rows instead of all at once
+streamBatchSize = None
+
+# Set by the --decode option, "columns" fills each DataFrame column in one pass over plain tuples,
+# "rows" builds a dictionary and then a tuple for every row
+decodeMode = "columns"
+
+# Set by the --cache options, a reportCache cache that serves repeated reports until they expire or their tables are written to
+resultCache = None
+
+# One prepared cursor per (connection, query), so each statement is only parsed and planned by the server once
+preparedCursors = {}
+
+
+def preparableQuery(query):
+    # The binary protocol takes a single statement without the trailing semicolon
+    return query.strip().rstrip(";")
+
+
+def getPreparedCursor(db, query):
+    key = (id(db), query)
+    if key not in preparedCursors:
+        preparedCursors[key] = db.cursor(prepared=True)
+    return preparedCursors[key]
+
+
+def execute_query(db, query, params=None, dictionary=True):
+    # dictionary=False returns plain tuples in SELECT order, which skips building a dictionary for every row
+    global usePreparedStatements
 
-def execute_query(db, query, params=None):
     cursor = db.cursor(dictionary=True)
     
     cursor.execute("SET profiling = 1;")
-    cursor.execute(query, params)
-    results = cursor.fetchall()
-    
-    cursor.execute("SHOW PROFILES;")
-    profiles = cursor.fetchall()
-
-     # Get the last executed query's profiling info
-    if profiles:
-        lastQueryProfile = profiles[-1] # Get the last query profile
-        execTime = lastQueryProfile["Duration"]  # Execution time of the last query
+    if usePreparedStatements:
+        # Prepared cursors return tuples, so build the dictionaries from the column names
+        preparedCursor = getPreparedCursor(db, query)
+        preparedCursor.execute(preparableQuery(query), params)
+        results = preparedCursor.fetchall()
+        if dictionary:
+            results = [dict(zip(preparedCursor.column_names, row)) for row in results]
+    else:
+        queryCursor = cursor if dictionary else db.cursor()
+        queryCursor.execute(query, params)
+        results = queryCursor.fetchall()
+        if not dictionary:
+            queryCursor.close()
     
+    execTime = lastProfileDuration(cursor)
     cursor.execute("SET profiling = 0;")
     cursor.close()
     
     return results, execTime
 
 
-def displayResults(df):
-    resultString = df.to_string(index=False)
-    separatorLength = max(len(resultString.split('\n')[0]), len(resultString.split('\n')[1]))
-    separator = "-" * separatorLength
-    print(separator)
-    print(resultString)
-    print(separator)
+def stream_query(db, query, params, fetchSize, handleChunk, dictionary=True):
+    # Like execute_query, but the rows are read off the connection fetchSize at a time and handed to handleChunk,
+    # so only one chunk is held in memory however large the result is
+    global usePreparedStatements
+
+    cursor = db.cursor(dictionary=True)
+
+    cursor.execute("SET profiling = 1;")
+    if usePreparedStatements:
+        streamCursor = getPreparedCursor(db, query)
+        streamCursor.execute(preparableQuery(query), params)
+    else:
+        # An unbuffered cursor, so fetchmany pulls the next rows from the server instead of a client-side copy
+        streamCursor = cursor if dictionary else db.cursor()
+        streamCursor.execute(query, params)
+
+    rowCount = 0
+    while rows := streamCursor.fetchmany(fetchSize):
+        if usePreparedStatements and dictionary:
+            rows = [dict(zip(streamCursor.column_names, row)) for row in rows]
+        handleChunk(rows)
+        rowCount += len(rows)
+    if streamCursor is not cursor and not usePreparedStatements:
+        streamCursor.close()
+
+    execTime = lastProfileDuration(cursor)
+    cursor.execute("SET profiling = 0;")
+    cursor.close()
+
+    return rowCount, execTime
+
+
+def lastProfileDuration(cursor):
+    cursor.execute("SHOW PROFILES;")
+    profiles = cursor.fetchall()
+
+    # Get the last executed query's profiling info
+    lastQueryProfile = profiles[-1] # Get the last query profile
+    return lastQueryProfile["Duration"]  # Execution time of the last query
+
+
+def decodeResults(name, results):
+    # Builds the report DataFrame from the fetched rows, a column at a time or a row at a time as set by --decode
+    global decodeMode
+
+    if decodeMode == "columns":
+        return columnsFrame(name, sqlColumns(name, results))
+    return reportFrame(name, [sqlRow(name, row) for row in results])
+
+
+def executeReport(db, name, params=None, handleChunk=None):
+    # handleChunk, if given, is called with the report as DataFrames, one per chunk when streaming
+    # Returns the query time, the row count and the time taken to decode the rows into DataFrames
+    # A cache hit returns its lookup time and None for the decode time
+    global showResults, streamBatchSize, decodeMode, resultCache
+
+    query, values = sqlStatement(name, params)
+    if streamBatchSize:
+        return streamReport(db, name, query, values, handleChunk)
+
+    if resultCache is not None:
+        # A hit's time is the lookup, including the UPDATE_TIME check of the report's tables
+        key = cacheKey("mysql", name, params)
+        startTime = time.perf_counter()
+        df = cacheGet(resultCache, key, mysqlIsCurrent(db, name))
+        if df is not None:
+            lookupTime = time.perf_counter() - startTime
+            if handleChunk:
+                handleChunk(df)
+            if showResults:
+                displayResults(df)
+                print(f"Served from cache, Lookup Time: {lookupTime:.6f} seconds")
+            return lookupTime, len(df), None
+        # Taken before the query, so a write landing while it runs makes the entry stale
+        filledAt = mysqlServerTime(db)
+        generations = sourceGenerations(resultCache, "mysql", name)
+
+    results, execTime = execute_query(db, query, values, dictionary=(decodeMode == "rows"))
+    startTime = time.perf_counter()
+    df = decodeResults(name, results)
+    decodeTime = time.perf_counter() - startTime
+    if resultCache is not None:
+        cachePut(resultCache, key, df, filledAt, generations)
+    if handleChunk:
+        handleChunk(df)
+    if showResults:
+        displayResults(df)
+        print(f"Execution Time: {execTime:.6f} seconds, Decode Time: {decodeTime:.6f} seconds")
+    return execTime, len(df), decodeTime
+
+
+def streamReport(db, name, query, values, handleChunk):
+    global showResults, streamBatchSize, decodeMode
+
+    preview = []
+    decodeTime = 0
+
+    def handleRows(results):
+        nonlocal decodeTime
+        startTime = time.perf_counter()
+        df = decodeResults(name, results)
+        decodeTime += time.perf_counter() - startTime
+        if not preview:
+            preview.append(df)
+        if handleChunk:
+            handleChunk(df)
+
+    rowCount, execTime = stream_query(db, query, values, streamBatchSize, handleRows, dictionary=(decodeMode == "rows"))
+    if showResults:
+        showStreamedResults(preview[0] if preview else None, rowCount)
+        print(f"Execution Time: {execTime:.6f} seconds, Decode Time: {decodeTime:.6f} seconds")
+    return execTime, rowCount, decodeTime
+
 
 def executeRevenueQuery(db):
-    revenueQuery = """
-    SELECT 
-        p.product_SKU, 
-        p.product_Name, 
-        SUM(oi.orderItem_Quantity) AS Quantity_Sold, 
-        SUM(oi.orderItem_Quantity * oi.orderItem_SalePrice) AS Revenue
-    FROM OrderItem oi
-    JOIN Product p ON oi.product_SKU = p.product_SKU
-    GROUP BY p.product_SKU, p.product_Name
-    ORDER BY Revenue DESC;
-    """
-    results, execTime = execute_query(db, revenueQuery)
-    df = pd.DataFrame(results)
-    displayResults(df)
-    print(f"Execution Time: {execTime:.6f} seconds")
+    return executeReport(db, "revenue")
 
 def executeUrgentOrdersQuery(db):
-    urgentOrdersQuery = """
-    SELECT co.clientOrder_ID, c.client_Name, a.address_StreetAddress, a.address_Postcode, co.clientOrder_DueDate, co.clientOrder_Status
-    FROM ClientOrder co
-    JOIN ClientAddress ca ON co.client_ID = ca.client_ID AND co.address_ID = ca.address_ID
-    JOIN Client c ON ca.client_ID = c.client_ID
-    JOIN Address a ON ca.address_ID = a.address_ID
-    WHERE co.clientOrder_DueDate BETWEEN '2024-10-07' AND '2024-10-07' + INTERVAL 7 DAY
-    AND co.clientOrder_Status = 'Processing'
-    ORDER BY co.clientOrder_DueDate DESC;
-    """
-    results, execTime = execute_query(db, urgentOrdersQuery)
-    df = pd.DataFrame(results)
-    displayResults(df)
-    print(f"Execution Time: {execTime:.6f} seconds")
+    return executeReport(db, "urgentOrders")
 
 def executeAlliedScQuery(db):
-    alliedScQuery = """
-    SELECT oi.product_SKU, SUM(oi.orderItem_Quantity) AS quantity, s.shippingCourier_Name
-    FROM OrderItem oi
-    JOIN ClientOrder o ON oi.clientOrder_ID = o.clientOrder_ID
-    JOIN Delivery d ON o.delivery_ID = d.delivery_ID
-    JOIN ShippingCourier s on d.shippingCourier_ID = s.shippingCourier_ID
-    WHERE s.shippingCourier_Name = 'Allied Express'
-    GROUP BY oi.product_SKU;
-    """
-    results, execTime = execute_query(db, alliedScQuery)
-    df = pd.DataFrame(results)
-    displayResults(df)
-    print(f"Execution Time: {execTime:.6f} seconds")
+    return executeReport(db, "alliedSc")
 
 def executeDiscountQuery(db):
-    discountQuery = """
-    SELECT 
-        co.clientOrder_ID,
-        c.client_Name,
-        SUM(oi.orderItem_Quantity * p.product_Price) AS Original_Total,
-        SUM(oi.orderItem_Quantity * oi.orderItem_SalePrice) AS Sales_Total,
-        (SUM(oi.orderItem_Quantity * (p.product_Price - oi.orderItem_SalePrice)) / 
-        NULLIF(SUM(oi.orderItem_Quantity * p.product_Price), 0)) * 100 AS Discount_Percentage
-    FROM ClientOrder co
-    JOIN Client c ON co.client_ID = c.client_ID
-    JOIN OrderItem oi ON co.clientOrder_ID = oi.clientOrder_ID
-    JOIN Product p ON oi.product_SKU = p.product_SKU
-    GROUP BY co.clientOrder_ID
-    ORDER BY co.clientOrder_ID;
-    """
-    results, execTime = execute_query(db, discountQuery)
-    df = pd.DataFrame(results)
-    displayResults(df)
-    print(f"Execution Time: {execTime:.6f} seconds")
+    return executeReport(db, "discount")
 
 def executeOrdersInfoQuery(db):
-    ordersInfoQuery = """
-    SELECT
-        co.clientOrder_ID,
-        c.client_Name,
-        c.client_Phone,
-        c.client_Email,
-        a.address_StreetAddress,
-        a.address_State,
-        a.address_Postcode,
-        co.clientOrder_Date,
-        co.clientOrder_DueDate,
-        co.clientOrder_Status,
-        sc.shippingCourier_Name,
-        d.delivery_TrackingNumber,
-        d.delivery_ShippingDate
-    FROM ClientOrder co
-    JOIN Client c on co.client_ID = c.client_ID
-    JOIN Address a on co.address_ID = a.address_ID
-    LEFT JOIN Delivery d ON co.delivery_ID = d.delivery_ID
-    LEFT JOIN ShippingCourier sc ON d.shippingCourier_ID = sc.shippingCourier_ID
-    ORDER BY co.clientOrder_ID;
-    """
-    results, execTime = execute_query(db, ordersInfoQuery)
-    df = pd.DataFrame(results)
-    displayResults(df)
-    print(f"Execution Time: {execTime:.6f} seconds")
-
-def queryMenu(db):
-    finished = False
-    
-    while not finished:
-        print("\nQueries menu:")
-        print("1. Total revenue per product")
-        print("2. Urgent orders")
-        print("3. Order items shipped by Allied Express")
-        print("4. Discount on all orders")
-        print("5. Order information")
-        print("6. Exit program")
-
-        choice = input("Please enter your choice (1-6): ")
-
-        match choice:
-            case "1":
-                executeRevenueQuery(db)
-            case "2":
-                executeUrgentOrdersQuery(db)
-            case "3":
-                executeAlliedScQuery(db)
-            case "4":
-                executeDiscountQuery(db)
-            case "5":
-                executeOrdersInfoQuery(db)
-            case "6":
-                print("Exiting program")
-                finished = True
-            case _:
-                print("Please input an integer (1-6)")
+    return executeReport(db, "ordersInfo")
+
+
+def recordQuery(run, operation, result, datasetSize):
+    # Each menu choice is stored as one sample of that report, so repeating a choice builds up a distribution
+    execTime, rows, decodeTime = result
+    if run:
+        recordResult(run, "mysql", timedOperation(operation, decodeTime), [execTime], datasetSize,
+                     extra={"rows": rows, "decodeTime": decodeTime, "cache": resultCache is not None})
+
+
+def queryMenu(db, run=None, datasetSize=None):
+    reportMenu(lambda name: recordQuery(run, name, executeReport(db, name), datasetSize))
+
 
 def main():
+    global usePreparedStatements, streamBatchSize, decodeMode, resultCache
+
+    parser = argparse.ArgumentParser(description="Run the orders report queries against MySQL")
+    parser.add_argument("--prepared", action="store_true", help="Run the queries as server-side prepared statements")
+    parser.add_argument("--stream", type=int, metavar="ROWS", help="Read the results ROWS at a time and only show the first chunk, for reports too large to hold in memory")
+    parser.add_argument("--decode", choices=["columns", "rows"], default="columns", help="Decode the results a column or a row at a time (default: columns)")
+    addCacheArguments(parser)
+    addPoolArguments(parser)
+    args = parser.parse_args()
+    checkCacheArguments(parser, args)
+    usePreparedStatements = args.prepared
+    streamBatchSize = args.stream
+    decodeMode = args.decode
+    if args.cache:
+        resultCache = createCache(args.cache_entries, args.cache_rows, args.cache_ttl)
+
     # Connect to MySQL
-    db = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DB")
-    )
+    db = openMySQL(args.pooled)
     print("Connected to database")
-    
-    queryMenu(db)
+
+    run = startRun("queriesSQL.py")
+    queryMenu(db, run, mysqlOrderCount(db))
+    print(f"Stored timings as run {run['runID']}")
+    if resultCache is not None:
+        displayCacheStats(resultCache)
 
     db.close()
 
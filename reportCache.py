@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+from pymongo.errors import OperationFailure
+
+from benchmarkHarness import displayTable
+from reportRegistry import reportDefinitions, reportParams
+
+
+# Keeps report DataFrames so repeated runs of a report with the same parameters don't go back to the database
+# Entries are keyed by backend, report and parameters, expire after a TTL and are evicted least recently used first
+# once there are more than maxEntries of them or they hold more than maxRows rows between them
+# Writes drop the entries of every report reading the written tables or collections:
+#   MySQL   - each hit checks information_schema UPDATE_TIME of the report's tables against when the entry was filled,
+#             UPDATE_TIME is to the second and isn't kept across a server restart, so a NULL one always misses
+#   MongoDB - a change stream on the report collections, which needs a replica set, otherwise only the TTL applies
+#   Either  - invalidateSources, for code that knows what it just wrote to
+# Every invalidation also bumps a counter per table or collection, a result is only stored if the counters of its sources
+# haven't moved since before its query ran, so a write invalidated while the query was running can't leave it cached
+
+
+def createCache(maxEntries=128, maxRows=None, ttl=300.0):
+    return {
+        "entries": OrderedDict(),
+        "maxEntries": maxEntries,
+        "maxRows": maxRows,
+        "ttl": ttl,
+        "rows": 0,
+        "generations": {},
+        "stats": {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0},
+        # The MongoDB change stream invalidates from its own thread
+        "lock": threading.RLock()
+    }
+
+
+def cacheKey(backend, name, params=None):
+    return backend, name, tuple(sorted(reportParams(name, params).items()))
+
+
+def reportSources(backend, name):
+    return reportDefinitions[name]["tables" if backend == "mysql" else "collections"]
+
+
+def sourceGenerations(cache, backend, name):
+    # Read before running a report's query and handed to cachePut
+    with cache["lock"]:
+        return tuple(cache["generations"].get((backend, source), 0) for source in reportSources(backend, name))
+
+
+def removeEntry(cache, key, reason):
+    entry = cache["entries"].pop(key)
+    cache["rows"] -= len(entry["value"])
+    cache["stats"][reason] += 1
+
+
+def cacheGet(cache, key, isCurrent=None):
+    # Returns the cached DataFrame or None, isCurrent(entry) can reject an entry that a write has made stale
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry and time.monotonic() - entry["storedAt"] > cache["ttl"]:
+            removeEntry(cache, key, "expirations")
+            entry = None
+        if entry and isCurrent and not isCurrent(entry):
+            removeEntry(cache, key, "invalidations")
+            entry = None
+        if not entry:
+            cache["stats"]["misses"] += 1
+            return None
+        cache["entries"].move_to_end(key)
+        cache["stats"]["hits"] += 1
+        return entry["value"]
+
+
+def cachePut(cache, key, value, marker=None, generations=None):
+    # marker is whatever isCurrent needs later, such as the server time the entry was filled at
+    # generations is sourceGenerations from before the query, the value isn't stored if its sources were invalidated since
+    with cache["lock"]:
+        if generations is not None and generations != sourceGenerations(cache, key[0], key[1]):
+            return
+        if key in cache["entries"]:
+            removeEntry(cache, key, "evictions")
+            cache["stats"]["evictions"] -= 1        # Replacing an entry isn't an eviction
+        if cache["maxRows"] is not None and len(value) > cache["maxRows"]:
+            return
+        cache["entries"][key] = {"value": value, "storedAt": time.monotonic(), "marker": marker}
+        cache["rows"] += len(value)
+        while len(cache["entries"]) > cache["maxEntries"] or (cache["maxRows"] is not None and cache["rows"] > cache["maxRows"]):
+            removeEntry(cache, next(iter(cache["entries"])), "evictions")
+
+
+def invalidateSources(cache, backend, sources):
+    # Drops every entry of a report that reads one of the given tables or collections
+    with cache["lock"]:
+        for source in sources:
+            cache["generations"][backend, source] = cache["generations"].get((backend, source), 0) + 1
+        stale = [key for key in cache["entries"] if key[0] == backend and set(reportSources(backend, key[1])) & set(sources)]
+        for key in stale:
+            removeEntry(cache, key, "invalidations")
+        return len(stale)
+
+
+def mysqlServerTime(connection):
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("SELECT NOW()")
+    serverTime = cursor.fetchone()[0]
+    cursor.close()
+    return serverTime
+
+
+def mysqlLastWrite(connection, tables):
+    # Latest UPDATE_TIME of the tables, None if any of them hasn't been written to since the server started
+    # UPDATE_TIME is only read fresh with the information_schema statistics cache turned off for the session
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    cursor.execute(f"""
+        SELECT IF(COUNT(UPDATE_TIME) < COUNT(*), NULL, MAX(UPDATE_TIME)) FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({", ".join(["%s"] * len(tables))})
+    """, tables)
+    lastWrite = cursor.fetchone()[0]
+    cursor.close()
+    return lastWrite
+
+
+def mysqlIsCurrent(connection, name):
+    # Both times are to the second, so a write in the same second as the fill counts as newer
+    # A NULL UPDATE_TIME can't tell whether the tables were written to before a restart, so the entry is treated as stale
+    tables = reportSources("mysql", name)
+
+    def isCurrent(entry):
+        lastWrite = mysqlLastWrite(connection, tables)
+        return lastWrite is not None and lastWrite < entry["marker"]
+    return isCurrent
+
+
+def watchMongoWrites(cache, db):
+    # Invalidates from a change stream on every collection a report reads, returns False if the server can't open one
+    collections = sorted({collection for definition in reportDefinitions.values() for collection in definition["collections"]})
+    try:
+        stream = db.watch([{"$match": {"ns.coll": {"$in": collections}}}])
+    except OperationFailure:
+        print("MongoDB change streams need a replica set, cached MongoDB reports will only expire by TTL")
+        return False
+
+    def follow():
+        with stream:
+            for change in stream:
+                invalidateSources(cache, "mongo", [change["ns"]["coll"]])
+
+    threading.Thread(target=follow, daemon=True).start()
+    return True
+
+
+def cacheStats(cache):
+    with cache["lock"]:
+        stats = dict(cache["stats"])
+        stats.update({"entries": len(cache["entries"]), "rows": cache["rows"]})
+    lookups = stats["hits"] + stats["misses"]
+    stats["hitRatio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def displayCacheStats(cache):
+    stats = cacheStats(cache)
+    print("\n-----Report Cache-----")
+    displayTable({
+        "Hits:": [stats["hits"]],
+        "Misses:": [stats["misses"]],
+        "Hit Ratio:": [f"{stats['hitRatio'] * 100:.1f}%"],
+        "Evictions:": [stats["evictions"]],
+        "Expirations:": [stats["expirations"]],
+        "Invalidations:": [stats["invalidations"]],
+        "Entries:": [stats["entries"]],
+        "Rows:": [stats["rows"]]
+    })
+
+
+def addCacheArguments(parser):
+    parser.add_argument("--cache", action="store_true", help="Serve repeated reports from a result cache (can't be combined with --stream)")
+    parser.add_argument("--cache-entries", type=int, default=128, help="Most reports the cache holds (default: 128)")
+    parser.add_argument("--cache-rows", type=int, help="Most rows the cache holds across all reports (default: no limit)")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="Seconds a cached report is served for (default: 300)")
+
+
+def checkCacheArguments(parser, args):
+    # Streamed reports are never held in memory whole, so there's nothing to cache
+    if args.cache and args.stream:
+        parser.error("--cache can't be combined with --stream")
@@ -0,0 +1,560 @@
+import csv
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+from pytz import timezone, utc
+import pandas as pd
+
+
+# The five reports, each declared once for both backends
+# A report has:
+#   title        - the menu entry
+#   params       - parameter names and their default values
+#   tables       - MySQL tables it reads, collections - MongoDB collections it reads
+#   sql          - MySQL query, with %(name)s placeholders for the parameters
+#   mongo        - function taking the parameters and returning a find or aggregate spec, see runMongo
+#   columns      - output schema, in SELECT order: a label, the MySQL column, the dotted path in the MongoDB result and a type
+#                  (id, text, int, decimal or date), compared=False marks surrogate IDs and derived values the stores don't agree on
+
+melTZ = timezone("Australia/Melbourne")
+
+
+def localMidnight(day):
+    # Midnight in Melbourne on the given date, as the UTC datetime MongoDB stores
+    return melTZ.localize(datetime.combine(day, datetime.min.time())).astimezone(utc)
+
+
+revenueSQL = """
+SELECT
+    p.product_SKU,
+    p.product_Name,
+    SUM(oi.orderItem_Quantity) AS Quantity_Sold,
+    SUM(oi.orderItem_Quantity * oi.orderItem_SalePrice) AS Revenue
+FROM OrderItem oi
+JOIN Product p ON oi.product_SKU = p.product_SKU
+GROUP BY p.product_SKU, p.product_Name
+ORDER BY Revenue DESC;
+"""
+
+
+def revenueMongo(params):
+    # Aggregation pipeline, so we can calculate the sum of sold items and the revenue
+    pipeline = [
+        # The embedded items document in each order is unwinded so we can work with each one individually
+        # This contains the order items and some product info
+        # The embedded info means we don't need to reference any other collection
+        {"$unwind": "$items"},
+
+        # GROUP BY product SKU and Name
+        # This is to calculate the quantity sold and the revenue
+        {
+            "$group":  {
+                "_id": {
+                    "product_SKU": "$items.sku",
+                    "product_Name": "$items.name"
+                },
+                "Quantity_Sold": {"$sum": "$items.quantity"},
+                "Revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.salePrice"]}}
+            }
+        },
+
+        # ORDER BY Revenue in descending order
+        {"$sort": {"Revenue": -1}}
+    ]
+    return {"collection": "Order", "pipeline": pipeline}
+
+
+urgentOrdersSQL = """
+SELECT co.clientOrder_ID, c.client_Name, a.address_StreetAddress, a.address_Postcode, co.clientOrder_DueDate, co.clientOrder_Status
+FROM ClientOrder co
+JOIN ClientAddress ca ON co.client_ID = ca.client_ID AND co.address_ID = ca.address_ID
+JOIN Client c ON ca.client_ID = c.client_ID
+JOIN Address a ON ca.address_ID = a.address_ID
+WHERE co.clientOrder_DueDate BETWEEN %(dueFrom)s AND %(dueFrom)s + INTERVAL %(days)s DAY
+AND co.clientOrder_Status = %(status)s
+ORDER BY co.clientOrder_DueDate DESC;
+"""
+
+
+def urgentOrdersMongo(params):
+    # Follows the SQL report rather than the original MongoDB query, which left out orders due on the last day
+    # (2024-10-14 by default) and listed the earliest due date first, so both backends now return the same rows in the same order
+    return {
+        "collection": "Order",
+        # Basically the WHERE clause, BETWEEN includes the last day so the range ends at the midnight after it
+        "filter": {
+            "dueDate": {
+                "$gte": localMidnight(params["dueFrom"]),
+                "$lt": localMidnight(params["dueFrom"] + timedelta(days=params["days"] + 1))
+            },
+            "status": params["status"]
+        },
+        # Basically the SELECT clause
+        "projection": {
+            "_id": 1,
+            "client.name": 1,
+            "client.address.streetAddress": 1,
+            "client.address.postcode": 1,
+            "dueDate": 1,
+            "status": 1
+        },
+        # Latest due date first, the same as the SQL ORDER BY
+        "sort": {"dueDate": -1}
+    }
+
+
+alliedScSQL = """
+SELECT oi.product_SKU, SUM(oi.orderItem_Quantity) AS quantity, s.shippingCourier_Name
+FROM OrderItem oi
+JOIN ClientOrder o ON oi.clientOrder_ID = o.clientOrder_ID
+JOIN Delivery d ON o.delivery_ID = d.delivery_ID
+JOIN ShippingCourier s on d.shippingCourier_ID = s.shippingCourier_ID
+WHERE s.shippingCourier_Name = %(courier)s
+GROUP BY oi.product_SKU;
+"""
+
+
+def alliedScMongo(params):
+    pipeline = [
+        # Match orders shipped by the courier
+        {"$match": {"delivery.shippingCourierName": params["courier"]}},
+
+        # Unwind the embedded items document
+        {"$unwind": "$items"},
+
+        # Group by the SKU and sum up the quantities sold
+        {
+            "$group": {
+                "_id": "$items.sku",
+                "quantity": {"$sum":  "$items.quantity"},
+                "shippingCourierName": {"$first": "$delivery.shippingCourierName"}  # Use first to retain the shipping courier name for each grouped document
+            }                                                                       # This is safe, since all documents will have the matched courier
+        }
+    ]
+    return {"collection": "Order", "pipeline": pipeline}
+
+
+discountSQL = """
+SELECT
+    co.clientOrder_ID,
+    c.client_Name,
+    SUM(oi.orderItem_Quantity * p.product_Price) AS Original_Total,
+    SUM(oi.orderItem_Quantity * oi.orderItem_SalePrice) AS Sales_Total,
+    (SUM(oi.orderItem_Quantity * (p.product_Price - oi.orderItem_SalePrice)) /
+    NULLIF(SUM(oi.orderItem_Quantity * p.product_Price), 0)) * 100 AS Discount_Percentage
+FROM ClientOrder co
+JOIN Client c ON co.client_ID = c.client_ID
+JOIN OrderItem oi ON co.clientOrder_ID = oi.clientOrder_ID
+JOIN Product p ON oi.product_SKU = p.product_SKU
+GROUP BY co.clientOrder_ID
+ORDER BY co.clientOrder_ID;
+"""
+
+
+def discountMongo(params):
+    pipeline = [
+        # Expand embedded items document
+        {"$unwind": "$items"},
+        # This is equivalent to a JOIN
+        # Get product document associated with item
+        {
+            "$lookup": {
+                "from": "Product",
+                "localField": "items.sku",
+                "foreignField": "_id",
+                "as": "productDetails"
+            }
+        },
+        # Expand obtained product document
+        {"$unwind": "$productDetails"},
+        # Group together values according to the order ID
+        {
+            "$group": {
+                "_id": "$_id",
+                "clientName": {"$first": "$client.name"},
+                "originalTotal": {"$sum": {"$multiply": [{"$toDecimal": "$items.quantity"}, {"$toDecimal": "$productDetails.price"}]}},
+                "salesTotal": {"$sum": {"$multiply": [{"$toDecimal": "$items.quantity"}, {"$toDecimal": "$items.salePrice"}]}},
+                "totalDiscountAmount": {
+                    "$sum": {
+                        "$multiply": [
+                            {"$toDecimal": "$items.quantity"},
+                            {"$subtract": [{"$toDecimal": "$productDetails.price"}, {"$toDecimal": "$items.salePrice"}]}
+                        ]
+                    }
+                }
+            }
+        },
+        # Fields to display
+        # Calculate discount percent
+        {
+            "$project": {
+                "clientName": 1,
+                "originalTotal": 1,
+                "salesTotal": 1,
+                "discountPercentage": {
+                    "$round": [
+                        {
+                            "$cond": {
+                                "if": {"$gt": ["$originalTotal", Decimal128("0.0")]},
+                                "then": {"$multiply": [{"$divide": ["$totalDiscountAmount", "$originalTotal"]}, 100]},
+                                "else": Decimal128("0.0")
+                            }
+                        },
+                        2           # Round to 2 decimal places for readability
+                    ]
+                }
+            }
+        },
+        # Order results by their ID
+        {"$sort": {"_id": 1}}
+    ]
+    return {"collection": "Order", "pipeline": pipeline}
+
+
+ordersInfoSQL = """
+SELECT
+    co.clientOrder_ID,
+    c.client_Name,
+    c.client_Phone,
+    c.client_Email,
+    a.address_StreetAddress,
+    a.address_State,
+    a.address_Postcode,
+    co.clientOrder_Date,
+    co.clientOrder_DueDate,
+    co.clientOrder_Status,
+    sc.shippingCourier_Name,
+    d.delivery_TrackingNumber,
+    d.delivery_ShippingDate
+FROM ClientOrder co
+JOIN Client c on co.client_ID = c.client_ID
+JOIN Address a on co.address_ID = a.address_ID
+LEFT JOIN Delivery d ON co.delivery_ID = d.delivery_ID
+LEFT JOIN ShippingCourier sc ON d.shippingCourier_ID = sc.shippingCourier_ID
+ORDER BY co.clientOrder_ID;
+"""
+
+
+def ordersInfoMongo(params):
+    return {
+        "collection": "Order",
+        # Basically the WHERE clause
+        "filter": {},
+        # Basically the SELECT clause
+        "projection": {
+            "_id": 1,
+            "client.name": 1,
+            "client.phone": 1,
+            "client.email": 1,
+            "client.address.streetAddress": 1,
+            "client.address.state": 1,
+            "client.address.postcode": 1,
+            "orderDate": 1,
+            "dueDate": 1,
+            "status": 1,
+            "delivery.shippingCourierName": 1,
+            "delivery.trackingNumber": 1,
+            "delivery.shippingDate": 1
+        }
+    }
+
+
+reportDefinitions = {
+    "revenue": {
+        "title": "Total revenue per product",
+        "params": {},
+        "tables": ["OrderItem", "Product"],
+        "collections": ["Order"],
+        "sql": revenueSQL,
+        "mongo": revenueMongo,
+        "columns": [
+            {"label": "Product SKU", "sql": "product_SKU", "mongo": "_id.product_SKU", "type": "text"},
+            {"label": "Product Name", "sql": "product_Name", "mongo": "_id.product_Name", "type": "text"},
+            {"label": "Quantity Sold", "sql": "Quantity_Sold", "mongo": "Quantity_Sold", "type": "int"},
+            {"label": "Revenue", "sql": "Revenue", "mongo": "Revenue", "type": "decimal"}
+        ]
+    },
+    "urgentOrders": {
+        "title": "Urgent orders",
+        "params": {"dueFrom": date(2024, 10, 7), "days": 7, "status": "Processing"},
+        "tables": ["ClientOrder", "ClientAddress", "Client", "Address"],
+        "collections": ["Order"],
+        "sql": urgentOrdersSQL,
+        "mongo": urgentOrdersMongo,
+        "columns": [
+            {"label": "Order ID", "sql": "clientOrder_ID", "mongo": "_id", "type": "id", "compared": False},
+            {"label": "Client", "sql": "client_Name", "mongo": "client.name", "type": "text"},
+            {"label": "Street Address", "sql": "address_StreetAddress", "mongo": "client.address.streetAddress", "type": "text"},
+            {"label": "Postcode", "sql": "address_Postcode", "mongo": "client.address.postcode", "type": "text"},
+            {"label": "Due Date", "sql": "clientOrder_DueDate", "mongo": "dueDate", "type": "date"},
+            {"label": "Status", "sql": "clientOrder_Status", "mongo": "status", "type": "text"}
+        ]
+    },
+    "alliedSc": {
+        "title": "Order items shipped by Allied Express",
+        "params": {"courier": "Allied Express"},
+        "tables": ["OrderItem", "ClientOrder", "Delivery", "ShippingCourier"],
+        "collections": ["Order"],
+        "sql": alliedScSQL,
+        "mongo": alliedScMongo,
+        "columns": [
+            {"label": "Product SKU", "sql": "product_SKU", "mongo": "_id", "type": "text"},
+            {"label": "Quantity Sold", "sql": "quantity", "mongo": "quantity", "type": "int"},
+            {"label": "Shipping Courier", "sql": "shippingCourier_Name", "mongo": "shippingCourierName", "type": "text"}
+        ]
+    },
+    "discount": {
+        "title": "Discount on all orders",
+        "params": {},
+        "tables": ["ClientOrder", "Client", "OrderItem", "Product"],
+        "collections": ["Order", "Product"],
+        "sql": discountSQL,
+        "mongo": discountMongo,
+        "columns": [
+            {"label": "Order ID", "sql": "clientOrder_ID", "mongo": "_id", "type": "id", "compared": False},
+            {"label": "Client", "sql": "client_Name", "mongo": "clientName", "type": "text"},
+            {"label": "Original Total", "sql": "Original_Total", "mongo": "originalTotal", "type": "decimal"},
+            {"label": "Sales Total", "sql": "Sales_Total", "mongo": "salesTotal", "type": "decimal"},
+            # Follows from the totals, and the two stores round it differently
+            {"label": "Discount (%)", "sql": "Discount_Percentage", "mongo": "discountPercentage", "type": "decimal", "compared": False}
+        ]
+    },
+    "ordersInfo": {
+        "title": "Order information",
+        "params": {},
+        "tables": ["ClientOrder", "Client", "Address", "Delivery", "ShippingCourier"],
+        "collections": ["Order"],
+        "sql": ordersInfoSQL,
+        "mongo": ordersInfoMongo,
+        "columns": [
+            {"label": "Order ID", "sql": "clientOrder_ID", "mongo": "_id", "type": "id", "compared": False},
+            {"label": "Client", "sql": "client_Name", "mongo": "client.name", "type": "text"},
+            {"label": "Client Phone", "sql": "client_Phone", "mongo": "client.phone", "type": "text"},
+            {"label": "Client Email", "sql": "client_Email", "mongo": "client.email", "type": "text"},
+            {"label": "Street Address", "sql": "address_StreetAddress", "mongo": "client.address.streetAddress", "type": "text"},
+            {"label": "State", "sql": "address_State", "mongo": "client.address.state", "type": "text"},
+            {"label": "Postcode", "sql": "address_Postcode", "mongo": "client.address.postcode", "type": "text"},
+            {"label": "Order Date", "sql": "clientOrder_Date", "mongo": "orderDate", "type": "date"},
+            {"label": "Due Date", "sql": "clientOrder_DueDate", "mongo": "dueDate", "type": "date"},
+            {"label": "Status", "sql": "clientOrder_Status", "mongo": "status", "type": "text"},
+            {"label": "Shipping Courier", "sql": "shippingCourier_Name", "mongo": "delivery.shippingCourierName", "type": "text"},
+            {"label": "Tracking Number", "sql": "delivery_TrackingNumber", "mongo": "delivery.trackingNumber", "type": "text"},
+            {"label": "Shipping Date", "sql": "delivery_ShippingDate", "mongo": "delivery.shippingDate", "type": "date"}
+        ]
+    }
+}
+
+
+def reportParams(name, params=None):
+    # The report's defaults with any given parameters on top
+    unknown = set(params or {}) - set(reportDefinitions[name]["params"])
+    if unknown:
+        raise ValueError(f"Unknown parameters for {name}: {', '.join(sorted(unknown))}")
+    return {**reportDefinitions[name]["params"], **(params or {})}
+
+
+def sqlStatement(name, params=None):
+    # The query with positional %s placeholders and the values in order, which both text and prepared cursors take
+    values = reportParams(name, params)
+    query = reportDefinitions[name]["sql"]
+    order = re.findall(r"%\((\w+)\)s", query)
+    return re.sub(r"%\((\w+)\)s", "%s", query), tuple(values[param] for param in order)
+
+
+def mongoSpec(name, params=None):
+    return reportDefinitions[name]["mongo"](reportParams(name, params))
+
+
+def runMongo(db, spec, batchSize=None):
+    # Returns the driver cursor for an aggregate ({"pipeline"}) or find ({"filter", "projection", "sort"}) spec
+    # batchSize sets how many documents each getMore brings back, the driver default is 101 then up to 16MB
+    collection = db[spec["collection"]]
+    if "pipeline" in spec:
+        return collection.aggregate(spec["pipeline"], **({"batchSize": batchSize} if batchSize else {}))
+    cursor = collection.find(spec["filter"], spec["projection"])
+    if batchSize:
+        cursor = cursor.batch_size(batchSize)
+    return cursor.sort(list(spec["sort"].items())) if spec.get("sort") else cursor
+
+
+def mongoExplainCommand(spec):
+    # The same spec as a database command, for explain
+    if "pipeline" in spec:
+        return {"aggregate": spec["collection"], "pipeline": spec["pipeline"], "cursor": {}}
+    command = {"find": spec["collection"], "filter": spec["filter"], "projection": spec["projection"]}
+    if spec.get("sort"):
+        command["sort"] = spec["sort"]
+    return command
+
+
+def documentValue(document, path):
+    # Follows a dotted path, missing fields (such as an order without a delivery) give None
+    for key in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def convertValue(valueType, value):
+    # Brings values from either store to the same Python types, MongoDB dates become Melbourne local dates
+    if value is None:
+        return None
+    match valueType:
+        case "int":
+            return int(value)
+        case "decimal":
+            if isinstance(value, Decimal):
+                return value
+            return value.to_decimal() if isinstance(value, Decimal128) else Decimal(str(value))
+        case "date":
+            if isinstance(value, datetime):
+                return (value if value.tzinfo else utc.localize(value)).astimezone(melTZ).date()
+            return value
+        case _:
+            return value
+
+
+def sqlRow(name, row):
+    # row is a dictionary from a MySQL cursor
+    return tuple(convertValue(column["type"], row[column["sql"]]) for column in reportDefinitions[name]["columns"])
+
+
+def mongoRow(name, document):
+    return tuple(convertValue(column["type"], documentValue(document, column["mongo"])) for column in reportDefinitions[name]["columns"])
+
+
+def fieldGetter(path):
+    # Reads one dotted path from a document, the path is split once per column rather than once per value
+    keys = path.split(".")
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda document: document.get(key)
+
+    def getField(document):
+        for key in keys:
+            document = document.get(key) if isinstance(document, dict) else None
+        return document
+    return getField
+
+
+def localDateColumn(values):
+    # convertValue's MongoDB date conversion for a whole column at once: the naive UTC datetimes are converted to
+    # Melbourne time by pandas and cut to midnight, staying a datetime64 column with NaT for missing values
+    # Turning them into datetime.date objects would build one Python object per row, so that's left to displayDates
+    series = pd.to_datetime(pd.Series(values, dtype="object"), utc=True).dt.tz_convert(melTZ)
+    return series.dt.tz_localize(None).dt.normalize()
+
+
+def displayDates(series):
+    # A localDateColumn as datetime.date values with None for missing ones, the same as the MySQL and row paths
+    return series.dt.date.astype(object).where(series.notna(), None)
+
+
+def convertColumn(valueType, values):
+    # convertValue over a whole column, text and ID columns are used as they are
+    if valueType in ("text", "id"):
+        return values
+    if valueType == "date":
+        # MySQL DATE columns are already local dates, only MongoDB datetimes need converting
+        first = next((value for value in values if value is not None), None)
+        return localDateColumn(values) if isinstance(first, datetime) else values
+    return [convertValue(valueType, value) for value in values]
+
+
+def sqlColumns(name, rows):
+    # rows are plain tuples in SELECT order, zip transposes them into columns in a single pass
+    columns = reportDefinitions[name]["columns"]
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return [convertColumn(column["type"], list(columnValues)) for column, columnValues in zip(columns, values)]
+
+
+def mongoColumns(name, documents):
+    # One pass over the documents appending each field straight to its column's list
+    columns = reportDefinitions[name]["columns"]
+    values = [[] for _ in columns]
+    readers = [(fieldGetter(column["mongo"]), columnValues.append) for column, columnValues in zip(columns, values)]
+    for document in documents:
+        for getField, append in readers:
+            append(getField(document))
+    return [convertColumn(column["type"], columnValues) for column, columnValues in zip(columns, values)]
+
+
+def columnsFrame(name, columnValues):
+    # columnValues is one list per output column, in schema order
+    return pd.DataFrame({column["label"] + ":": values for column, values in zip(reportDefinitions[name]["columns"], columnValues)})
+
+
+def reportFrame(name, rows):
+    return pd.DataFrame(rows, columns=[column["label"] + ":" for column in reportDefinitions[name]["columns"]])
+
+
+def displayResults(df):
+    # Only the printed copy has its MongoDB date columns converted to dates
+    dateColumns = df.select_dtypes(include="datetime").columns
+    if len(dateColumns):
+        df = df.assign(**{label: displayDates(df[label]) for label in dateColumns})
+    resultString = df.to_string(index=False)
+    separator = "-" * max(len(line) for line in resultString.split('\n'))
+    print(separator)
+    print(resultString)
+    print(separator)
+
+
+def showStreamedResults(preview, rowCount):
+    # A streamed report only keeps its first chunk, so that is what gets shown
+    if preview is not None:
+        displayResults(preview)
+    print(f"Showing {0 if preview is None else len(preview)} of {rowCount} rows")
+
+
+def exportReport(executeReport, db, name, path):
+    # Writes the report to a CSV file one chunk at a time as a backend's executeReport hands the DataFrames over
+    with open(path, "w", newline="") as exportFile:
+        csv.writer(exportFile).writerow(column["label"] for column in reportDefinitions[name]["columns"])
+        return executeReport(db, name, handleChunk=lambda df: df.to_csv(exportFile, header=False, index=False))
+
+
+def timedOperation(name, decodeTime):
+    # A backend's executeReport returns no decode time for a cache hit, whose time is the cache lookup
+    # rather than the query, so hits are stored under their own name instead of mixed into the report's times
+    return name if decodeTime is not None else f"{name} (cached)"
+
+
+def runReports(executeReport, db, reports, repeat, exportPrefix=None):
+    # Runs each report repeat times in turn with a backend's executeReport,
+    # returning one (report, iteration, execTime, rows, decodeTime) sample per run, named by timedOperation
+    # With exportPrefix the rows are also written to <exportPrefix><report>.csv, overwritten by each iteration
+    samples = []
+    for iteration in range(1, repeat + 1):
+        for report in reports:
+            if exportPrefix:
+                execTime, rows, decodeTime = exportReport(executeReport, db, report, f"{exportPrefix}{report}.csv")
+            else:
+                execTime, rows, decodeTime = executeReport(db, report)
+            samples.append((timedOperation(report, decodeTime), iteration, float(execTime), rows, decodeTime))
+    return samples
+
+
+def reportMenu(runReport):
+    # Calls runReport with the chosen report name until the user exits
+    names = list(reportDefinitions)
+    finished = False
+
+    while not finished:
+        print("\nQueries menu:")
+        for number, name in enumerate(names, 1):
+            print(f"{number}. {reportDefinitions[name]['title']}")
+        print(f"{len(names) + 1}. Exit program")
+
+        choice = input(f"Please enter your choice (1-{len(names) + 1}): ")
+
+        match choice:
+            case _ if choice.isdigit() and 1 <= int(choice) <= len(names):
+                runReport(names[int(choice) - 1])
+            case _ if choice == str(len(names) + 1):
+                print("Exiting program")
+                finished = True
+            case _:
+                print(f"Please input an integer (1-{len(names) + 1})")
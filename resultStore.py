@@ -0,0 +1,224 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import uuid
+from datetime import datetime, timezone
+
+from benchmarkHarness import displayTable
+
+
+# Every timing result is appended as one JSON line, so runs from all scripts end up in the same file
+defaultResultsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarkResults.jsonl")
+
+
+def gitCommit():
+    try:
+        scriptDir = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=scriptDir, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, cwd=scriptDir).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def startRun(script):
+    return {
+        "runID": uuid.uuid4().hex[:12],
+        "script": script,
+        "commit": gitCommit(),
+        "startedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {
+            "name": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count()
+        }
+    }
+
+
+def recordResult(run, backend, operation, times, datasetSize=None, path=defaultResultsPath, extra=None):
+    # times is a list of durations in seconds
+    entry = dict(run)
+    entry.update({
+        "backend": backend,
+        "operation": operation,
+        "datasetSize": datasetSize,
+        "recordedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "times": [float(t) for t in times]
+    })
+    if extra:
+        entry["extra"] = extra
+
+    with open(path, "a") as resultsFile:
+        resultsFile.write(json.dumps(entry) + "\n")
+
+
+def addResultArguments(parser):
+    parser.add_argument("--results", default=defaultResultsPath, help="Results file to append to (default: benchmarkResults.jsonl)")
+    parser.add_argument("--no-record", action="store_true", help="Do not store the results of this run")
+
+
+def loadResults(path=defaultResultsPath):
+    if not os.path.exists(path):
+        return []
+    with open(path) as resultsFile:
+        return [json.loads(line) for line in resultsFile if line.strip()]
+
+
+def groupRuns(entries):
+    # Returns {runID: {"info": first entry, "times": {(backend, operation): [times]}}} in the order runs were recorded
+    runs = {}
+    for entry in entries:
+        run = runs.setdefault(entry["runID"], {"info": entry, "times": {}})
+        run["times"].setdefault((entry["backend"], entry["operation"]), []).extend(entry["times"])
+    return runs
+
+
+def mannWhitneyP(baseline, candidate):
+    # Two-sided Mann-Whitney U test with the normal approximation
+    # Latency samples are rarely normal, so a rank test is safer than comparing means
+    n1 = len(baseline)
+    n2 = len(candidate)
+    combined = sorted([(value, 0) for value in baseline] + [(value, 1) for value in candidate])
+
+    # Average ranks over ties
+    ranks = [0.0] * len(combined)
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        i = j + 1
+
+    rankSum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rankSum - n1 * (n1 + 1) / 2
+    sigma = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / sigma
+    return 2 * (1 - statistics.NormalDist().cdf(abs(z)))
+
+
+def compareRuns(baselineRun, candidateRun, alpha=0.05, threshold=0.05):
+    rows = []
+    for key, baselineTimes in baselineRun["times"].items():
+        candidateTimes = candidateRun["times"].get(key)
+        if not candidateTimes:
+            continue
+
+        backend, operation = key
+        baselineMedian = statistics.median(baselineTimes)
+        candidateMedian = statistics.median(candidateTimes)
+        change = (candidateMedian - baselineMedian) / baselineMedian if baselineMedian else 0.0
+
+        if len(baselineTimes) < 2 or len(candidateTimes) < 2:
+            pValue = None
+            verdict = "Too few samples"
+        else:
+            pValue = mannWhitneyP(baselineTimes, candidateTimes)
+            if pValue < alpha and change > threshold:
+                verdict = "REGRESSION"
+            elif pValue < alpha and change < -threshold:
+                verdict = "Improvement"
+            else:
+                verdict = "No change"
+
+        rows.append({
+            "backend": backend,
+            "operation": operation,
+            "baselineMedian": baselineMedian,
+            "candidateMedian": candidateMedian,
+            "change": change,
+            "pValue": pValue,
+            "verdict": verdict
+        })
+    return rows
+
+
+def displayComparison(rows):
+    data = {
+        "Backend:": [row["backend"] for row in rows],
+        "Operation:": [row["operation"] for row in rows],
+        "Baseline Median (s):": [f"{row['baselineMedian']:.6f}" for row in rows],
+        "Candidate Median (s):": [f"{row['candidateMedian']:.6f}" for row in rows],
+        "Change:": [f"{row['change'] * 100:+.1f}%" for row in rows],
+        "p-value:": ["N/A" if row["pValue"] is None else f"{row['pValue']:.4f}" for row in rows],
+        "Verdict:": [row["verdict"] for row in rows]
+    }
+    displayTable(data)
+
+
+def listRuns(runs):
+    data = {
+        "Run ID:": [],
+        "Script:": [],
+        "Commit:": [],
+        "Started:": [],
+        "Host:": [],
+        "Dataset Size:": [],
+        "Operations:": []
+    }
+    for runID, run in runs.items():
+        info = run["info"]
+        data["Run ID:"].append(runID)
+        data["Script:"].append(info["script"])
+        data["Commit:"].append(info["commit"])
+        data["Started:"].append(info["startedAt"])
+        data["Host:"].append(info["host"]["name"])
+        data["Dataset Size:"].append(info.get("datasetSize") if info.get("datasetSize") is not None else "N/A")
+        data["Operations:"].append(len(run["times"]))
+    displayTable(data)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="List stored benchmark runs and compare two of them for regressions")
+    parser.add_argument("--results", default=defaultResultsPath, help="Results file (default: benchmarkResults.jsonl next to this script)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="List stored runs")
+
+    compareParser = subparsers.add_parser("compare", help="Compare two runs, by default the two most recent")
+    compareParser.add_argument("baseline", nargs="?", help="Baseline run ID")
+    compareParser.add_argument("candidate", nargs="?", help="Candidate run ID")
+    compareParser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default: 0.05)")
+    compareParser.add_argument("--threshold", type=float, default=0.05, help="Minimum relative change of the median to flag (default: 0.05)")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    runs = groupRuns(loadResults(args.results))
+
+    if not runs:
+        print(f"No results found in {args.results}")
+        return
+
+    match args.command:
+        case "list":
+            listRuns(runs)
+        case "compare":
+            runIDs = list(runs)
+            baselineID = args.baseline or (runIDs[-2] if len(runIDs) > 1 else None)
+            candidateID = args.candidate or runIDs[-1]
+            if baselineID not in runs or candidateID not in runs:
+                print("Please give two run IDs from the list command")
+                return
+
+            print(f"Comparing baseline {baselineID} with candidate {candidateID}")
+            rows = compareRuns(runs[baselineID], runs[candidateID], args.alpha, args.threshold)
+            displayComparison(rows)
+
+            regressions = [row for row in rows if row["verdict"] == "REGRESSION"]
+            if regressions:
+                print(f"{len(regressions)} regression(s) found")
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Server timers are (begin, end) pairs of functions
+# begin() runs before the client clock starts and returns a marker
+# end(marker) runs after the client clock stops and returns the server time in nanoseconds
+# Neither call happens inside the measured window, so they do not inflate the client time
+
+
+def mysqlServerTimer(connection, statements):
+    # Uses performance_schema statement history for this connection's thread (MySQL 8.0.16+)
+    # statements is a list of SQL prefixes, e.g. ["INSERT", "COMMIT"], that make up the operation being timed
+    cursor = connection.cursor(buffered=True)
+    statementFilter = " OR ".join(["SQL_TEXT LIKE %s"] * len(statements))
+    statementParams = [f"{statement}%" for statement in statements]
+
+    def begin():
+        cursor.execute(
+            "SELECT IFNULL(MAX(EVENT_ID), 0) FROM performance_schema.events_statements_history "
+            "WHERE THREAD_ID = PS_CURRENT_THREAD_ID()"
+        )
+        return cursor.fetchone()[0]
+
+    def end(marker):
+        cursor.execute(
+            "SELECT IFNULL(SUM(TIMER_WAIT), 0) FROM performance_schema.events_statements_history "
+            f"WHERE THREAD_ID = PS_CURRENT_THREAD_ID() AND EVENT_ID > %s AND ({statementFilter})",
+            [marker] + statementParams
+        )
+        return int(cursor.fetchone()[0]) // 1000      # TIMER_WAIT is in picoseconds
+
+    return begin, end
+
+
+def enableMongoProfiler(db):
+    # Level 2 profiles every operation, which needs dbAdmin rights and adds some overhead of its own
+    db.command("profile", 2, slowms=0)
+
+
+def disableMongoProfiler(db):
+    db.command("profile", 0)
+
+
+def mongoServerTimer(db, collectionName, ops):
+    # Reads the operations recorded in system.profile since the marker
+    # ops is a list of profiler op types, e.g. ["insert"] or ["update"]
+    # The profiler only reports whole milliseconds, so very fast operations can show up as 0
+    namespace = f"{db.name}.{collectionName}"
+
+    def begin():
+        latest = db.system.profile.find_one({}, {"ts": 1}, sort=[("ts", -1)])
+        return latest["ts"] if latest else None
+
+    def end(marker):
+        query = {"ns": namespace, "op": {"$in": ops}}
+        if marker is not None:
+            query["ts"] = {"$gt": marker}
+
+        totalMillis = sum(entry["millis"] for entry in db.system.profile.find(query, {"millis": 1}))
+        return totalMillis * 1_000_000
+
+    return begin, end
+
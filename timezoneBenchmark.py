@@ -0,0 +1,95 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+from pytz import utc
+
+from reportRegistry import melTZ, convertValue, localDateColumn, displayDates
+from benchmarkHarness import runBenchmark, summariseTimes, displayTable
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Compares converting a column of MongoDB's naive UTC datetimes to Melbourne local dates one value at a time
+# with converting the whole column at once in pandas, which keeps the dates as a datetime64 column
+# vectorisedToDate adds turning that column into datetime.date objects, the per-row step displayResults does for the rows it prints
+# The datetimes are generated in memory, so only the conversion is measured, 10^7 rows need a few GB of memory
+
+
+def generateDatetimes(rows, nullFraction, seed):
+    # Spread over two years so both sides of every daylight saving change are covered
+    generator = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    span = 2 * 365 * 24 * 3600
+    return [None if generator.random() < nullFraction else start + timedelta(seconds=generator.randrange(span)) for _ in range(rows)]
+
+
+def perRowStrftime(values):
+    # The way the Mongo runners used to convert dates, with missing shipping dates shown as N/A
+    return ["N/A" if value is None else value.replace(tzinfo=utc).astimezone(melTZ).strftime("%Y-%m-%d") for value in values]
+
+
+def perRowDates(values):
+    return [convertValue("date", value) for value in values]
+
+
+conversionPaths = {
+    "perRowStrftime": perRowStrftime,
+    "perRow": perRowDates,
+    "vectorised": localDateColumn,
+    "vectorisedToDate": lambda values: displayDates(localDateColumn(values))
+}
+
+
+def checkAgreement(values):
+    # The vectorised dates have to match the per-row ones, nulls included
+    expected = perRowDates(values)
+    actual = list(displayDates(localDateColumn(values)))
+    mismatches = sum(1 for left, right in zip(expected, actual) if left != right)
+    if mismatches:
+        raise SystemExit(f"Vectorised conversion disagrees with the per-row conversion on {mismatches} of {len(values)} values")
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark per-row against vectorised UTC to Australia/Melbourne date conversion")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000, 10000000], help="Column sizes to convert (default: 100000 1000000 10000000)")
+    parser.add_argument("--null-fraction", type=float, default=0.1, help="Share of missing values, like undelivered orders' shipping dates (default: 0.1)")
+    parser.add_argument("--paths", choices=list(conversionPaths), nargs="+", default=list(conversionPaths), help="Conversions to compare (default: all)")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per size and conversion (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per size and conversion (default: 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the generated datetimes (default: 42)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("timezoneBenchmark.py")
+
+    data = {"Rows:": [], "Conversion:": [], "Mean (s):": [], "p99 (s):": [], "Rows/s:": [], "Speedup:": []}
+    for rows in args.rows:
+        print(f"Generating {rows} datetimes")
+        values = generateDatetimes(rows, args.null_fraction, args.seed)
+        checkAgreement(values[:100000])
+
+        baseline = None
+        for path in args.paths:
+            print(f"Converting {rows} rows with {path}")
+            times, _ = runBenchmark(lambda: conversionPaths[path](values), args.warmup, args.iterations)
+            summary = summariseTimes(times)
+            # Speedups are relative to the first conversion in --paths
+            baseline = baseline or summary["mean"]
+            data["Rows:"].append(rows)
+            data["Conversion:"].append(path)
+            data["Mean (s):"].append(f"{summary['mean']:.6f}")
+            data["p99 (s):"].append(f"{summary['p99']:.6f}")
+            data["Rows/s:"].append(f"{rows / summary['mean']:.0f}")
+            data["Speedup:"].append(f"{baseline / summary['mean']:.1f}x")
+            if run:
+                recordResult(run, "python", f"timezone {path}", [t / 1e9 for t in times], rows, args.results,
+                             extra={"nullFraction": args.null_fraction})
+
+    print("\n-----UTC to Australia/Melbourne Date Conversion-----")
+    displayTable(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import random
+import time
+from pymongo import UpdateOne
+
+from dataGenerator import zipfianSampler, scramble
+from dbConnections import connectMySQL, connectMongo, getMongoDb, mysqlOrderCount, mongoOrderCount
+from benchmarkHarness import summariseTimes, displayTable, displayHistogram
+from resultStore import startRun, recordResult, addResultArguments
+
+
+# Named YCSB style workloads over the existing Client and Order data
+# mix maps an operation to its share of the workload
+# updateOrderStatus and updateClient write to the live rows, the values they overwrite are read along with the keys
+# and put back when the run ends
+profiles = {
+    "readHeavy": {
+        "description": "Order lookups by ID with occasional status changes",
+        "mix": {"readOrder": 0.95, "updateOrderStatus": 0.05}
+    },
+    "updateHeavy": {
+        "description": "Order lookups and status changes in equal shares",
+        "mix": {"readOrder": 0.5, "updateOrderStatus": 0.5}
+    },
+    "scanHeavy": {
+        "description": "Listing a client's most recent orders",
+        "mix": {"scanClientOrders": 0.95, "updateOrderStatus": 0.05}
+    },
+    "clientReadUpdate": {
+        "description": "Client lookups and contact detail updates",
+        "mix": {"readClient": 0.5, "updateClient": 0.5}
+    }
+}
+
+# Which key space each operation picks its key from
+operationKeys = {
+    "readOrder": "orders",
+    "updateOrderStatus": "orders",
+    "scanClientOrders": "clients",
+    "readClient": "clients",
+    "updateClient": "clients"
+}
+
+orderStatuses = ["Processing", "Awaiting pickup", "Shipped"]
+
+
+def uniformChooser(n, rng):
+    return lambda: rng.randrange(n)
+
+
+def zipfianIndex(n, rng, theta=0.99):
+    sample = zipfianSampler(n, theta)
+    return lambda: sample(rng.random())
+
+
+def makeChooser(distribution, n, rng):
+    match distribution:
+        case "uniform":
+            return uniformChooser(n, rng)
+        case "zipfian":
+            choose = zipfianIndex(n, rng)
+            return lambda: scramble(choose(), n)
+        case "latest":
+            # Most recent keys (highest IDs) are the most popular
+            choose = zipfianIndex(n, rng)
+            return lambda: n - 1 - choose()
+
+
+# Both return the keys of each key space and, keyed by them, the values the update operations overwrite,
+# so the touched rows can be restored afterwards
+def mysqlLoadKeys(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT clientOrder_ID, clientOrder_Status FROM ClientOrder ORDER BY clientOrder_ID")
+    orders = dict(cursor.fetchall())
+    cursor.execute("SELECT client_ID, client_Phone FROM Client ORDER BY client_ID")
+    clients = dict(cursor.fetchall())
+    cursor.close()
+    return {"orders": list(orders), "clients": list(clients)}, {"orders": orders, "clients": clients}
+
+
+def mongoLoadKeys(db):
+    # ObjectIds sort by creation time and generated data uses increasing integer IDs, so the sort matches the "latest" distribution
+    orders = {doc["_id"]: doc.get("status") for doc in db.Order.find({}, {"status": 1}).sort("_id", 1)}
+    clients = {doc["_id"]: doc.get("phone") for doc in db.Client.find({}, {"phone": 1}).sort("_id", 1)}
+    return {"orders": list(orders), "clients": list(clients)}, {"orders": orders, "clients": clients}
+
+
+def mysqlRestore(connection, originals, touched):
+    cursor = connection.cursor()
+    cursor.executemany("UPDATE ClientOrder SET clientOrder_Status = %s WHERE clientOrder_ID = %s",
+                       [(originals["orders"][orderID], orderID) for orderID in touched["orders"]])
+    cursor.executemany("UPDATE Client SET client_Phone = %s WHERE client_ID = %s",
+                       [(originals["clients"][clientID], clientID) for clientID in touched["clients"]])
+    connection.commit()
+    cursor.close()
+
+
+def mongoRestore(db, originals, touched):
+    if touched["orders"]:
+        db.Order.bulk_write([UpdateOne({"_id": orderID}, {"$set": {"status": originals["orders"][orderID]}})
+                             for orderID in touched["orders"]], ordered=False)
+    if touched["clients"]:
+        db.Client.bulk_write([UpdateOne({"_id": clientID}, {"$set": {"phone": originals["clients"][clientID]}})
+                              for clientID in touched["clients"]], ordered=False)
+
+
+# The update operations add their key to touched, for mysqlRestore and mongoRestore
+def mysqlOperations(connection, scanLength, rng, touched):
+    cursor = connection.cursor()
+
+    def readOrder(orderID):
+        cursor.execute("""
+            SELECT co.clientOrder_ID, c.client_Name, co.clientOrder_Date, co.clientOrder_DueDate, co.clientOrder_Status
+            FROM ClientOrder co
+            JOIN Client c ON co.client_ID = c.client_ID
+            WHERE co.clientOrder_ID = %s
+        """, (orderID,))
+        cursor.fetchall()
+
+    def updateOrderStatus(orderID):
+        touched["orders"].add(orderID)
+        cursor.execute("UPDATE ClientOrder SET clientOrder_Status = %s WHERE clientOrder_ID = %s", (rng.choice(orderStatuses), orderID))
+        connection.commit()
+
+    def scanClientOrders(clientID):
+        cursor.execute("""
+            SELECT clientOrder_ID, clientOrder_Date, clientOrder_DueDate, clientOrder_Status
+            FROM ClientOrder
+            WHERE client_ID = %s
+            ORDER BY clientOrder_Date DESC, clientOrder_Time DESC
+            LIMIT %s
+        """, (clientID, scanLength))
+        cursor.fetchall()
+
+    def readClient(clientID):
+        cursor.execute("SELECT client_ID, client_Name, client_Phone, client_Email FROM Client WHERE client_ID = %s", (clientID,))
+        cursor.fetchall()
+
+    def updateClient(clientID):
+        touched["clients"].add(clientID)
+        cursor.execute("UPDATE Client SET client_Phone = %s WHERE client_ID = %s", (f"{rng.randrange(10 ** 10):010d}", clientID))
+        connection.commit()
+
+    return {
+        "readOrder": readOrder,
+        "updateOrderStatus": updateOrderStatus,
+        "scanClientOrders": scanClientOrders,
+        "readClient": readClient,
+        "updateClient": updateClient
+    }
+
+
+def mongoOperations(db, scanLength, rng, touched):
+    def readOrder(orderID):
+        db.Order.find_one({"_id": orderID}, {"client.name": 1, "orderDate": 1, "dueDate": 1, "status": 1})
+
+    def updateOrderStatus(orderID):
+        touched["orders"].add(orderID)
+        db.Order.update_one({"_id": orderID}, {"$set": {"status": rng.choice(orderStatuses)}})
+
+    def scanClientOrders(clientID):
+        list(db.Order.find({"client.id": clientID}, {"orderDate": 1, "dueDate": 1, "status": 1}).sort("orderDate", -1).limit(scanLength))
+
+    def readClient(clientID):
+        db.Client.find_one({"_id": clientID}, {"name": 1, "phone": 1, "email": 1})
+
+    def updateClient(clientID):
+        touched["clients"].add(clientID)
+        db.Client.update_one({"_id": clientID}, {"$set": {"phone": f"{rng.randrange(10 ** 10):010d}"}})
+
+    return {
+        "readOrder": readOrder,
+        "updateOrderStatus": updateOrderStatus,
+        "scanClientOrders": scanClientOrders,
+        "readClient": readClient,
+        "updateClient": updateClient
+    }
+
+
+def parseMix(mixString):
+    # "readOrder=0.9,updateOrderStatus=0.1"
+    mix = {}
+    for part in mixString.split(","):
+        name, share = part.split("=")
+        if name not in operationKeys:
+            raise SystemExit(f"Unknown operation {name}, expected one of {', '.join(operationKeys)}")
+        mix[name] = float(share)
+    return mix
+
+
+def runWorkload(operations, keys, mix, distribution, operationCount, warmup, rng):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    choosers = {keySpace: makeChooser(distribution, len(keyList), rng) for keySpace, keyList in keys.items() if keyList}
+    for name in names:
+        if operationKeys[name] not in choosers:
+            raise SystemExit(f"No {operationKeys[name]} found to run {name} against")
+
+    def nextOperation():
+        name = rng.choices(names, weights)[0]
+        keySpace = operationKeys[name]
+        return name, keys[keySpace][choosers[keySpace]()]
+
+    for _ in range(warmup):
+        name, key = nextOperation()
+        operations[name](key)
+
+    times = {name: [] for name in names}
+    startTime = time.perf_counter_ns()
+    for _ in range(operationCount):
+        # Picking the operation and key happens outside the timed call
+        name, key = nextOperation()
+        opStart = time.perf_counter_ns()
+        operations[name](key)
+        times[name].append(time.perf_counter_ns() - opStart)
+    wallTime = (time.perf_counter_ns() - startTime) / 1e9
+
+    return times, wallTime
+
+
+def reportWorkload(label, times, wallTime):
+    totalOperations = sum(len(opTimes) for opTimes in times.values())
+    print(f"\n-----{label}: {totalOperations / wallTime:.1f} ops/s over {wallTime:.2f} seconds-----")
+
+    data = {"Operation:": [], "Count:": [], "Mean (s):": [], "p50 (s):": [], "p99 (s):": [], "Max (s):": []}
+    for name, opTimes in times.items():
+        summary = summariseTimes(opTimes)
+        if summary["count"] == 0:
+            continue
+        data["Operation:"].append(name)
+        data["Count:"].append(summary["count"])
+        data["Mean (s):"].append(f"{summary['mean']:.6f}")
+        data["p50 (s):"].append(f"{summary['p50']:.6f}")
+        data["p99 (s):"].append(f"{summary['p99']:.6f}")
+        data["Max (s):"].append(f"{summary['max']:.6f}")
+    displayTable(data)
+
+    for name, opTimes in times.items():
+        displayHistogram(name, opTimes)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Run YCSB style mixed workloads over the Client and Order data")
+    parser.add_argument("--profile", choices=list(profiles) + ["all"], default="all", help="Workload profile to run (default: all)")
+    parser.add_argument("--mix", help="Override the operation mix, e.g. readOrder=0.9,updateOrderStatus=0.1")
+    parser.add_argument("--backend", choices=["mysql", "mongo", "both"], default="both", help="Backend(s) to test (default: both)")
+    parser.add_argument("--distribution", choices=["uniform", "zipfian", "latest"], default="zipfian", help="Key distribution (default: zipfian)")
+    parser.add_argument("--operations", type=int, default=10000, help="Timed operations per profile (default: 10000)")
+    parser.add_argument("--warmup", type=int, default=500, help="Untimed operations before measuring (default: 500)")
+    parser.add_argument("--scan-length", type=int, default=50, help="Orders returned by scanClientOrders (default: 50)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    addResultArguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    run = None if args.no_record else startRun("workloadProfiles.py")
+
+    if args.mix:
+        selected = {"custom": {"description": "Custom operation mix", "mix": parseMix(args.mix)}}
+    elif args.profile == "all":
+        selected = profiles
+    else:
+        selected = {args.profile: profiles[args.profile]}
+
+    backends = []
+    if args.backend in ("mysql", "both"):
+        connection = connectMySQL()
+        mysqlKeys, mysqlOriginals = mysqlLoadKeys(connection)
+        mysqlTouched = {"orders": set(), "clients": set()}
+        backends.append(("mysql", "MySQL", mysqlKeys, lambda rng: mysqlOperations(connection, args.scan_length, rng, mysqlTouched),
+                         mysqlOrderCount(connection)))
+    if args.backend in ("mongo", "both"):
+        mongoClient = connectMongo()
+        mongoDb = getMongoDb(mongoClient)
+        mongoKeys, mongoOriginals = mongoLoadKeys(mongoDb)
+        mongoTouched = {"orders": set(), "clients": set()}
+        backends.append(("mongo", "MongoDB", mongoKeys, lambda rng: mongoOperations(mongoDb, args.scan_length, rng, mongoTouched),
+                         mongoOrderCount(mongoDb)))
+
+    try:
+        for profileName, profile in selected.items():
+            print(f"\n=====Profile {profileName}: {profile['description']} ({args.distribution} keys)=====")
+            for backend, label, keys, makeOperations, datasetSize in backends:
+                # Same seed per backend, so both see the same sequence of operations
+                rng = random.Random(args.seed)
+                times, wallTime = runWorkload(makeOperations(rng), keys, profile["mix"], args.distribution, args.operations, args.warmup, rng)
+                reportWorkload(f"{label} {profileName}", times, wallTime)
+
+                if run:
+                    for name, opTimes in times.items():
+                        if opTimes:
+                            recordResult(run, backend, f"{profileName}:{name}", [t / 1e9 for t in opTimes], datasetSize, args.results,
+                                         extra={"distribution": args.distribution, "throughput": sum(len(t) for t in times.values()) / wallTime})
+    finally:
+        # Put back what the updates overwrote, also when the run is interrupted
+        if args.backend in ("mysql", "both"):
+            mysqlRestore(connection, mysqlOriginals, mysqlTouched)
+            connection.close()
+        if args.backend in ("mongo", "both"):
+            mongoRestore(mongoDb, mongoOriginals, mongoTouched)
+            mongoClient.close()
+
+
+if __name__ == "__main__":
+    main()